@@ -1,6 +1,92 @@
+import re
+
+import numpy as np
 import pandas as pd
 from typing import Dict, Any
 
+_TRUE_VALUES = ('true', '1', 'yes', 'y', 't')
+_FALSE_VALUES = ('false', '0', 'no', 'n', 'f')
+_NUMBER_RE = re.compile(r'[+-]?\d+|[+-]?(\d*\.\d+|\d+\.\d*)([eE][+-]?\d+)?')
+
+
+def _normalize_column(series: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    Normalize a column once into boolean, numeric and string views, following
+    the same coercion rules as the cell comparison: strings may be read as
+    booleans or numbers, real booleans stay booleans and real numbers stay numbers.
+    """
+    n = len(series)
+    is_null = series.isna().to_numpy()
+    is_bool = np.zeros(n, dtype=bool)
+    bool_val = np.zeros(n, dtype=bool)
+    is_num = np.zeros(n, dtype=bool)
+    num_val = np.full(n, np.nan)
+
+    if pd.api.types.is_bool_dtype(series):
+        is_bool = ~is_null
+        bool_val = series.fillna(False).to_numpy(dtype=bool)
+    elif pd.api.types.is_numeric_dtype(series):
+        is_num = ~is_null
+        num_val = series.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        types = series.map(type)
+        is_str = (types == str).to_numpy()
+
+        real_bool = (types == bool).to_numpy()
+        is_bool |= real_bool
+        bool_val[real_bool] = series[real_bool].astype(bool).to_numpy()
+
+        real_num = types.isin([int, float]).to_numpy() & ~is_null
+        is_num |= real_num
+        num_val[real_num] = series[real_num].astype(float).to_numpy()
+
+        if is_str.any():
+            text = series[is_str].str.strip()
+            lowered = text.str.lower()
+            true_mask = lowered.isin(_TRUE_VALUES).to_numpy()
+            false_mask = lowered.isin(_FALSE_VALUES).to_numpy()
+            str_pos = np.flatnonzero(is_str)
+            is_bool[str_pos] = true_mask | false_mask
+            bool_val[str_pos] = true_mask
+
+            numeric_mask = text.str.fullmatch(_NUMBER_RE).to_numpy(dtype=bool)
+            is_num[str_pos[numeric_mask]] = True
+            num_val[str_pos[numeric_mask]] = pd.to_numeric(text[numeric_mask]).to_numpy(dtype=float)
+
+    return {
+        'is_null': is_null,
+        'is_bool': is_bool,
+        'bool': bool_val,
+        'is_num': is_num,
+        'num': num_val,
+        'str': series.astype(str).to_numpy(),
+    }
+
+
+def _equal_mask(a: Dict[str, np.ndarray], b: Dict[str, np.ndarray]) -> np.ndarray:
+    """Vectorized equality of two normalized columns: bool, then number, then string."""
+    both_bool = a['is_bool'] & b['is_bool']
+    both_num = a['is_num'] & b['is_num']
+    equal = np.where(
+        both_bool,
+        a['bool'] == b['bool'],
+        np.where(both_num, a['num'] == b['num'], a['str'] == b['str'])
+    )
+    return equal | (a['is_null'] & b['is_null'])
+
+
+def _align_on_id(clean_df: pd.DataFrame, df: pd.DataFrame, id_column: str, name: str) -> pd.DataFrame:
+    """Reorder the rows of `df` so that its `id_column` follows the order of `clean_df`."""
+    if clean_df[id_column].equals(df[id_column]):
+        return df
+    if df[id_column].duplicated().any():
+        raise ValueError(f"ID column {id_column} contains duplicate values in the {name} dataset")
+    missing = ~clean_df[id_column].isin(df[id_column])
+    if missing.any() or len(df) != len(clean_df):
+        raise ValueError(f"ID column {id_column} mismatch between datasets")
+    aligned = df.set_index(id_column).reindex(clean_df[id_column]).reset_index()
+    return aligned[clean_df.columns].set_axis(clean_df.index)
+
 
 def benchmark_data_cleaning(
         clean_path: str,
@@ -15,10 +101,14 @@ def benchmark_data_cleaning(
         clean_path: Path to original clean CSV
         messy_path: Path to messy CSV
         cleaned_path: Path to cleaned CSV
-        id_column: Optional name of ID column for row matching
+        id_column: Optional name of ID column for row matching, rows of the messy
+            and cleaned datasets are joined on it when their order differs
 
     Returns:
-        Dictionary with cleaning metrics and detailed statistics
+        Dictionary with cleaning metrics and detailed statistics. The 'diff_frames'
+        entry holds boolean cell masks ('errors', 'corrected', 'remaining',
+        'introduced') aligned with the clean dataset, and 'diff' lists every
+        cell that was wrong before or after cleaning.
     """
     clean_df = pd.read_csv(clean_path)
     messy_df = pd.read_csv(messy_path)
@@ -28,10 +118,14 @@ def benchmark_data_cleaning(
         raise ValueError("All datasets must have identical columns")
 
     if id_column:
-        for df in [messy_df, cleaned_df]:
-            if not clean_df[id_column].equals(df[id_column]):
-                raise ValueError(f"ID column {id_column} mismatch between datasets")
-
+        if clean_df[id_column].duplicated().any():
+            raise ValueError(f"ID column {id_column} contains duplicate values in the clean dataset")
+        messy_df = _align_on_id(clean_df, messy_df, id_column, 'messy')
+        cleaned_df = _align_on_id(clean_df, cleaned_df, id_column, 'cleaned')
+    elif not (len(clean_df) == len(messy_df) == len(cleaned_df)):
+        raise ValueError("All datasets must have the same number of rows when no id_column is given")
+
+    error_masks, corrected_masks, remaining_masks, introduced_masks = {}, {}, {}, {}
     metrics = {
         'total_errors': 0,
         'corrected_errors': 0,
@@ -40,106 +134,64 @@ def benchmark_data_cleaning(
         'columns': {}
     }
 
-    import re
-
-    def is_equal(a, b):
-        """
-        Compare two values for equality, coercing between str, int/float, and bool when possible.
-        Returns True if values are equivalent after coercion, False otherwise.
-        """
-
-        def try_bool(x):
-            if isinstance(x, bool):
-                return x
-            if not isinstance(x, str):
-                return None
-            val = x.strip().lower()
-            if val in ('true', '1', 'yes', 'y', 't'):
-                return True
-            if val in ('false', '0', 'no', 'n', 'f'):
-                return False
-            return None
-
-        def try_number(x):
-            # ints and floats stay as-is
-            if isinstance(x, (int, float)) and not isinstance(x, bool):
-                return x
-            if not isinstance(x, str):
-                return None
-            x = x.strip()
-            # integer?
-            if re.fullmatch(r'[+-]?\d+', x):
-                try:
-                    return int(x)
-                except ValueError:
-                    pass
-            # float?
-            if re.fullmatch(r'[+-]?(\d*\.\d+|\d+\.\d*)([eE][+-]?\d+)?', x):
-                try:
-                    return float(x)
-                except ValueError:
-                    pass
-            return None
-
-        # 1) Try boolean comparison
-        bool_a = try_bool(a)
-        bool_b = try_bool(b)
-        if bool_a is not None and bool_b is not None:
-            return bool_a == bool_b
-
-        # 2) Try numeric comparison
-        num_a = try_number(a)
-        num_b = try_number(b)
-        if num_a is not None and num_b is not None:
-            return num_a == num_b
-
-        # 3) Fallback: compare as strings
-        # Coerce everything to str and compare
-        return str(a) == str(b)
-
     for col in clean_df.columns:
+        clean_norm = _normalize_column(clean_df[col])
+        messy_ok = _equal_mask(_normalize_column(messy_df[col]), clean_norm)
+        cleaned_ok = _equal_mask(_normalize_column(cleaned_df[col]), clean_norm)
+
+        error_masks[col] = ~messy_ok
+        corrected_masks[col] = ~messy_ok & cleaned_ok
+        remaining_masks[col] = ~messy_ok & ~cleaned_ok
+        introduced_masks[col] = messy_ok & ~cleaned_ok
+
         col_metrics = {
             'dtype_match': cleaned_df[col].dtype == clean_df[col].dtype,
             'total_cells': len(clean_df),
-            'original_errors': 0,
-            'corrected': 0,
-            'remaining': 0,
-            'new_errors': 0
+            'original_errors': int(error_masks[col].sum()),
+            'corrected': int(corrected_masks[col].sum()),
+            'remaining': int(remaining_masks[col].sum()),
+            'new_errors': int(introduced_masks[col].sum())
         }
-
-        for idx in range(len(clean_df)):
-            # Get values from all datasets
-            clean_val = clean_df[col].iloc[idx]
-            messy_val = messy_df[col].iloc[idx]
-            cleaned_val = cleaned_df[col].iloc[idx]
-
-            # Original error detection
-            original_error = not is_equal(messy_val, clean_val)
-            if original_error:
-                metrics['total_errors'] += 1
-                col_metrics['original_errors'] += 1
-
-                # Check if error was fixed
-                if is_equal(cleaned_val, clean_val):
-                    metrics['corrected_errors'] += 1
-                    col_metrics['corrected'] += 1
-                else:
-                    metrics['remaining_errors'] += 1
-                    col_metrics['remaining'] += 1
-
-            # Check for new errors introduced
-            elif not is_equal(cleaned_val, clean_val):
-                metrics['introduced_errors'] += 1
-                col_metrics['new_errors'] += 1
-
+        metrics['total_errors'] += col_metrics['original_errors']
+        metrics['corrected_errors'] += col_metrics['corrected']
+        metrics['remaining_errors'] += col_metrics['remaining']
+        metrics['introduced_errors'] += col_metrics['new_errors']
         metrics['columns'][col] = col_metrics
 
+    total_cells = len(clean_df) * len(clean_df.columns)
     metrics['correction_rate'] = (
             metrics['corrected_errors'] / metrics['total_errors'] * 100
     ) if metrics['total_errors'] > 0 else 100.0
 
     metrics['error_introduction_rate'] = (
-            metrics['introduced_errors'] / (len(clean_df) * len(clean_df.columns)) * 100
+            metrics['introduced_errors'] / total_cells * 100
+    ) if total_cells > 0 else 0.0
+
+    frame = lambda masks: pd.DataFrame(masks, index=clean_df.index, columns=clean_df.columns)
+    metrics['diff_frames'] = {
+        'errors': frame(error_masks),
+        'corrected': frame(corrected_masks),
+        'remaining': frame(remaining_masks),
+        'introduced': frame(introduced_masks),
+    }
+
+    status = pd.DataFrame(
+        np.select(
+            [frame(corrected_masks).to_numpy(), frame(remaining_masks).to_numpy(), frame(introduced_masks).to_numpy()],
+            ['corrected', 'remaining', 'introduced'],
+            default=''
+        ),
+        index=clean_df.index,
+        columns=clean_df.columns,
     )
+    rows, cols = np.nonzero(status.to_numpy() != '')
+    metrics['diff'] = pd.DataFrame({
+        'row': clean_df[id_column].to_numpy()[rows] if id_column else clean_df.index.to_numpy()[rows],
+        'column': clean_df.columns.to_numpy()[cols],
+        'clean_value': clean_df.to_numpy()[rows, cols],
+        'messy_value': messy_df.to_numpy()[rows, cols],
+        'cleaned_value': cleaned_df.to_numpy()[rows, cols],
+        'status': status.to_numpy()[rows, cols],
+    })
 
     return metrics
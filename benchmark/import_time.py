@@ -0,0 +1,94 @@
+"""
+Import-time benchmark of the package entry points.
+
+Imports each module in a fresh interpreter under `python -X importtime` and
+reports the median cumulative import time, the number of modules loaded and
+which heavy dependencies (langchain, openai, jsonschema, ...) came with it.
+`--first-model` also times building the default model, which is now done on
+the first model call instead of at import.
+
+    python -m benchmark.import_time
+    python -m benchmark.import_time --repeat 10 --module src.file_processing.csv --first-model
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, Any, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'src.file_processing.regex',
+    'src.file_processing.schema',
+    'src.llm_providers',
+    'src.llm_providers.llm',
+    'src.file_processing.csv',
+]
+HEAVY_DEPENDENCIES = ('langchain_core', 'langchain_openai', 'openai', 'jsonschema', 'thefuzz', 'dotenv', 'pandas')
+
+_IMPORT_TIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT, OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'benchmark'))
+    return subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def measure_import(module: str) -> Dict[str, Any]:
+    """Import `module` in a new interpreter; times are in milliseconds."""
+    modules: Dict[str, int] = {}
+    for line in _run(f"import {module}").stderr.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        if match:
+            modules.setdefault(match.group(4), int(match.group(2)))
+    return {
+        'import_ms': modules.get(module, 0) / 1000,
+        'modules': len(modules),
+        'heavy': sorted({name.split('.')[0] for name in modules} & set(HEAVY_DEPENDENCIES)),
+    }
+
+
+def measure_first_model(module: str) -> float:
+    """Milliseconds to build the default model once `module` is imported."""
+    code = (f"import {module}, time; start = time.perf_counter(); "
+            "from src.llm_providers.llm import get_base_llm; get_base_llm(); "
+            "print(time.perf_counter() - start)")
+    return float(_run(code).stdout.strip().splitlines()[-1]) * 1000
+
+
+def run_module(module: str, repeat: int, first_model: bool) -> Dict[str, Any]:
+    runs = [measure_import(module) for _ in range(repeat)]
+    return {
+        'import_ms': statistics.median(run['import_ms'] for run in runs),
+        'modules': runs[-1]['modules'],
+        'heavy': runs[-1]['heavy'],
+        'first_model_ms': statistics.median(measure_first_model(module) for _ in range(repeat)) if first_model else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the package entry points.")
+    parser.add_argument('--module', action='append', help="module to import (repeatable, default: entry points)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--first-model', action='store_true', help="also time building the default model")
+    args = parser.parse_args(argv)
+
+    header = f"{'module':<30}{'import ms':>12}{'modules':>10}{'1st model ms':>14}  heavy dependencies"
+    print(header)
+    print('-' * len(header))
+    for module in args.module or MODULES:
+        result = run_module(module, args.repeat, args.first_model)
+        first_model = f"{result['first_model_ms']:>14.1f}" if args.first_model else f"{'-':>14}"
+        print(f"{module:<30}{result['import_ms']:>12.1f}{result['modules']:>10}{first_model}  "
+              f"{', '.join(result['heavy']) or '-'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
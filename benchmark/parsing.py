@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of parsing large improves/error model replies.
+
+Compares the old path (json.loads then PotentialErrorQueryResponse(**data))
+with validation straight from the JSON text and with the compact
+ImprovementStore, on synthetic replies of `--rows` x `--columns` cells.
+
+    python -m benchmark.parsing
+    python -m benchmark.parsing --rows 20000 --columns 12 --fenced
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Optional
+
+from src.file_processing.schema import PotentialErrorQueryResponse
+from src.llm_providers.parsing import ImprovementStore, parse_error_response, loads, orjson, strip_code_fences
+
+
+def make_response(rows: int, columns: int, error_every: int = 10) -> str:
+    improves = [
+        {"row": row, "attr": [{"name": f"column_{col}", "value": f"value {row}-{col}"} for col in range(columns)]}
+        for row in range(rows)
+    ]
+    error = [{"row": row, "attr": [f"column_{col}" for col in range(columns)]} for row in range(0, rows, error_every)]
+    return json.dumps({"improves": improves, "error": error})
+
+
+def _json_then_model(content: str) -> Any:
+    return PotentialErrorQueryResponse(**json.loads(strip_code_fences(content)))
+
+
+PARSERS: Dict[str, Callable[[str], Any]] = {
+    'json.loads + model(**data)': _json_then_model,
+    'loads (orjson)' if orjson is not None else 'loads (json)': loads,
+    'model_validate_json': parse_error_response,
+    'ImprovementStore.from_json': ImprovementStore.from_json,
+}
+
+
+def run_parser(parse: Callable[[str], Any], content: str, repeat: int) -> Dict[str, Any]:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(content)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {'seconds': round(best, 5), 'peak_mb': round(peak / 1e6, 2)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark parsing of large improves/error model replies.")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--columns', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fenced', action='store_true', help="wrap the reply in a ```json code fence")
+    args = parser.parse_args(argv)
+
+    content = make_response(args.rows, args.columns)
+    print(f"Reply: {args.rows} rows x {args.columns} columns, {len(content) / 1e6:.2f} MB")
+    if args.fenced:
+        content = f"```json\n{content}\n```"
+
+    header = f"{'parser':<32}{'sec':>10}{'peak MB':>10}{'speedup':>10}"
+    print(header)
+    print('-' * len(header))
+    reference: Optional[float] = None
+    for name, parse in PARSERS.items():
+        result = run_parser(parse, content, args.repeat)
+        reference = reference or result['seconds']
+        print(f"{name:<32}{result['seconds']:>10.4f}{result['peak_mb']:>10.2f}{reference / result['seconds']:>9.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+SQLite import benchmark.
+
+Loads a CSV file into a fresh SQLite database with pandas `to_sql` on a
+default connection (the former `import_from_csvloader`), with
+`SQLiteManager.insert_dataframe` (schema DDL, executemany in large
+transactions, WAL and the other DEFAULT_PRAGMAS), and from the file with
+`SQLiteManager.import_csv`, which never holds more than one chunk (compare
+with read_csv + to_sql). The file is replicated `--scale` times to get a
+larger table; times are medians of `--repeat` runs.
+
+    python -m benchmark.sqlite_import
+    python -m benchmark.sqlite_import --scale 10 --chunk-size 50000 --repeat 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+import pandas as pd
+
+from src.file_processing.sql_generator import create_table_sql
+from src.file_processing.sqlite import SQLiteManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FILE = os.path.join(ROOT, 'examples', 'public', 'business-operations-survey-2023-business-practices.csv')
+TABLE = 'benchmark'
+
+
+def load_frame(filepath: str, scale: int, encoding: str) -> pd.DataFrame:
+    df = pd.read_csv(filepath, encoding=encoding)
+    return pd.concat([df] * scale, ignore_index=True) if scale > 1 else df
+
+
+def run_to_sql(df: pd.DataFrame, db_path: str) -> float:
+    connection = sqlite3.connect(db_path)
+    try:
+        start = time.perf_counter()
+        df.to_sql(TABLE, connection, if_exists='append', index=False)
+        connection.commit()
+        return time.perf_counter() - start
+    finally:
+        connection.close()
+
+
+def run_bulk(df: pd.DataFrame, db_path: str, chunk_size: int) -> float:
+    with SQLiteManager(db_path) as manager:
+        start = time.perf_counter()
+        manager.create_table(create_table_sql(TABLE, list(df.columns), dtypes=dict(df.dtypes)))
+        manager.insert_dataframe(TABLE, df, chunk_size)
+        return time.perf_counter() - start
+
+
+def run_file_to_sql(filepath: str, db_path: str, encoding: str) -> float:
+    start = time.perf_counter()
+    df = pd.read_csv(filepath, encoding=encoding)
+    return run_to_sql(df, db_path) + time.perf_counter() - start
+
+
+def run_import_csv(filepath: str, db_path: str, chunk_size: int, encoding: str) -> float:
+    with SQLiteManager(db_path) as manager:
+        start = time.perf_counter()
+        manager.import_csv(filepath, TABLE, chunk_size=chunk_size, encoding=encoding)
+        return time.perf_counter() - start
+
+
+def run(filepath: str, scale: int, chunk_size: int, encoding: str, repeat: int = 3) -> Dict[str, Any]:
+    df = load_frame(filepath, scale, encoding)
+    timings: Dict[str, List[float]] = {'to_sql': [], 'bulk': [], 'file to_sql': [], 'import_csv': []}
+    with tempfile.TemporaryDirectory() as directory:
+        source = filepath
+        if scale > 1:
+            source = os.path.join(directory, 'source.csv')
+            df.to_csv(source, index=False, encoding=encoding)
+        for run_index in range(repeat):
+            db = {name: os.path.join(directory, f"{name.replace(' ', '_')}-{run_index}.db") for name in timings}
+            timings['to_sql'].append(run_to_sql(df, db['to_sql']))
+            timings['bulk'].append(run_bulk(df, db['bulk'], chunk_size))
+            timings['file to_sql'].append(run_file_to_sql(source, db['file to_sql'], encoding))
+            timings['import_csv'].append(run_import_csv(source, db['import_csv'], chunk_size, encoding))
+    results: Dict[str, Any] = {name: statistics.median(values) for name, values in timings.items()}
+    results['rows'] = len(df)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark loading a CSV file into SQLite.")
+    parser.add_argument('--file', default=DEFAULT_FILE)
+    parser.add_argument('--encoding', default='cp1252')
+    parser.add_argument('--scale', type=int, default=1, help="replicate the file this many times")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="rows per transaction of the bulk loader")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = run(args.file, args.scale, args.chunk_size, args.encoding, args.repeat)
+    rows = results['rows']
+    print(f"{rows} rows from {os.path.basename(args.file)} (x{args.scale})")
+    for name in ('to_sql', 'bulk', 'file to_sql', 'import_csv'):
+        print(f"{name:<12}{results[name]:>10.3f} s{rows / results[name]:>14,.0f} rows/s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
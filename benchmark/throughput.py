@@ -0,0 +1,327 @@
+"""
+Throughput benchmark for the CSVLoader fixers.
+
+Every fixer runs over a scaled-up copy of an `examples/public` dataset with the
+offline FakeChatModel, so the numbers measure the local work (prompt building,
+parsing, applying fixes) plus a configurable simulated model latency.
+
+    python -m benchmark.throughput
+    python -m benchmark.throughput --update-baseline
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional
+
+import pandas as pd
+
+from src.file_processing.csv import CSVLoader
+from src.file_processing.schema import ImprovesItem, CellInfo
+from src.llm_providers.fake import FakeChatModel
+from src.utils.tracing import enable_tracing
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUBLIC_DIR = os.path.join(ROOT_DIR, 'examples', 'public')
+SPEND_DIR = os.path.join(PUBLIC_DIR, 'company-purchasing-dataset')
+BOOK_DIR = os.path.join(PUBLIC_DIR, 'book')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'throughput_baseline.json')
+
+SPEND_CATEGORIES = ['Furniture', 'Office Supplies', 'IT Services', 'Electronics', 'Software']
+SPEND_SCHEMA: Dict[str, Any] = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "type": "object",
+    "properties": {
+        "TransactionID": {"type": "string", "pattern": r"^TXN\d{3}$"},
+        "ItemName": {"type": "string"},
+        "Category": {"type": "string", "enum": SPEND_CATEGORIES},
+        "Quantity": {"type": "integer", "minimum": 0},
+        "UnitPrice": {"type": "number", "minimum": 0},
+        "TotalCost": {"type": "number", "minimum": 0},
+        "PurchaseDate": {"type": "string", "format": "date"},
+        "Supplier": {"type": "string"},
+        "Buyer": {"type": "string"},
+    },
+    "required": ["TransactionID", "ItemName", "Category", "Quantity", "UnitPrice", "TotalCost", "PurchaseDate"],
+}
+
+
+@dataclass
+class Scenario:
+    name: str
+    source: str
+    run: Callable[[CSVLoader, Any, int], Any]
+    prepare: Optional[Callable[[CSVLoader], Any]] = None
+    schema: Dict[str, Any] = field(default_factory=dict)
+
+
+def _improvements_from_clean(loader: CSVLoader) -> List[ImprovesItem]:
+    clean = pd.read_csv(os.path.join(SPEND_DIR, 'spend_analysis_dataset.csv'))
+    clean = pd.concat([clean] * (loader.num_rows // len(clean) + 1), ignore_index=True).iloc[:loader.num_rows]
+    return [
+        ImprovesItem(row=i, attr=[CellInfo(name='ItemName', value=item), CellInfo(name='Category', value=category)])
+        for i, item, category in zip(clean.index, clean['ItemName'], clean['Category'])
+    ]
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario(
+        name='fix_number_error',
+        source=os.path.join(BOOK_DIR, 'book_messy_data_number.csv'),
+        run=lambda loader, _, batch_size: loader.fix_number_error(
+            column_list=['original_price', 'current_price'],
+            batch_size=batch_size,
+            formation=[('original_price', '123456'), ('current_price', '123456')],
+            few_shot_context=[('1234.00', '1234'), ('135000,000', '135000'), ('4.00e+04', '40000')],
+        ),
+    ),
+    Scenario(
+        name='fix_datetime_error',
+        source=os.path.join(SPEND_DIR, 'messy_datetime_spend_analysis_dataset.csv'),
+        run=lambda loader, _, batch_size: loader.fix_datetime_error(
+            column_list=['PurchaseDate'],
+            batch_size=batch_size,
+            formation=[('PurchaseDate', 'YYYY-MM-DD')],
+            few_shot_context=[('19/04/2024', '2024-04-19'), ('10 9 24', '2024-09-10')],
+        ),
+        schema=SPEND_SCHEMA,
+    ),
+    Scenario(
+        name='fix_typography_data',
+        source=os.path.join(SPEND_DIR, 'messy_typo_spend_analysis_dataset.csv'),
+        run=lambda loader, _, batch_size: loader.fix_typography_data(['ItemName', 'Category'], batch_size=batch_size),
+    ),
+    Scenario(
+        name='fix_multi_task',
+        source=os.path.join(SPEND_DIR, 'messy_datetime_spend_analysis_dataset.csv'),
+        run=lambda loader, _, batch_size: loader.fix_multi_task(
+            {
+                'PurchaseDate': {'task': 'datetime', 'format': 'YYYY-MM-DD',
+                                 'examples': [('19/04/2024', '2024-04-19'), ('10 9 24', '2024-09-10')]},
+                'UnitPrice': {'task': 'number', 'format': '123456.78'},
+                'ItemName': 'typography',
+                'Category': 'typography',
+            },
+            batch_size=batch_size,
+        ),
+        schema=SPEND_SCHEMA,
+    ),
+    Scenario(
+        name='fix_regex_pattern_error',
+        source=os.path.join(SPEND_DIR, 'messy_pattern_spend_analysis_dataset.csv'),
+        run=lambda loader, _, __: loader.fix_regex_pattern_error('TransactionID'),
+        schema=SPEND_SCHEMA,
+    ),
+    Scenario(
+        name='fix_reference_value_error',
+        source=os.path.join(SPEND_DIR, 'messy_ref_spend_analysis_dataset.csv'),
+        run=lambda loader, _, __: loader.fix_reference_value_error('Category', SPEND_CATEGORIES),
+    ),
+    Scenario(
+        name='validate_dataset',
+        source=os.path.join(SPEND_DIR, 'messy_pattern_spend_analysis_dataset.csv'),
+        run=lambda loader, _, __: CSVLoader.validate_dataset(loader.data, SPEND_SCHEMA),
+    ),
+    Scenario(
+        name='get_column_info',
+        source=os.path.join(BOOK_DIR, 'book_messy_data_number.csv'),
+        run=lambda loader, _, __: CSVLoader.get_column_info(loader.data),
+    ),
+    Scenario(
+        name='apply_improvements',
+        source=os.path.join(SPEND_DIR, 'messy_typo_spend_analysis_dataset.csv'),
+        run=lambda loader, improvements, _: loader.apply_improvements(improvements),
+        prepare=_improvements_from_clean,
+    ),
+]
+
+
+def scale_dataset(source: str, scale: int, output_dir: str) -> str:
+    """Write `scale` stacked copies of a CSV file and return the new path."""
+    df = pd.read_csv(source)
+    scaled = pd.concat([df] * scale, ignore_index=True)
+    path = os.path.join(output_dir, f"x{scale}_{os.path.basename(source)}")
+    scaled.to_csv(path, index=False)
+    return path
+
+
+def run_scenario(
+        scenario: Scenario,
+        path: str,
+        model: FakeChatModel,
+        batch_size: int = 50,
+        repeat: int = 3,
+        cache_friendly: bool = False,
+) -> Dict[str, Any]:
+    """
+    Time a scenario `repeat` times (best run wins), then run it once more under
+    tracemalloc for the peak memory. Model statistics are those of a single run.
+    """
+    def _single_run(trace_memory: bool) -> Dict[str, Any]:
+        # No coalescing of identical in-flight calls: it would make the call counts depend on thread timing.
+        loader = CSVLoader(
+            path, name=scenario.name, model=model, cache_friendly_prompts=cache_friendly, coalesce_requests=False,
+        )
+        loader.set_schema(scenario.schema)
+        context = scenario.prepare(loader) if scenario.prepare else None
+        model.reset_stats()
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        scenario.run(loader, context, batch_size)
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return {'seconds': elapsed, 'rows': loader.num_rows, 'peak': peak, 'stats': model.stats}
+
+    runs = [_single_run(trace_memory=False) for _ in range(repeat)]
+    memory_run = _single_run(trace_memory=True)
+
+    best = min(run['seconds'] for run in runs)
+    rows = runs[0]['rows']
+    stats = runs[0]['stats']
+    return {
+        'rows': rows,
+        'seconds': round(best, 4),
+        'rows_per_sec': round(rows / best, 1) if best > 0 else float('inf'),
+        'peak_memory_mb': round(memory_run['peak'] / 2 ** 20, 2),
+        'llm_calls': stats['calls'],
+        'prompt_chars': stats['prompt_chars'],
+        'prompt_chars_per_call': round(stats['prompt_chars'] / stats['calls'], 1) if stats['calls'] else 0,
+        'completion_chars': stats['completion_chars'],
+        'cached_prompt_ratio': round(stats['cached_chars'] / stats['prompt_chars'], 4) if stats['prompt_chars'] else 0.0,
+    }
+
+
+def run_suite(
+        scale: int = 4,
+        latency: float = 0.0,
+        batch_size: int = 50,
+        repeat: int = 3,
+        only: Optional[List[str]] = None,
+        cache_friendly: bool = False,
+) -> Dict[str, Any]:
+    model = FakeChatModel(latency=latency, prefix_cache=True)
+    results: Dict[str, Any] = {
+        'config': {'scale': scale, 'latency': latency, 'batch_size': batch_size, 'cache_friendly': cache_friendly},
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scaled_paths: Dict[str, str] = {}
+        for scenario in SCENARIOS:
+            if only and scenario.name not in only:
+                continue
+            if scenario.source not in scaled_paths:
+                scaled_paths[scenario.source] = scale_dataset(scenario.source, scale, tmp_dir)
+            results['scenarios'][scenario.name] = run_scenario(
+                scenario, scaled_paths[scenario.source], model,
+                batch_size=batch_size, repeat=repeat, cache_friendly=cache_friendly,
+            )
+    return results
+
+
+# Counters that only depend on the code and the data, compared exactly; timings depend on the machine.
+EXACT_METRICS = ('llm_calls', 'prompt_chars', 'completion_chars')
+
+
+def compare_to_baseline(
+        results: Dict[str, Any],
+        baseline: Dict[str, Any],
+        tolerance: float = 0.25,
+        check_timing: bool = False,
+) -> List[str]:
+    """
+    Return a message for every regression against the baseline: a call count,
+    prompt or completion size that differs at all, or a peak memory higher by
+    more than `tolerance` (relative). Rows/sec lower by more than `tolerance`
+    is only a warning, as it depends on the machine, unless `check_timing`.
+    """
+    if results['config'] != baseline.get('config'):
+        print(f"Warning: baseline config {baseline.get('config')} differs from run config {results['config']}.")
+
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            print(f"Warning: scenario {name} is not in the baseline, run with --update-baseline.")
+            continue
+        for metric in EXACT_METRICS:
+            if current[metric] != previous[metric]:
+                regressions.append(f"{name}: {metric} {current[metric]} != baseline {previous[metric]}")
+        if current['peak_memory_mb'] > previous['peak_memory_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak_memory_mb {current['peak_memory_mb']} > baseline {previous['peak_memory_mb']}")
+        if current['rows_per_sec'] < previous['rows_per_sec'] * (1 - tolerance):
+            message = f"{name}: rows/sec {current['rows_per_sec']} < baseline {previous['rows_per_sec']}"
+            if check_timing:
+                regressions.append(message)
+            else:
+                print(f"Warning: {message} (timings are machine dependent).")
+    return regressions
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    header = (f"{'scenario':<28}{'rows':>8}{'sec':>10}{'rows/sec':>12}{'peak MB':>10}{'calls':>8}"
+              f"{'prompt chars':>14}{'cached %':>10}")
+    print(header)
+    print('-' * len(header))
+    for name, r in results['scenarios'].items():
+        print(f"{name:<28}{r['rows']:>8}{r['seconds']:>10.3f}{r['rows_per_sec']:>12.1f}"
+              f"{r['peak_memory_mb']:>10.2f}{r['llm_calls']:>8}{r['prompt_chars']:>14}"
+              f"{100 * r.get('cached_prompt_ratio', 0.0):>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Throughput benchmark of the CSVLoader fixers with an offline model.")
+    parser.add_argument('--scale', type=int, default=4, help="number of stacked copies of each dataset")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated model latency in seconds")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help="run only these scenarios")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="relative tolerance on peak memory and rows/sec")
+    parser.add_argument('--check-timing', action='store_true', help="fail on a rows/sec regression, not only warn")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', help="write the results as JSON to this path")
+    parser.add_argument('--cache-friendly', action='store_true',
+                        help="use the prefix-cache friendly prompts (cached %% comes from a simulated prompt cache)")
+    parser.add_argument('--trace', help="write stage timings to <TRACE>.json and a Chrome trace to <TRACE>.trace.json")
+    args = parser.parse_args(argv)
+
+    tracer = enable_tracing() if args.trace else None
+    results = run_suite(args.scale, args.latency, args.batch_size, args.repeat, args.only, args.cache_friendly)
+    print_results(results)
+
+    if tracer:
+        tracer.export_json(f"{args.trace}.json")
+        tracer.export_chrome_trace(f"{args.trace}.trace.json")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, skipping regression check.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.tolerance, args.check_timing)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
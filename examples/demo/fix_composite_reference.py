@@ -0,0 +1,23 @@
+from src.file_processing.csv import CSVLoader
+
+reference_data = CSVLoader('../public/economy_delivery_data/real_data_generate.csv')
+incorrect_data = CSVLoader('../public/economy_delivery_data/real_data_messy.csv')
+
+columns = ['CustomerCountry', 'CustomerCountryCode', 'Currency']
+list_improve = incorrect_data.fix_composite_reference_error(reference_data, columns, threshold=80)
+print(len(list_improve))
+
+incorrect_data.apply_improvements(list_improve)
+incorrect_data.data.to_csv('../public/economy_delivery_data/cleaned_composite_ref_data.csv', index=False)
+
+from benchmark.benchmark import benchmark_data_cleaning
+
+result = benchmark_data_cleaning(
+    clean_path="../public/economy_delivery_data/real_data_generate.csv",
+    messy_path="../public/economy_delivery_data/real_data_messy.csv",
+    cleaned_path="../public/economy_delivery_data/cleaned_composite_ref_data.csv",
+)
+
+print(f"Correction Rate: {result['correction_rate']:.2f}%")
+print(f"Remaining Errors: {result['remaining_errors']}")
+print(f"Corrected Errors: {result['corrected_errors']}")
@@ -0,0 +1,35 @@
+from langchain_groq import ChatGroq
+
+from src.file_processing.cascade import ModelCascade
+from src.file_processing.csv import CSVLoader
+from src.llm_providers import base_llm
+
+cascade = ModelCascade([
+    ChatGroq(model='llama-3.1-8b-instant'),
+    base_llm,
+])
+
+original_data = CSVLoader('../public/book/small_book_data.csv')
+schema = original_data.generate_schema().json_schema
+
+messy_data = CSVLoader('../public/book/book_messy_data_number.csv', cascade=cascade)
+messy_data.set_schema(schema)
+
+improvements, error = messy_data.fix_number_error(
+    column_list=['original_price', 'current_price'],
+    formation=[('original_price', '123456'), ('current_price', '123456')],
+    batch_size=100,
+    few_shot_context=[
+        ('1234.00', '1234'),
+        ('135000,000', '135000'),
+        ('4.00e+04', '40000'),
+    ]
+)
+print(len(improvements))
+print(len(error))
+for tier in cascade.stats:
+    print(f"{tier['model']}: {tier['calls']} calls, {tier['cells_fixed']} cells fixed, "
+          f"{tier['cells_escalated']} cells escalated")
+
+messy_data.apply_improvements(improvements)
+messy_data.data.to_csv('../public/book/book_messy_data_number_cascade_fixed.csv', index=False)
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Any, Tuple
+
+import pandas as pd
+
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+
+# Processes one batch and returns its improvements, its error cells and the rows to re-request.
+BatchProcessor = Callable[[pd.DataFrame], Tuple[List[ImprovesItem], List[NotImprovesItem], List[int]]]
+
+
+class BatchParseError(ValueError):
+    """A model reply to a batch that could not be parsed or validated."""
+
+
+@dataclass
+class FailurePolicy:
+    """
+    How a failed LLM batch is retried: a batch whose reply cannot be parsed
+    (BatchParseError) is split in halves recursively down to `min_batch_size`
+    rows, and rows left over by a partially salvaged response are re-requested,
+    at most `max_depth` levels deep. Any other error (transport, auth, rate
+    limit) fails the whole batch once, since smaller batches would not help.
+    """
+    min_batch_size: int = 1
+    max_depth: int = 8
+
+
+def _bisect(
+        batch_df: pd.DataFrame,
+        process: BatchProcessor,
+        policy: FailurePolicy,
+        batch_index: int,
+        depth: int,
+) -> Tuple[List[ImprovesItem], List[Any]]:
+    middle = len(batch_df) // 2
+    improvements: List[ImprovesItem] = []
+    cant_improvements: List[Any] = []
+    for half in (batch_df.iloc[:middle], batch_df.iloc[middle:]):
+        ok, ko = run_with_bisection(half, process, policy, batch_index, depth + 1)
+        improvements.extend(ok)
+        cant_improvements.extend(ko)
+    return improvements, cant_improvements
+
+
+def _failure(batch_index: int, rows: Any, error: str) -> Dict[str, Any]:
+    return {"batch_index": batch_index, "rows": [int(row) for row in rows], "error": error}
+
+
+def run_with_bisection(
+        batch_df: pd.DataFrame,
+        process: BatchProcessor,
+        policy: FailurePolicy,
+        batch_index: int,
+        depth: int = 0,
+) -> Tuple[List[ImprovesItem], List[Any]]:
+    """
+    Run `process` on a batch under `policy`. Rows that still fail at the
+    minimum batch size, and batches failing with anything but a
+    BatchParseError, are reported in the second list as
+    {"batch_index": ..., "rows": [...], "error": ...}, next to the error cells.
+    """
+    can_split = len(batch_df) > policy.min_batch_size and depth < policy.max_depth
+    try:
+        improves, errors, retry_rows = process(batch_df)
+    except BatchParseError as exc:
+        if not can_split:
+            return [], [_failure(batch_index, batch_df.index, str(exc))]
+        return _bisect(batch_df, process, policy, batch_index, depth)
+    except Exception as exc:
+        return [], [_failure(batch_index, batch_df.index, str(exc))]
+
+    improvements = list(improves or [])
+    cant_improvements: List[Any] = list(errors or [])
+    if not retry_rows:
+        return improvements, cant_improvements
+
+    if len(retry_rows) < len(batch_df) and depth < policy.max_depth:
+        ok, ko = run_with_bisection(batch_df.loc[retry_rows], process, policy, batch_index, depth + 1)
+    elif can_split:
+        ok, ko = _bisect(batch_df.loc[retry_rows], process, policy, batch_index, depth)
+    else:
+        ok, ko = [], [_failure(batch_index, retry_rows, "Rows could not be recovered from a malformed response.")]
+    improvements.extend(ok)
+    cant_improvements.extend(ko)
+    return improvements, cant_improvements
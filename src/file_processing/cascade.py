@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Dict, Any, Tuple, Optional, Sequence, Set, TYPE_CHECKING
+
+import pandas as pd
+
+from src.file_processing.batching import BatchProcessor, FailurePolicy, run_with_bisection
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+from src.llm_providers.metrics import extract_model_name
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+Cell = Tuple[int, str]
+# Processes one batch with the given model: (improvements, error cells, rows to re-request).
+TierProcessor = Callable[[pd.DataFrame, 'BaseChatModel'], Tuple[List[ImprovesItem], List[NotImprovesItem], List[int]]]
+# Returns the cells of a batch whose value after the proposed improvements fails local verification.
+CellVerifier = Callable[[pd.DataFrame, List[ImprovesItem]], Set[Cell]]
+
+
+@dataclass
+class TierStats:
+    """Work done by one tier: `cells_escalated` are the cells it handed to the next tier."""
+    model: str
+    calls: int = 0
+    failed_calls: int = 0
+    rows: int = 0
+    cells: int = 0
+    cells_fixed: int = 0
+    cells_escalated: int = 0
+    latency: float = 0.0
+
+
+def _cells_of(items: List[Any]) -> Set[Cell]:
+    cells: Set[Cell] = set()
+    for item in items:
+        for attr in item.attr:
+            cells.add((item.row, getattr(attr, 'name', attr)))
+    return cells
+
+
+def _restrict(items: List[Any], allowed: Set[Cell]) -> List[Any]:
+    """Keep only the cells of `items` in `allowed`."""
+    restricted = []
+    for item in items:
+        attr = [a for a in item.attr if (item.row, getattr(a, 'name', a)) in allowed]
+        if attr:
+            restricted.append(type(item)(row=item.row, attr=attr))
+    return restricted
+
+
+class ModelCascade:
+    """
+    Models tried from cheapest to strongest. Each batch goes to the first tier;
+    cells the tier lists as errors, leaves unanswered or proposes values for
+    that fail local verification are re-sent, alone, to the next tier. The
+    last tier's answer is final: when it fails, the fixes accepted from the
+    earlier tiers are kept and only the escalated cells are retried (bisected
+    with `failure_policy`) and, failing that, reported as errors.
+    """
+
+    def __init__(self, models: Sequence[BaseChatModel], failure_policy: Optional[FailurePolicy] = None):
+        if not models:
+            raise ValueError("A model cascade needs at least one model.")
+        self.models: List[BaseChatModel] = list(models)
+        self.failure_policy: FailurePolicy = failure_policy or FailurePolicy()
+        self._lock = threading.Lock()
+        self._stats = [TierStats(model=extract_model_name(None, model)) for model in self.models]
+
+    @property
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [asdict(tier) for tier in self._stats]
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = [TierStats(model=tier.model) for tier in self._stats]
+
+    def _record(self, tier: int, batch_df: pd.DataFrame, latency: float, fixed: int, escalated: int,
+                failed: bool = False) -> None:
+        with self._lock:
+            stats = self._stats[tier]
+            stats.calls += 1
+            stats.failed_calls += int(failed)
+            stats.rows += len(batch_df)
+            stats.cells += batch_df.size
+            stats.cells_fixed += fixed
+            stats.cells_escalated += escalated
+            stats.latency += latency
+
+    def processor(self, process: TierProcessor, verify: CellVerifier) -> BatchProcessor:
+        """Wrap a per-model batch processor into a cascading one, usable with run_with_bisection."""
+        def _run(batch_df: pd.DataFrame):
+            improvements: List[ImprovesItem] = []
+            cant_improvements: List[Any] = []
+            pending = batch_df
+            allowed: Optional[Set[Cell]] = None
+
+            for tier, model in enumerate(self.models):
+                last = tier == len(self.models) - 1
+                if last and allowed is not None:
+                    ok, ko = self._run_escalated(tier, model, process, pending, allowed)
+                    return improvements + ok, cant_improvements + ko, []
+                start = time.perf_counter()
+                try:
+                    improves, errors, retry_rows = process(pending, model)
+                except Exception:
+                    if last:
+                        self._record(tier, pending, time.perf_counter() - start, 0, 0, failed=True)
+                        raise
+                    improves, errors, retry_rows = [], [], list(pending.index)
+                    failed = True
+                else:
+                    failed = False
+                latency = time.perf_counter() - start
+
+                if allowed is not None:
+                    improves, errors = _restrict(improves, allowed), _restrict(errors, allowed)
+                    allowed_rows = {row for row, _ in allowed}
+                    retry_rows = [row for row in retry_rows if row in allowed_rows]
+
+                if last:
+                    # A single tier: nothing was accepted before, the caller retries the batch.
+                    self._record(tier, pending, latency, len(_cells_of(improves)), 0, failed)
+                    return improves, errors, retry_rows
+
+                uncertain = verify(pending, improves) | _cells_of(errors)
+                uncertain |= {(row, column) for row in retry_rows for column in pending.columns}
+                if allowed is not None:
+                    uncertain &= allowed
+                accepted = _restrict(improves, _cells_of(improves) - uncertain)
+                improvements.extend(accepted)
+                self._record(tier, pending, latency, len(_cells_of(accepted)), len(uncertain), failed)
+
+                if not uncertain:
+                    break
+                uncertain_rows = {row for row, _ in uncertain}
+                uncertain_columns = {column for _, column in uncertain}
+                pending = pending.loc[
+                    [row for row in pending.index if row in uncertain_rows],
+                    [column for column in pending.columns if column in uncertain_columns],
+                ]
+                allowed = uncertain
+
+            return improvements, cant_improvements, []
+
+        return _run
+
+    def _run_escalated(
+            self,
+            tier: int,
+            model: BaseChatModel,
+            process: TierProcessor,
+            pending: pd.DataFrame,
+            allowed: Set[Cell],
+    ) -> Tuple[List[ImprovesItem], List[Any]]:
+        """
+        The last tier on the cells escalated to it (`pending`, restricted to
+        `allowed`). Retries stay within those cells; the cells of rows it
+        still fails on are returned as errors, followed by a
+        {"rows": [...], "error": ...} record of the failure, so that these
+        rows are journaled as failed and not cached.
+        """
+        allowed_rows = {row for row, _ in allowed}
+
+        def _process(batch_df: pd.DataFrame):
+            start = time.perf_counter()
+            try:
+                improves, errors, retry_rows = process(batch_df, model)
+            except Exception:
+                self._record(tier, batch_df, time.perf_counter() - start, 0, 0, failed=True)
+                raise
+            improves, errors = _restrict(improves, allowed), _restrict(errors, allowed)
+            self._record(tier, batch_df, time.perf_counter() - start, len(_cells_of(improves)), 0)
+            return improves, errors, [row for row in retry_rows if row in allowed_rows]
+
+        improvements, outcomes = run_with_bisection(pending, _process, self.failure_policy, batch_index=-1)
+        errors: List[Any] = [item for item in outcomes if isinstance(item, NotImprovesItem)]
+        failures = [{"rows": item['rows'], "error": item['error']} for item in outcomes if isinstance(item, dict)]
+        failed_rows = {row for failure in failures for row in failure['rows']}
+        for row in pending.index:
+            columns = [column for column in pending.columns if (row, column) in allowed]
+            if row in failed_rows and columns:
+                errors.append(NotImprovesItem(row=row, attr=columns))
+        return improvements, errors + failures
@@ -1,24 +1,44 @@
+from __future__ import annotations
+
 import json
 import math
+import os
 import numbers
+import time
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pandas as pd
-from jsonschema import validators
-from jsonschema.validators import Draft202012Validator
-from langchain_core.language_models import BaseChatModel
-from langchain_core.prompts import ChatPromptTemplate
-from thefuzz import fuzz
-from typing import List, Dict, Any, Tuple, Optional
-
+from typing import List, Dict, Any, Tuple, Optional, Union, Set, Iterable, Iterator, TYPE_CHECKING
+
+from src.file_processing.batching import BatchParseError, FailurePolicy, BatchProcessor, run_with_bisection
+from src.file_processing.cascade import ModelCascade, TierProcessor
+from src.file_processing.journal import ImprovementJournal, file_hash as compute_file_hash, same_cell_value
+from src.file_processing.multi_task import (
+    ColumnTask,
+    LLM_TASKS,
+    TASK_PATTERN,
+    parse_column_tasks,
+    split_by_task,
+    task_prompt_inputs,
+)
+from src.file_processing.profiling import profile_frame, profile_csv
 from src.file_processing.regex import correct_to_pattern
+from src.file_processing.row_cache import RowResultCache, context_key
+from src.file_processing.sampling import representative_sample, sample_chunks
+from src.file_processing.schema_inference import infer_schema
+from src.file_processing.schema_merge import merge_schemas
+from src.file_processing.storage import SQLiteStorage
 from src.file_processing.schema import (
     CSVJsonSchemaResponse,
     PotentialErrorQueryResponse,
     ImprovesItem, NotImprovesItem
 )
-from src.llm_providers import base_llm
+from src.llm_providers.chains import chain_registry, JSON_OBJECT
+from src.llm_providers.metrics import LLMMetrics, record_llm_call, extract_model_name
+from src.llm_providers.parsing import salvage_error_response, parse_error_response, loads, ImprovementStore, remap_rows
+from src.llm_providers.rate_limit import invoke_with_limits, estimate_tokens
+from src.llm_providers.single_flight import single_flight, call_key
 from src.llm_providers.prompts import (
     FIND_JSON_SCHEMA_PROMPTS,
     SYSTEM_MESSAGE,
@@ -26,21 +46,119 @@ from src.llm_providers.prompts import (
     GET_DIRTY_DATA_ISSUE  # Note: This wasn't used in the original fix_error_schema method
 )
 from src.llm_providers.prompts_fix_data import PROMPT_FIX_NUMBER_FORMATION, PROMPT_FIX_DATETIME_FORMATION, \
-    FIX_GRAMMAR_PROMPTS
+    FIX_GRAMMAR_PROMPTS, CACHE_FRIENDLY_PROMPTS, PROMPT_FIX_MULTI_TASK
+from src.utils.tracing import tracer
+
+# jsonschema, thefuzz and langchain are imported where they are used, so importing the loader stays cheap.
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
+
+SCHEMA_MODES = ('llm', 'local', 'hybrid')
+# In storage mode, the fixers read this many batches per worker at a time from the database.
+STORAGE_WINDOW_BATCHES = 4
 
 
 class CSVLoader:
-    def __init__(self, filepath: str, name: str = '', model: BaseChatModel = base_llm):
+    def __init__(
+            self,
+            filepath: str,
+            name: str = '',
+            model: Optional[BaseChatModel] = None,
+            metrics: Optional[LLMMetrics] = None,
+            cache_friendly_prompts: bool = False,
+            cascade: Optional[ModelCascade] = None,
+            coalesce_requests: bool = True,
+            storage_path: Optional[str] = None,
+            journal: Optional[ImprovementJournal] = None,
+            row_cache: Optional[RowResultCache] = None,
+    ):
+        """
+        With `cache_friendly_prompts`, the fixers use the prompt variants that put
+        the batch data last and send minified schemas and batch-local row ids, so
+        consecutive calls share a prefix the provider can cache. With `cascade`,
+        the batch fixers go through its models (cheapest first) instead of `model`,
+        which defaults to `base_llm`, created on the first model call.
+        With `coalesce_requests`, a call identical to one already in flight (from
+        any loader of the process) waits for and shares its response.
+        With `storage_path`, the data is kept in that SQLite database instead of
+        memory (see `SQLiteStorage`): the fixers read it batch by batch and
+        `apply_improvements` updates it in place. An existing database is
+        reused as is, so a long job can resume after a crash; `read_data`
+        reloads it from the file. With `journal`, the results of every fixer
+        call are recorded there with the old values, the file hash, fixer and model.
+        With `row_cache`, the LLM fixers only send rows whose content (for the
+        same fixer, schema, formats, examples and model) has no cached result.
+        """
         self.filepath: str = filepath
         self.name: str = name
-        self.data: pd.DataFrame = pd.read_csv(filepath)
+        self.storage: Optional[SQLiteStorage] = None
+        if storage_path is not None:
+            self.storage = SQLiteStorage(storage_path)
+            if not self.storage.exists():
+                with tracer.span('load_storage', file=filepath):
+                    self.storage.load_csv(filepath)
+        else:
+            with tracer.span('read_csv', file=filepath):
+                self.data = pd.read_csv(filepath)
         self.schema: Dict[str, Any] = {}
-        self.model: BaseChatModel = model
+        self._model: Optional[BaseChatModel] = model
+        self.metrics: Optional[LLMMetrics] = metrics
+        self.cache_friendly_prompts: bool = cache_friendly_prompts
+        self.cascade: Optional[ModelCascade] = cascade
+        self.coalesce_requests: bool = coalesce_requests
         self.list_improvements: List[ImprovesItem] = []
+        self.journal: Optional[ImprovementJournal] = journal
+        self.row_cache: Optional[RowResultCache] = row_cache
+        self._file_hash: Optional[Tuple[Tuple[int, int], str]] = None
+
+    @property
+    def model(self) -> BaseChatModel:
+        if self._model is None:
+            from src.llm_providers.llm import get_base_llm
+            self._model = get_base_llm()
+        return self._model
+
+    @model.setter
+    def model(self, model: BaseChatModel) -> None:
+        self._model = model
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """The data; in storage mode, a copy of the whole table read from the database."""
+        if self.storage is not None:
+            return self.storage.read_all()
+        return self._data
+
+    @data.setter
+    def data(self, df: pd.DataFrame) -> None:
+        if self.storage is not None:
+            self.storage.write_frame(df)
+        else:
+            self._data = df
+
+    @property
+    def columns(self) -> List[str]:
+        return self.storage.columns if self.storage is not None else self._data.columns.tolist()
+
+    @property
+    def file_hash(self) -> str:
+        """Content hash of the file, recomputed only when its size or modification time changes."""
+        stat = os.stat(self.filepath)
+        version = (stat.st_size, stat.st_mtime_ns)
+        if self._file_hash is None or self._file_hash[0] != version:
+            self._file_hash = (version, compute_file_hash(self.filepath))
+        return self._file_hash[1]
 
     def read_data(self, filepath: str) -> None:
         self.filepath = filepath
-        self.data = pd.read_csv(filepath)
+        if self.storage is not None:
+            with tracer.span('load_storage', file=filepath):
+                self.storage.load_csv(filepath)
+        else:
+            with tracer.span('read_csv', file=filepath):
+                self.data = pd.read_csv(filepath)
         self.schema = {}
 
     def to_str(self) -> str:
@@ -53,85 +171,179 @@ class CSVLoader:
         return self.data.to_dict()
 
     def filter_with_column_names(self, column_names: List[str]) -> pd.DataFrame:
+        if self.storage is not None:
+            return self.storage.read_all(column_names)
         return self.data[column_names]
 
     @property
     def num_rows(self) -> int:
-        return self.data.shape[0]
+        if self.storage is not None:
+            return self.storage.num_rows
+        return self._data.shape[0]
 
     def get_sample_data(self, sample_size: int) -> pd.DataFrame:
         sample_size = min(sample_size, self.data.num_rows)
         return self.data.sample(n=sample_size, random_state=42) # Keep random_state for reproducibility
 
-    def get_range_data(self, start_index: int, end_index: int) -> pd.DataFrame:
-        if not (0 <= start_index <= end_index <= self.num_rows):
+    def get_range_data(self, start_index: int, end_index: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        num_rows = self.num_rows
+        if not (0 <= start_index <= end_index <= num_rows):
             raise ValueError(
                 f"Invalid index range [{start_index}:{end_index}]. "
-                f"Must be within [0:{self.num_rows}]."
+                f"Must be within [0:{num_rows}]."
             )
-        return self.data.iloc[start_index:end_index]
+        if self.storage is not None:
+            return self.storage.read_range(start_index, end_index, columns)
+        data = self._data if columns is None else self._data[columns]
+        return data.iloc[start_index:end_index]
+
+    def _range_windows(self, ranges: List[Tuple[int, int]], workers: Optional[int]) -> List[List[Tuple[int, int]]]:
+        """All ranges at once in memory; in storage mode, a few batches per worker at a time, to bound memory."""
+        if self.storage is None:
+            return [ranges]
+        window = max(1, workers or 32) * STORAGE_WINDOW_BATCHES
+        return [ranges[start:start + window] for start in range(0, len(ranges), window)]
+
+    def _batch_windows(
+            self,
+            columns: List[str],
+            batch_size: int,
+            workers: Optional[int],
+    ) -> Iterator[List[pd.DataFrame]]:
+        """Row batches of `columns`: all of them in memory; in storage mode, read one window at a time (see `_range_windows`)."""
+        ranges = self._scan_error_ranges(batch_size)
+        if self.storage is None:
+            data = self._data[columns]
+            yield [data.iloc[start:end].copy() for start, end in ranges]
+            return
+        for window in self._range_windows(ranges, workers):
+            yield [self.storage.read_range(start, end, columns) for start, end in window]
 
     @staticmethod
-    def get_column_info(df: pd.DataFrame, unique_threshold: int = 20) -> List[Dict[str, Any]]:
-        column_summaries = []
-
-        for col_name in df.columns:
-            col_series = df[col_name]
-            total_count = len(col_series)
-            null_count = col_series.isnull().sum()
-            unique_count = col_series.nunique()
-
-            summary = {
-                'column_name': col_name,
-                'dtype': str(col_series.dtype),
-                'non_null_count': total_count - null_count,
-                'null_count': null_count,
-                'null_percentage': round((null_count / total_count) * 100, 2) if total_count > 0 else 0,
-                'unique_count': unique_count,
-            }
-
-            # Determine type category
-            if pd.api.types.is_numeric_dtype(col_series):
-                summary['type_category'] = 'numerical'
-            elif pd.api.types.is_datetime64_any_dtype(col_series):
-                summary['type_category'] = 'datetime'
-            elif pd.api.types.is_categorical_dtype(col_series):
-                summary['type_category'] = 'categorical'
-            elif pd.api.types.is_bool_dtype(col_series):
-                summary['type_category'] = 'boolean'
-                summary['value_distribution'] = col_series.value_counts().to_dict()
-            else:
-                summary['type_category'] = 'string/object'
-
-            # Handle unique values display
-            non_null_series = col_series.dropna()
-            if unique_count <= unique_threshold:
-                summary['unique_values'] = non_null_series.unique().tolist()
-            else:
-                sample_n = min(unique_threshold, unique_count)
-                sample_n = min(sample_n, len(non_null_series))
-                if sample_n > 0:
-                     summary['unique_sample'] = non_null_series.sample(
-                         n=sample_n,
-                         random_state=42
-                     ).tolist()
-                else:
-                    summary['unique_sample'] = []
-
-
-            column_summaries.append(summary)
+    def get_column_info(
+            df: pd.DataFrame,
+            unique_threshold: int = 20,
+            sketch: bool = False,
+            chunksize: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        One summary per column (nulls, distinct values, sample, top values,
+        numeric range and quantiles), from a single hashing pass per
+        column. With `sketch`, distinct counts use HyperLogLog and the frame
+        is read `chunksize` rows at a time, in bounded memory.
+        """
+        with tracer.span('column_info', rows=len(df), columns=len(df.columns)):
+            return profile_frame(df, unique_threshold, sketch=sketch, chunksize=chunksize)
+
+    def profile(self, unique_threshold: int = 20, sketch: bool = True, chunksize: int = 100_000) -> List[Dict[str, Any]]:
+        """`get_column_info` of the file this loader was read from, streamed from disk and cached per file version."""
+        with tracer.span('profile_csv', file=self.filepath):
+            return profile_csv(self.filepath, chunksize, unique_threshold, sketch=sketch)
+
+    def _chain(self, prompt_template: str, model: Optional[BaseChatModel] = None) -> Runnable:
+        """The compiled JSON-mode chain of `prompt_template` for `model` (default: this loader's), shared across threads."""
+        return chain_registry.get(model or self.model, prompt_template, SYSTEM_MESSAGE, JSON_OBJECT)
+
+    def _prompt_value(self, value: Any) -> str:
+        """Render a prompt input: minified JSON in cache-friendly mode, `str()` otherwise."""
+        if self.cache_friendly_prompts:
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+        return str(value)
+
+    def _prompt_batch(self, prompt: str, df: pd.DataFrame) -> Tuple[str, pd.DataFrame]:
+        """The prompt variant and the batch as sent to the model (batch-local row ids in cache-friendly mode)."""
+        if self.cache_friendly_prompts:
+            return CACHE_FRIENDLY_PROMPTS.get(prompt, prompt), df.reset_index(drop=True)
+        return prompt, df
+
+    def _invoke_llm(
+            self,
+            prompt_template: str,
+            input_data: Dict[str, Any],
+            labels: Optional[Dict[str, Any]] = None,
+            model: Optional[BaseChatModel] = None,
+    ) -> Any:
+        """Call the model in JSON mode and return its raw response. `labels` (fixer, column, batch, rows) tag the call in `self.metrics`."""
+        return self._call_chain(self._chain(prompt_template, model), prompt_template, input_data, labels or {}, model)
+
+    def _call_chain(
+            self,
+            chain: Runnable,
+            prompt_template: str,
+            input_data: Dict[str, Any],
+            labels: Dict[str, Any],
+            model: Optional[BaseChatModel] = None,
+    ) -> Any:
+        model = model or self.model
+        def _call():
+            with tracer.span('model_call', loader=self.name):
+                return chain.invoke(input=input_data)
+
+        def _call_with_limits():
+            start = time.perf_counter()
+            try:
+                response, retries = invoke_with_limits(
+                    _call,
+                    estimate_tokens(SYSTEM_MESSAGE, prompt_template, *input_data.values()),
+                )
+            except Exception as e:
+                record_llm_call(self.metrics, labels, None, model, time.perf_counter() - start,
+                                error=True, retries=getattr(e, 'llm_retries', 0))
+                raise
+            record_llm_call(self.metrics, labels, response, model, time.perf_counter() - start, retries=retries)
+            return response
 
-        return column_summaries
+        if not self.coalesce_requests:
+            return _call_with_limits()
+        # Only the caller that runs the request records it in the metrics; the others get its response.
+        key = call_key(model, SYSTEM_MESSAGE, prompt_template, input_data, JSON_OBJECT)
+        return single_flight.do(key, _call_with_limits)
 
-    def _invoke_llm_for_json(self, prompt_template: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        message = [('system', SYSTEM_MESSAGE), ('human', prompt_template)]
-        chain_message = ChatPromptTemplate.from_messages(message)
-        chain = chain_message | self.model
-        chain = chain.bind(response_format="json_object")
-        response = chain.invoke(input=input_data)
+    def _batch_runner(self, prompt_template: str) -> Runnable:
+        from langchain_core.runnables import RunnableLambda
+        chain = self._chain(prompt_template)
+        return RunnableLambda(lambda request: self._call_chain(chain, prompt_template, request[0], request[1]))
 
+    def _invoke_llm_batch(
+            self,
+            prompt_template: str,
+            inputs: List[Dict[str, Any]],
+            labels: Optional[List[Dict[str, Any]]] = None,
+            max_concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        Submit many inputs of one prompt through LangChain's `batch`. Every call
+        still goes through the rate limiter and metrics; failed calls are
+        returned as their exception, in input order.
+        """
+        requests = list(zip(inputs, labels or [{} for _ in inputs]))
+        return self._batch_runner(prompt_template).batch(
+            requests, config={'max_concurrency': max_concurrency}, return_exceptions=True,
+        )
+
+    async def _ainvoke_llm_batch(
+            self,
+            prompt_template: str,
+            inputs: List[Dict[str, Any]],
+            labels: Optional[List[Dict[str, Any]]] = None,
+            max_concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """Async counterpart of `_invoke_llm_batch`, through LangChain's `abatch`."""
+        requests = list(zip(inputs, labels or [{} for _ in inputs]))
+        return await self._batch_runner(prompt_template).abatch(
+            requests, config={'max_concurrency': max_concurrency}, return_exceptions=True,
+        )
+
+    def _invoke_llm_for_json(
+            self,
+            prompt_template: str,
+            input_data: Dict[str, Any],
+            labels: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        response = self._invoke_llm(prompt_template, input_data, labels)
         try:
-            return json.loads(response.content)
+            with tracer.span('json_parse'):
+                return loads(response.content)
         except json.JSONDecodeError as e:
             raise ValueError(f"LLM response is not valid JSON: {e}\nResponse content: {response.content}")
         except AttributeError:
@@ -139,7 +351,7 @@ class CSVLoader:
 
 
     def valid_column_info(self, column_info: Dict[str, Any]) -> bool:
-        list_column = self.data.columns.to_list()
+        list_column = self.columns
         for key in column_info:
             if key not in list_column:
                 return False
@@ -152,58 +364,139 @@ class CSVLoader:
         null_fraction: float = 0.30,
         random_state: int | None = None
     ) -> pd.DataFrame:
-        rng = np.random.default_rng(random_state)
-        df = self.data
-        selected: set[int] = set()
-
-        for col in df.columns:
-            null_idx = df.index[df[col].isna()]
-            non_idx = df.index[df[col].notna()]
-            if len(null_idx):
-                selected.update(rng.choice(null_idx, min(per_column_quota, len(null_idx)), replace=False))
-            if len(non_idx):
-                selected.update(rng.choice(non_idx, min(per_column_quota, len(non_idx)), replace=False))
-
-        null_rows = df.index[df.isna().any(axis=1)]
-        non_rows = df.index.difference(null_rows)
-        need_null = min(int(sample_size * null_fraction), len(null_rows))
-        need_non = min(sample_size - need_null, len(non_rows))
-        selected.update(rng.choice(null_rows, need_null, replace=False))
-        selected.update(rng.choice(non_rows, need_non, replace=False))
-
-        selected = list(selected)
-        if len(selected) > sample_size:
-            selected = rng.choice(selected, sample_size, replace=False)
-        elif len(selected) < sample_size:
-            remaining = df.index.difference(selected)
-            extra = rng.choice(remaining, sample_size - len(selected), replace=False)
-            selected = np.concatenate([selected, extra])
-
-        return df.loc[selected].sample(frac=1, random_state=random_state)
+        if self.storage is not None:
+            return sample_chunks(self.storage.iter_chunks(), sample_size, per_column_quota, null_fraction, random_state)
+        return representative_sample(self.data, sample_size, per_column_quota, null_fraction, random_state)
 
     def generate_schema(
             self,
             reference_data: pd.DataFrame = pd.DataFrame(),
             other_column_info: dict[str, Any] = {},
-            sample_size: int = 50
+            sample_size: int = 50,
+            num_samples: int = 1,
+            max_concurrency: Optional[int] = None,
+            enum_cap: int = 50,
+            random_state: Optional[int] = None,
+            mode: str = 'llm',
         ) -> CSVJsonSchemaResponse:
+        """
+        Infer the JSON schema from a representative sample. With `num_samples`
+        > 1, that many samples (different seeds) are sent concurrently and the
+        schemas merged with `merge_schemas` (widened types, enums united up to
+        `enum_cap`, patterns checked against the whole data), which catches
+        rare formats and values for the wall time of about one call.
+
+        `mode` 'local' infers the schema from the data alone (`infer_schema`);
+        'hybrid' does the same, then asks the model only about the columns the
+        local inference found ambiguous.
+        """
+        if mode not in SCHEMA_MODES:
+            raise ValueError(f"Invalid schema mode '{mode}', expected one of {SCHEMA_MODES}.")
         if not self.valid_column_info(other_column_info):
             raise ValueError("The 'other_column_info' parameter must not contain column names that are not in the reference data.")
 
-        sample_data = self._get_representative_sample(sample_size)
-
-        input_payload = {
-            "data": sample_data.to_csv(index=False),
-            "ref_data": reference_data.to_json(),
-            "column_info": str(other_column_info), # Provide structured info
+        model_args = (reference_data, sample_size, num_samples, max_concurrency, enum_cap, random_state)
+        if mode == 'llm':
+            return self._generate_model_schema(self.columns, other_column_info, *model_args)
+
+        data = self.data
+        with tracer.span('infer_schema', rows=len(data), columns=len(data.columns)):
+            local_schema, ambiguous = infer_schema(data, self.get_column_info(data))
+        other_info = f"Inferred locally from {len(data)} rows."
+        if mode == 'local' or not ambiguous:
+            if ambiguous:
+                other_info += f" Ambiguous columns: {', '.join(ambiguous)}."
+            return CSVJsonSchemaResponse(json_schema=local_schema, other_info=other_info)
+
+        column_info = {column: info for column, info in other_column_info.items() if column in ambiguous}
+        model_response = self._generate_model_schema(ambiguous, column_info, *model_args)
+        model_properties = model_response.json_schema.get('properties', {})
+        model_required = set(model_response.json_schema.get('required', []))
+
+        json_schema = dict(local_schema)
+        json_schema['properties'] = {
+            column: model_properties.get(column, schema) if column in ambiguous else schema
+            for column, schema in local_schema['properties'].items()
         }
+        required = [
+            column for column in data.columns
+            if (column in model_required if column in ambiguous and column in model_properties
+                else column in local_schema.get('required', []))
+        ]
+        if required:
+            json_schema['required'] = required
+        else:
+            json_schema.pop('required', None)
+        other_info += f" Refined by the model: {', '.join(ambiguous)}. {model_response.other_info}"
+        return CSVJsonSchemaResponse(json_schema=json_schema, other_info=other_info.strip())
 
-        prompt = FIND_JSON_SCHEMA_PROMPTS
-        content_json = self._invoke_llm_for_json(prompt, input_payload)
+    def _generate_model_schema(
+            self,
+            columns: List[str],
+            other_column_info: dict[str, Any],
+            reference_data: pd.DataFrame,
+            sample_size: int,
+            num_samples: int,
+            max_concurrency: Optional[int],
+            enum_cap: int,
+            random_state: Optional[int],
+    ) -> CSVJsonSchemaResponse:
+        """Ask the model for the schema of `columns`, from one sample or `num_samples` merged ones."""
+        if num_samples <= 1:
+            with tracer.span('representative_sample', rows=sample_size):
+                sample_data = self._get_representative_sample(sample_size, random_state=random_state)[columns]
+            input_payload = self._schema_request(sample_data, reference_data, other_column_info)
+            labels = {'fixer': 'generate_schema', 'rows': len(sample_data)}
+            return self._parse_schema_response(self._invoke_llm_for_json(FIND_JSON_SCHEMA_PROMPTS, input_payload, labels))
+
+        seed = random_state if random_state is not None else 0
+        with tracer.span('representative_sample', rows=sample_size * num_samples):
+            samples = [
+                self._get_representative_sample(sample_size, random_state=seed + i)[columns]
+                for i in range(num_samples)
+            ]
+        inputs = [self._schema_request(sample, reference_data, other_column_info) for sample in samples]
+        labels = [{'fixer': 'generate_schema', 'batch': i, 'rows': len(sample)} for i, sample in enumerate(samples)]
+        responses = self._invoke_llm_batch(FIND_JSON_SCHEMA_PROMPTS, inputs, labels, max_concurrency)
 
-        try:
+        schema_responses: List[CSVJsonSchemaResponse] = []
+        errors: List[Exception] = []
+        for i, response in enumerate(responses):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                with tracer.span('json_parse'):
+                    content_json = loads(response.content)
+                schema_responses.append(self._parse_schema_response(content_json))
+            except (ValueError, AttributeError) as e:
+                print(f"Warning: Schema generation failed for sample {i}, merging without it: {e}")
+                errors.append(e)
+        if not schema_responses:
+            raise ValueError(f"Schema generation failed for every sample: {errors[0]}")
+
+        with tracer.span('merge_schemas', samples=len(schema_responses)):
+            json_schema = merge_schemas([r.json_schema for r in schema_responses], self.filter_with_column_names(columns), enum_cap)
+        other_info = "\n".join(dict.fromkeys(r.other_info for r in schema_responses if r.other_info))
+        return CSVJsonSchemaResponse(json_schema=json_schema, other_info=other_info)
+
+    def _schema_request(
+            self,
+            sample_data: pd.DataFrame,
+            reference_data: pd.DataFrame,
+            other_column_info: dict[str, Any],
+    ) -> Dict[str, str]:
+        with tracer.span('serialize_prompt', rows=len(sample_data)):
+            return {
+                "data": sample_data.to_csv(index=False),
+                "ref_data": reference_data.to_json(),
+                "column_info": str(other_column_info), # Provide structured info
+            }
 
-            schema_response = CSVJsonSchemaResponse(**content_json)
+    @staticmethod
+    def _parse_schema_response(content_json: Dict[str, Any]) -> CSVJsonSchemaResponse:
+        try:
+            with tracer.span('pydantic_parse'):
+                schema_response = CSVJsonSchemaResponse(**content_json)
             return schema_response
         except (TypeError, KeyError, ValueError) as e:
             raise ValueError(f"Invalid JSON structure received from LLM for schema generation: {e}")
@@ -213,53 +506,107 @@ class CSVLoader:
         """Generates and assigns the JSON schema to the instance's schema attribute."""
         self.schema = schema
 
-    def _scan_error_for_range(
+    def _scan_error_request(
             self,
             schema: Dict[str, Any],
             row_range: Tuple[int, int],
-            prompt: str = GET_ISSUE_OF_DATA,
             other_context: str = ''
-    ) -> PotentialErrorQueryResponse:
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         start_idx, end_idx = row_range
         range_data = self.get_range_data(start_idx, end_idx)
-        input_payload = {
-            "schema": json.dumps(schema, indent=2),
-            "data": range_data.to_csv(index=False),
-            "context": other_context,
-        }
-
-        content_json = self._invoke_llm_for_json(prompt, input_payload)
+        with tracer.span('serialize_prompt', rows=len(range_data)):
+            input_payload = {
+                "schema": self._prompt_value(schema) if self.cache_friendly_prompts else json.dumps(schema, indent=2),
+                "data": range_data.to_csv(index=False),
+                "context": other_context,
+            }
+        labels = {'fixer': 'scan_error', 'batch': start_idx, 'rows': len(range_data)}
+        return input_payload, labels
 
+    @staticmethod
+    def _parse_scan_response(response: Any) -> PotentialErrorQueryResponse:
         try:
-            error_response = PotentialErrorQueryResponse(**content_json)
+            with tracer.span('pydantic_parse'):
+                error_response = parse_error_response(response.content)
             if not isinstance(error_response.improves, list):
                 raise ValueError("The 'improves' field in the response is not a list.")
             return error_response
-        except (TypeError, KeyError, ValueError) as e:
+        except (TypeError, KeyError, ValueError, AttributeError) as e:
             raise ValueError(f"Invalid JSON structure received from LLM for error scanning: {e}")
-        except json.JSONDecodeError:
-             print(f"Warning: Returning empty improvements due to JSON decode error during error scan for range {row_range}.")
-             return PotentialErrorQueryResponse(improves=[]) # Graceful fallback
 
-    def scan_error(self, schema: Dict[str, Any], batch_size: int = 10, prompt: str = GET_ISSUE_OF_DATA, other_context: str = '') -> List[ImprovesItem]:
-        all_improvements: List[ImprovesItem] = []
-        total_rows = self.num_rows
+    def _scan_error_for_range(
+            self,
+            schema: Dict[str, Any],
+            row_range: Tuple[int, int],
+            prompt: str = GET_ISSUE_OF_DATA,
+            other_context: str = ''
+    ) -> PotentialErrorQueryResponse:
+        input_payload, labels = self._scan_error_request(schema, row_range, other_context)
+        return self._parse_scan_response(self._invoke_llm(prompt, input_payload, labels))
 
-        for start_index in range(0, total_rows, batch_size):
-            end_index = min(start_index + batch_size, total_rows)
-            if start_index == end_index: #
-                continue
+    def _scan_error_ranges(self, batch_size: int) -> List[Tuple[int, int]]:
+        return [
+            (start_index, min(start_index + batch_size, self.num_rows))
+            for start_index in range(0, self.num_rows, batch_size)
+        ]
 
+    def _collect_scan_responses(self, ranges: List[Tuple[int, int]], responses: List[Any]) -> List[ImprovesItem]:
+        all_improvements: List[ImprovesItem] = []
+        for (start_index, end_index), response in zip(ranges, responses):
             try:
-                batch_response = self._scan_error_for_range(schema=schema, row_range=(start_index, end_index), prompt=prompt, other_context=other_context)
-                all_improvements.extend(batch_response.improves)
+                if isinstance(response, Exception):
+                    raise response
+                all_improvements.extend(self._parse_scan_response(response).improves)
             except ValueError as e:
                 print(f"Warning: Skipping batch {start_index}-{end_index} due to error: {e}")
-
         return all_improvements
 
+    def scan_error(
+            self,
+            schema: Dict[str, Any],
+            batch_size: int = 10,
+            prompt: str = GET_ISSUE_OF_DATA,
+            other_context: str = '',
+            max_concurrency: Optional[int] = None,
+    ) -> List[ImprovesItem]:
+        improvements: List[ImprovesItem] = []
+        for ranges in self._range_windows(self._scan_error_ranges(batch_size), max_concurrency):
+            requests = [self._scan_error_request(schema, row_range, other_context) for row_range in ranges]
+            responses = self._invoke_llm_batch(
+                prompt,
+                [payload for payload, _ in requests],
+                [labels for _, labels in requests],
+                max_concurrency=max_concurrency,
+            )
+            improvements.extend(self._collect_scan_responses(ranges, responses))
+        return improvements
+
+    async def ascan_error(
+            self,
+            schema: Dict[str, Any],
+            batch_size: int = 10,
+            prompt: str = GET_ISSUE_OF_DATA,
+            other_context: str = '',
+            max_concurrency: Optional[int] = None,
+    ) -> List[ImprovesItem]:
+        """Async `scan_error`: all batches (of a window, in storage mode) are submitted at once through `abatch`."""
+        improvements: List[ImprovesItem] = []
+        for ranges in self._range_windows(self._scan_error_ranges(batch_size), max_concurrency):
+            requests = [self._scan_error_request(schema, row_range, other_context) for row_range in ranges]
+            responses = await self._ainvoke_llm_batch(
+                prompt,
+                [payload for payload, _ in requests],
+                [labels for _, labels in requests],
+                max_concurrency=max_concurrency,
+            )
+            improvements.extend(self._collect_scan_responses(ranges, responses))
+        return improvements
+
     @staticmethod
     def validate_row(row_data: Dict[str, Any], schema: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from jsonschema import validators
+        from jsonschema.validators import Draft202012Validator
+
         def is_nan(x):
             return isinstance(x, numbers.Real) and math.isnan(x)
         def validator_accepting_nan_as_null(base_cls):
@@ -367,9 +714,95 @@ class CSVLoader:
             ) from e
 
 
-    def apply_improvements(self, improvements: List[ImprovesItem]) -> pd.DataFrame:
-        df_copy = self.data # Operate directly on the internal DataFrame
+    def _cell_values(self, cells: Iterable[Tuple[int, str]]) -> Dict[Tuple[int, str], Any]:
+        """Current values of (row, column) cells, read column by column; unknown cells are left out."""
+        rows_by_column: Dict[str, List[int]] = {}
+        num_rows = self.num_rows
+        for row, column in cells:
+            if 0 <= row < num_rows:
+                rows_by_column.setdefault(column, []).append(row)
+
+        values: Dict[Tuple[int, str], Any] = {}
+        columns = set(self.columns)
+        for column, rows in rows_by_column.items():
+            if column not in columns:
+                continue
+            if self.storage is not None:
+                column_values = self.storage.read_cells(column, rows)
+                values.update(((row, column), value) for row, value in column_values.items())
+            else:
+                column_values = self._data[column].to_numpy()[rows]
+                values.update(((row, column), value) for row, value in zip(rows, column_values))
+        return values
+
+    def _model_label(self, local: bool = False) -> Optional[str]:
+        """The model (or cascade tiers, cheapest first) the fixers used; None for local fixers."""
+        if local:
+            return None
+        if self.cascade is not None:
+            return '>'.join(extract_model_name(None, model) for model in self.cascade.models)
+        return extract_model_name(None, self.model)
+
+    def _journal_run(
+            self,
+            fixer: str,
+            improvements: List[ImprovesItem],
+            cant_improvements: List[Any] = (),
+            local: bool = False,
+    ) -> None:
+        """Record the results of a fixer call in the journal, if the loader has one."""
+        if self.journal is None:
+            return
+        with tracer.span('journal', fixer=fixer, items=len(improvements)):
+            old_values = self._cell_values((item.row, cell.name) for item in improvements for cell in item.attr)
+            self.journal.record(
+                improvements,
+                cant_improvements,
+                file_hash=self.file_hash,
+                file_path=self.filepath,
+                fixer=fixer,
+                model=self._model_label(local),
+                old_values=old_values,
+            )
+
+    def reapply_improvements(
+            self,
+            run_id: Optional[str] = None,
+            file_hash: Optional[str] = None,
+            fixer: Optional[str] = None,
+            check_old_values: bool = True,
+    ) -> int:
+        """
+        Apply fixes recorded in the journal (of one run, file version and/or
+        fixer) without calling the model, e.g. to a new version of the file.
+        With `check_old_values`, a fix is applied only where the cell still
+        holds the value it was fixed from. Returns the number of cells applied.
+        """
+        if self.journal is None:
+            raise ValueError("This loader has no journal to reapply improvements from.")
+        fixes = self.journal.fixes(run_id, file_hash, fixer)
+        if check_old_values:
+            current = self._cell_values((row, column) for row, column, _, _ in fixes)
+            matching = [fix for fix in fixes if (fix[0], fix[1]) in current
+                        and same_cell_value(current[(fix[0], fix[1])], fix[2])]
+            if len(matching) < len(fixes):
+                print(f"Warning: Skipping {len(fixes) - len(matching)} recorded fixes whose cell changed since.")
+            fixes = matching
+
+        store = ImprovementStore()
+        for row, column, _, new_value in fixes:
+            store.add(row, column, new_value)
+        self.apply_improvements(store)
+        return len(store)
+
+    def apply_improvements(self, improvements: List[ImprovesItem] | ImprovementStore) -> Optional[pd.DataFrame]:
+        """Apply the fixes to the data and return it; in storage mode, update the database and return None."""
+        with tracer.span('apply_improvements', items=len(improvements)):
+            return self._apply_improvements(improvements)
 
+    @staticmethod
+    def _improvement_cells(improvements: List[ImprovesItem]):
+        """Yield (row, column, value) for every cell fix of `improvements`."""
         for item in improvements:
             row_idx = getattr(item, 'row', getattr(getattr(item, 'position', None), 'row', None))
             if row_idx is None:
@@ -382,53 +815,78 @@ class CSVLoader:
                  print(f"Warning: Skipping improvement item - invalid row index '{row_idx}': {item}")
                  continue
 
-            if not (0 <= row_idx < self.num_rows):
-                print(f"Warning: Skipping improvement for out-of-bounds row index {row_idx}.")
+            for cell_fix in item.attr:
+                yield row_idx, cell_fix.name, cell_fix.value
+
+    def _parsed_cells(self, improvements: List[ImprovesItem] | ImprovementStore, dtypes: Dict[str, Any]):
+        """Yield (row, column, parsed value) for the valid cell fixes, typed from the schema or else `dtypes`."""
+        cells = improvements if isinstance(improvements, ImprovementStore) else self._improvement_cells(improvements)
+        num_rows = self.num_rows
+        skipped_rows = set()
+        for row_idx, col_name, new_value_str in cells:
+            if not (0 <= row_idx < num_rows):
+                if row_idx not in skipped_rows:
+                    print(f"Warning: Skipping improvement for out-of-bounds row index {row_idx}.")
+                    skipped_rows.add(row_idx)
                 continue
 
-            for cell_fix in item.attr:
-                col_name = cell_fix.name
-                new_value_str = cell_fix.value
-
-                if col_name not in df_copy.columns:
-                     print(f"Warning: Skipping fix for unknown column '{col_name}' at row {row_idx}.")
-                     continue
-
-                target_type: Any
-                if self.schema and 'properties' in self.schema and col_name in self.schema['properties']:
-                    # Prefer schema type if available
-                    target_type = self.schema['properties'][col_name].get('type', df_copy[col_name].dtype)
-                    if isinstance(target_type, list):
-                        target_type = next((t for t in target_type if t != "null"), target_type[0])
-                else:
-                    target_type = df_copy[col_name].dtype
+            if col_name not in dtypes:
+                 print(f"Warning: Skipping fix for unknown column '{col_name}' at row {row_idx}.")
+                 continue
 
-                try:
-                    parsed_value = self.parse_value(new_value_str, target_type)
-                    df_copy.loc[row_idx, col_name] = parsed_value
-                except (ValueError, TypeError) as e:
-                    print(f"Warning: Skipping fix for row {row_idx}, column '{col_name}'. "
-                          f"Could not apply value '{new_value_str}'. Error: {e}")
-                except Exception as e:
-                     print(f"Warning: Unexpected error applying fix for row {row_idx}, col '{col_name}': {e}")
+            target_type: Any
+            if self.schema and 'properties' in self.schema and col_name in self.schema['properties']:
+                # Prefer schema type if available
+                target_type = self.schema['properties'][col_name].get('type', dtypes[col_name])
+                if isinstance(target_type, list):
+                    target_type = next((t for t in target_type if t != "null"), target_type[0])
+            else:
+                target_type = dtypes[col_name]
 
+            try:
+                yield row_idx, col_name, self.parse_value(new_value_str, target_type)
+            except (ValueError, TypeError) as e:
+                print(f"Warning: Skipping fix for row {row_idx}, column '{col_name}'. "
+                      f"Could not apply value '{new_value_str}'. Error: {e}")
+            except Exception as e:
+                 print(f"Warning: Unexpected error applying fix for row {row_idx}, col '{col_name}': {e}")
+
+    def _apply_improvements(self, improvements: List[ImprovesItem] | ImprovementStore) -> Optional[pd.DataFrame]:
+        if self.storage is not None:
+            # Batched UPDATE ... WHERE rowid = ? in transactions; nothing is loaded.
+            self.storage.update_cells(self._parsed_cells(improvements, self.storage.dtypes))
+            return None
+
+        df_copy = self._data # Operate directly on the internal DataFrame
+        for row_idx, col_name, parsed_value in self._parsed_cells(improvements, dict(df_copy.dtypes)):
+            try:
+                df_copy.loc[row_idx, col_name] = parsed_value
+            except Exception as e:
+                 print(f"Warning: Unexpected error applying fix for row {row_idx}, col '{col_name}': {e}")
 
         self.data = df_copy
         return self.data
 
     def _fix_errors_for_batch(self, schema: Dict[str, Any], batch_df: pd.DataFrame, prompt: str = GET_DIRTY_DATA_ISSUE, other_context: str = '') -> List[ImprovesItem]:
-        input_payload = {
-            "schema": json.dumps(schema, indent=2),
-            "data": batch_df.to_csv(index=False),
-            "context": other_context,
-        }
+        with tracer.span('serialize_prompt', rows=len(batch_df)):
+            input_payload = {
+                "schema": self._prompt_value(schema) if self.cache_friendly_prompts else json.dumps(schema, indent=2),
+                "data": batch_df.to_csv(index=False),
+                "context": other_context,
+            }
 
         prompt_to_use =  prompt
 
         try:
-            content_json = self._invoke_llm_for_json(prompt_to_use, input_payload)
+            labels = {
+                'fixer': 'fix_errors',
+                'batch': batch_df.index[0] if len(batch_df) else None,
+                'rows': len(batch_df),
+            }
+            raw_response = self._invoke_llm(prompt_to_use, input_payload, labels)
 
-            response = PotentialErrorQueryResponse(**content_json)
+            with tracer.span('pydantic_parse'):
+                response = parse_error_response(raw_response.content)
             if not isinstance(response.improves, list):
                  print("Warning: LLM response for fixing batch has 'improves' field but it's not a list.")
                  return []
@@ -468,23 +926,51 @@ class CSVLoader:
             formation: List[Tuple[str, str]] = None,
             few_shot_context: List[Tuple[str, str]] = None,
             prompt: str = PROMPT_FIX_NUMBER_FORMATION,
-        ) -> PotentialErrorQueryResponse:
-        formation_str = str(formation)
-        few_shot_context = str(few_shot_context)
-
-        input_payload = {
-            "data": df.to_csv(index=True),
-            "schema": schema,
-            "format_list": formation_str,
-            "context": few_shot_context,
+            fixer: str = 'fix_error',
+            model: Optional[BaseChatModel] = None,
+        ) -> Tuple[PotentialErrorQueryResponse, List[int]]:
+        """Returns the (possibly salvaged) response and the rows of `df` to re-request."""
+        formation_str = self._prompt_value(formation)
+        few_shot_context = self._prompt_value(few_shot_context)
+        prompt, payload_df = self._prompt_batch(prompt, df)
+
+        with tracer.span('serialize_prompt', rows=len(df)):
+            input_payload = {
+                "data": payload_df.to_csv(index=True),
+                "schema": schema,
+                "format_list": formation_str,
+                "context": few_shot_context,
+            }
+
+        labels = {
+            'fixer': fixer,
+            'column': ','.join(map(str, df.columns)),
+            'batch': df.index[0] if len(df) else None,
+            'rows': len(df),
         }
 
+        response = self._invoke_llm(prompt, input_payload, labels, model)
+        return self._parse_batch_response(response, payload_df, df)
+
+    @staticmethod
+    def _parse_batch_response(
+            response: Any,
+            payload_df: pd.DataFrame,
+            batch_df: pd.DataFrame,
+    ) -> Tuple[PotentialErrorQueryResponse, List[int]]:
+        """
+        The (possibly salvaged) fixer reply to `payload_df`, with rows mapped back
+        to `batch_df`, and the rows to re-request. Raises BatchParseError when
+        nothing can be parsed, so that only such batches are bisected.
+        """
         try:
-            content = self._invoke_llm_for_json(prompt, input_payload)
-            response = PotentialErrorQueryResponse(**content)
-            return response
-        except (ValueError, TypeError, KeyError) as e:
-            raise ValueError(f"Failed to process batch for error fixing. Error: {e}")
+            with tracer.span('pydantic_parse'):
+                parsed, retry_rows = salvage_error_response(response.content, payload_df.index.tolist())
+            if payload_df is not batch_df:
+                parsed, retry_rows = remap_rows(parsed, retry_rows, batch_df.index.tolist())
+            return parsed, retry_rows
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            raise BatchParseError(f"Failed to process batch for error fixing. Error: {e}")
 
     def _fix_error(
             self,
@@ -494,36 +980,138 @@ class CSVLoader:
             formation: Optional[List[Tuple[str, str]]] = None,
             few_shot_context: Optional[List[Tuple[str, str]]] = None,
             max_workers: Optional[int] = None,
+            fixer: str = 'fix_error',
+            failure_policy: Optional[FailurePolicy] = None,
     ) -> Tuple[List[ImprovesItem], List[NotImprovesItem]]:
+        failure_policy = failure_policy or FailurePolicy()
         if not column_list:
-            column_list = self.data.columns.tolist()
-
-        schema_str = str(self.extract_column_schema(self.schema, column_list))
-        data_subset = self.data[column_list]
+            column_list = self.columns
 
-        batches: List[pd.DataFrame] = [
-            data_subset.iloc[start:end].copy()
-            for start in range(0, self.num_rows, batch_size)
-            for end in [min(start + batch_size, self.num_rows)]
-            if start < end
-        ]
+        schema_str = self._prompt_value(self.extract_column_schema(self.schema, column_list))
 
-        improvements: List[ImprovesItem] = []
-        cant_improvements: List[NotImprovesItem] = []
-        max_workers = max_workers or min(32, len(batches))
-
-        def _process_batch(batch_df: pd.DataFrame):
-            resp = self._fix_error_with_prompt(
+        def _process_batch(batch_df: pd.DataFrame, model: Optional[BaseChatModel] = None):
+            resp, retry_rows = self._fix_error_with_prompt(
                 batch_df,
                 schema=schema_str,
                 formation=formation,
                 few_shot_context=few_shot_context,
                 prompt=prompt,
+                fixer=fixer,
+                model=model,
             )
-            return resp.improves, resp.error
+            return resp.improves, resp.error, retry_rows
+
+        cache_context = {
+            'prompt': prompt, 'schema': schema_str, 'formation': formation, 'few_shot_context': few_shot_context,
+            'cache_friendly_prompts': self.cache_friendly_prompts,
+        }
+        return self._run_batch_windows(
+            column_list, batch_size, self._cascaded(_process_batch), failure_policy, max_workers, fixer, cache_context,
+        )
+
+    def _cascaded(self, process: TierProcessor) -> BatchProcessor:
+        """`process` bound to this loader's model, or wrapped by its cascade."""
+        if self.cascade is None:
+            return lambda batch_df: process(batch_df, None)
+        return self.cascade.processor(process, self._verify_cells)
+
+    def _verify_cells(self, batch_df: pd.DataFrame, improvements: List[ImprovesItem]) -> Set[Tuple[int, str]]:
+        """
+        Cells of `batch_df` whose value, after `improvements`, does not parse as
+        or validate against its column schema. Columns without a schema pass.
+        """
+        from jsonschema.validators import Draft202012Validator
+
+        properties = self.schema.get('properties', {}) if self.schema else {}
+        proposed = {(item.row, cell.name): cell.value for item in improvements for cell in item.attr}
+        invalid: Set[Tuple[int, str]] = set()
+
+        for column in batch_df.columns:
+            column_schema = properties.get(column)
+            if not column_schema:
+                continue
+            validator = Draft202012Validator(column_schema, format_checker=Draft202012Validator.FORMAT_CHECKER)
+            target_type = column_schema.get('type', 'string')
+            if isinstance(target_type, list):
+                target_type = next((t for t in target_type if t != "null"), target_type[0])
+            nullable = 'null' in (column_schema.get('type') if isinstance(column_schema.get('type'), list) else [])
+
+            for row, original in batch_df[column].items():
+                value = proposed.get((row, column), original)
+                if value is None or (isinstance(value, float) and math.isnan(value)) or value == '':
+                    if not nullable:
+                        invalid.add((row, column))
+                    continue
+                if isinstance(value, str):
+                    try:
+                        value = self.parse_value(value, target_type)
+                    except (ValueError, TypeError):
+                        invalid.add((row, column))
+                        continue
+                elif isinstance(value, np.generic):
+                    value = value.item()
+                if not validator.is_valid(value):
+                    invalid.add((row, column))
+        return invalid
+
+    def _run_batch_windows(
+            self,
+            columns: List[str],
+            batch_size: int,
+            process: BatchProcessor,
+            failure_policy: FailurePolicy,
+            max_workers: Optional[int] = None,
+            fixer: Optional[str] = None,
+            cache_context: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[ImprovesItem], List[Any]]:
+        """
+        `_run_batches` over the row batches of `columns`, one window of batches
+        at a time, journaled as `fixer`. With a row cache, rows answered before
+        for the same `cache_context` are taken from it and not sent.
+        """
+        improvements: List[ImprovesItem] = []
+        cant_improvements: List[Any] = []
+        first_index = 0
+        context = None
+        if self.row_cache is not None and cache_context is not None:
+            context = context_key(fixer=fixer, columns=columns, model=self._model_label(), **cache_context)
+        for batches in self._batch_windows(columns, batch_size, max_workers):
+            keys: Dict[Any, str] = {}
+            if context is not None:
+                with tracer.span('row_cache', rows=sum(len(batch) for batch in batches)):
+                    batches, keys, cached_ok, cached_ko = self.row_cache.split(batches, context, batch_size)
+                improvements.extend(cached_ok)
+                cant_improvements.extend(cached_ko)
+            ok, ko = self._run_batches(batches, process, failure_policy, max_workers, first_index)
+            if context is not None:
+                self.row_cache.record(batches, keys, ok, ko, first_index)
+            improvements.extend(ok)
+            cant_improvements.extend(ko)
+            first_index += len(batches)
+        if fixer is not None:
+            self._journal_run(fixer, improvements, cant_improvements)
+        return improvements, cant_improvements
+
+    @staticmethod
+    def _run_batches(
+            batches: List[pd.DataFrame],
+            process: BatchProcessor,
+            failure_policy: FailurePolicy,
+            max_workers: Optional[int] = None,
+            first_index: int = 0,
+    ) -> Tuple[List[ImprovesItem], List[Any]]:
+        """Run `process` over the batches in a thread pool, with bisection of failed batches numbered from `first_index`."""
+        improvements: List[ImprovesItem] = []
+        cant_improvements: List[Any] = []
+        if not batches:
+            return improvements, cant_improvements
+        max_workers = max_workers or min(32, len(batches))
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(_process_batch, df): idx for idx, df in enumerate(batches)}
+            futures = {
+                executor.submit(run_with_bisection, df, process, failure_policy, idx): idx
+                for idx, df in enumerate(batches, first_index)
+            }
             for future in as_completed(futures):
                 idx = futures[future]
                 try:
@@ -535,76 +1123,128 @@ class CSVLoader:
 
         return improvements, cant_improvements
 
-    def fix_number_error(self, column_list: list[str], batch_size: int = 50, formation: List[Tuple[str, str]] = None, few_shot_context: List[Tuple[str, str]] = None):
-        improvements, cant_improvements = self._fix_error(column_list, batch_size, PROMPT_FIX_NUMBER_FORMATION, formation, few_shot_context)
+    def fix_number_error(self, column_list: list[str], batch_size: int = 50, formation: List[Tuple[str, str]] = None, few_shot_context: List[Tuple[str, str]] = None, failure_policy: Optional[FailurePolicy] = None):
+        improvements, cant_improvements = self._fix_error(column_list, batch_size, PROMPT_FIX_NUMBER_FORMATION, formation, few_shot_context, fixer='fix_number_error', failure_policy=failure_policy)
         return improvements, cant_improvements
 
-    def fix_datetime_error(self, column_list: list[str], batch_size: int = 50, formation: List[Tuple[str, str]] = None, few_shot_context: List[Tuple[str, str]] = None):
-        improvements, cant_improvements = self._fix_error(column_list, batch_size, PROMPT_FIX_DATETIME_FORMATION, formation, few_shot_context)
+    def fix_datetime_error(self, column_list: list[str], batch_size: int = 50, formation: List[Tuple[str, str]] = None, few_shot_context: List[Tuple[str, str]] = None, failure_policy: Optional[FailurePolicy] = None):
+        improvements, cant_improvements = self._fix_error(column_list, batch_size, PROMPT_FIX_DATETIME_FORMATION, formation, few_shot_context, fixer='fix_datetime_error', failure_policy=failure_policy)
         return improvements, cant_improvements
 
     def fix_regex_pattern_error(self, column: str, pattern: str = ''):
         if pattern == '':
-            pattern = self.schema['properties'][column]['pattern']
+            pattern = self.schema.get('properties', {}).get(column, {}).get('pattern', '')
+            if not pattern:
+                raise ValueError(f"The schema has no pattern for column '{column}'; pass one with 'pattern'.")
 
         improvements = []
-
-        for i in range(self.num_rows):
-            improvements.append(ImprovesItem(
-                row=i,
-                attr=[{
-                        "name": column,
-                        "value" : correct_to_pattern(pattern,  self.data.loc[i, column])}]
-                ))
-
+        chunks = self.storage.iter_chunks(columns=[column]) if self.storage is not None else [self._data[[column]]]
+
+        for chunk in chunks:
+            for i, value in chunk[column].items():
+                improvements.append(ImprovesItem(
+                    row=i,
+                    attr=[{
+                            "name": column,
+                            "value" : correct_to_pattern(pattern, value)}]
+                    ))
+
+        self._journal_run('fix_regex_pattern_error', improvements, local=True)
         return improvements
 
+    @staticmethod
+    def _best_reference_value(value: Any, reference_values: list[str]) -> str:
+        from thefuzz import fuzz
+
+        best_value = ''
+        best_ratio = 0
+        for ref_value in reference_values:
+            ratio = fuzz.ratio(value, ref_value)
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_value = ref_value
+        return best_value
+
     def fix_reference_value_error(self, column: str, reference_values: list[str]):
         improvements = []
-        print(reference_values)
 
-        for i in range(self.num_rows):
-            best_value = ''
-            best_ratio = 0
-            value = self.data.loc[i, column]
+        if self.storage is not None:
+            # Each distinct value is matched once; its rows are looked up through an index on the column.
+            self.storage.create_index([column])
+            for value in self.storage.distinct_values(column):
+                if value in reference_values:
+                    continue
+                best_value = self._best_reference_value(value, reference_values)
+                for i in self.storage.rows_with_value(column, value):
+                    improvements.append(ImprovesItem(row=i, attr=[{"name": column, "value": best_value}]))
+            improvements.sort(key=lambda item: item.row)
+            self._journal_run('fix_reference_value_error', improvements, local=True)
+            return improvements
+
+        for i, value in self._data[column].items():
             if value in reference_values:
                 continue
-            for ref_value in reference_values:
-                ratio = fuzz.ratio(self.data.loc[i, column], ref_value)
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_value = ref_value
 
             improvements.append(ImprovesItem(
                 row=i,
                 attr=[{
                     "name": column,
-                    "value" : best_value}]
+                    "value" : self._best_reference_value(value, reference_values)}]
                 ))
 
+        self._journal_run('fix_reference_value_error', improvements, local=True)
         return improvements
 
-    def _fix_typography_data_segment(self, segment_data: pd.DataFrame, few_shot_context: List[Tuple[str, str]]):
-        input_payload = {
-            "data": segment_data.to_csv(index=True),
-            "context": str(few_shot_context),
-        }
-
-        try:
-            content = self._invoke_llm_for_json(FIX_GRAMMAR_PROMPTS, input_payload)
-            response = PotentialErrorQueryResponse(**content)
-            return response
-        except (ValueError, TypeError, KeyError) as e:
-            raise ValueError(f"Failed to process batch for error fixing. Error: {e}")
+    def fix_composite_reference_error(
+            self,
+            reference: 'CSVLoader',
+            columns: List[str],
+            threshold: float = 80.0,
+            weights: Optional[List[float]] = None,
+            prefix_length: int = 2,
+            max_candidates: int = 100,
+    ) -> List[ImprovesItem]:
+        """
+        Fix dependent columns (e.g. city/region/country) together against the rows
+        of a reference table, so every corrected row is a consistent reference record.
+        At most `max_candidates` reference rows are scored per row.
+        """
+        missing = [col for col in columns if col not in self.columns]
+        if missing:
+            raise ValueError(f"Data does not contain columns: {missing}")
+
+        from src.file_processing.reference import CompositeReferenceMatcher
+        matcher = CompositeReferenceMatcher(
+            reference.data,
+            columns,
+            weights=weights,
+            prefix_length=prefix_length,
+            max_candidates=max_candidates,
+        )
+        improvements = matcher.find_improvements(self.data, threshold=threshold)
+        self._journal_run('fix_composite_reference_error', improvements, local=True)
+        return improvements
 
-    def _fix_typography_data_segment(self, segment_data: pd.DataFrame, few_shot_context: List[Tuple[str, str]]):
-        input_payload = {
-            "data": segment_data.to_csv(index=True),
-            "context": str(few_shot_context),
+    def _fix_typography_data_segment(
+            self,
+            segment_data: pd.DataFrame,
+            few_shot_context: List[Tuple[str, str]],
+            model: Optional[BaseChatModel] = None,
+    ):
+        prompt, payload_df = self._prompt_batch(FIX_GRAMMAR_PROMPTS, segment_data)
+        with tracer.span('serialize_prompt', rows=len(segment_data)):
+            input_payload = {
+                "data": payload_df.to_csv(index=True),
+                "context": self._prompt_value(few_shot_context),
+            }
+        labels = {
+            'fixer': 'fix_typography_data',
+            'column': ','.join(map(str, segment_data.columns)),
+            'batch': segment_data.index[0] if len(segment_data) else None,
+            'rows': len(segment_data),
         }
-        content = self._invoke_llm_for_json(FIX_GRAMMAR_PROMPTS, input_payload)
-        response = PotentialErrorQueryResponse(**content)
-        return response
+        response = self._invoke_llm(prompt, input_payload, labels, model)
+        return self._parse_batch_response(response, payload_df, segment_data)
 
     def fix_typography_data(
             self,
@@ -612,32 +1252,72 @@ class CSVLoader:
             few_shot_context: Optional[List[Tuple[str, str]]] = None,
             batch_size: int = 50,
             max_workers: Optional[int] = None,
+            failure_policy: Optional[FailurePolicy] = None,
     ):
+        failure_policy = failure_policy or FailurePolicy()
         if not column_list:
-            column_list = self.data.columns.tolist()
+            column_list = self.columns
 
-        batches: List[pd.DataFrame] = []
-        for start in range(0, self.num_rows, batch_size):
-            end = min(start + batch_size, self.num_rows)
-            batches.append(self.data[column_list].iloc[start:end].copy())
+        def _process_batch(batch_df: pd.DataFrame, model: Optional[BaseChatModel] = None):
+            resp, retry_rows = self._fix_typography_data_segment(batch_df, few_shot_context, model)
+            return resp.improves, resp.error, retry_rows
 
-        improvements, cant_improvements = [], []
-        max_workers = max_workers or min(32, len(batches))
+        cache_context = {'few_shot_context': few_shot_context, 'cache_friendly_prompts': self.cache_friendly_prompts}
+        return self._run_batch_windows(
+            column_list, batch_size, self._cascaded(_process_batch), failure_policy, max_workers, 'fix_typography_data',
+            cache_context,
+        )
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_idx = {
-                executor.submit(self._fix_typography_data_segment, batch, few_shot_context): idx
-                for idx, batch in enumerate(batches)
-            }
-            for future in as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                try:
-                    resp = future.result()
-                    if resp:
-                        improvements.extend(resp.improves)
-                        cant_improvements.extend(resp.error)
-                except Exception as exc:
-                    cant_improvements.append({"batch_index": idx, "error": str(exc)})
-        return improvements, cant_improvements
+    def fix_multi_task(
+            self,
+            tasks: Dict[str, Union[str, Dict[str, Any], ColumnTask]],
+            batch_size: int = 50,
+            max_workers: Optional[int] = None,
+            failure_policy: Optional[FailurePolicy] = None,
+    ) -> Dict[str, Tuple[List[ImprovesItem], List[Any]]]:
+        """
+        Run several fixers in one pass: `tasks` maps each column to its task
+        (number, datetime, typography or pattern, with format and examples),
+        every row batch is sent once with the rules of all its tasks, and the
+        result is split back into {task: (improvements, cant_improvements)}.
+        Pattern columns are corrected locally, like fix_regex_pattern_error.
+        """
+        column_tasks = parse_column_tasks(tasks)
+        missing = [column for column in column_tasks if column not in self.columns]
+        if missing:
+            raise ValueError(f"Data does not contain columns: {missing}")
+
+        llm_columns = [column for column, task in column_tasks.items() if task.task in LLM_TASKS]
+        improvements: List[ImprovesItem] = []
+        cant_improvements: List[Any] = []
+        if llm_columns:
+            prompt_inputs = task_prompt_inputs(column_tasks)
+            prompt_inputs["schema"] = json.dumps(
+                self.extract_column_schema(self.schema, llm_columns), ensure_ascii=False, separators=(',', ':'),
+            )
+            def _process_batch(batch_df: pd.DataFrame, model: Optional[BaseChatModel] = None):
+                payload_df = batch_df.reset_index(drop=True)
+                with tracer.span('serialize_prompt', rows=len(batch_df)):
+                    input_payload = {**prompt_inputs, "data": payload_df.to_csv(index=True)}
+                labels = {
+                    'fixer': 'fix_multi_task',
+                    'column': ','.join(map(str, batch_df.columns)),
+                    'batch': batch_df.index[0] if len(batch_df) else None,
+                    'rows': len(batch_df),
+                }
+                response = self._invoke_llm(PROMPT_FIX_MULTI_TASK, input_payload, labels, model)
+                parsed, retry_rows = self._parse_batch_response(response, payload_df, batch_df)
+                return parsed.improves, parsed.error, retry_rows
+
+            improvements, cant_improvements = self._run_batch_windows(
+                llm_columns, batch_size, self._cascaded(_process_batch), failure_policy or FailurePolicy(), max_workers,
+                'fix_multi_task', {'prompt_inputs': prompt_inputs},
+            )
+
+        results = split_by_task(improvements, cant_improvements, column_tasks)
+        for column, task in column_tasks.items():
+            if task.task == TASK_PATTERN:
+                results[TASK_PATTERN][0].extend(self.fix_regex_pattern_error(column, task.pattern or ''))
+        return results
 
 
@@ -0,0 +1,205 @@
+import hashlib
+import math
+import numbers
+import uuid
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+from src.file_processing.sqlite import SQLiteManager
+from src.llm_providers.parsing import ImprovementStore
+
+JOURNAL_TABLE = 'improvements'
+JOURNAL_COLUMNS = [
+    'run_id', 'file_hash', 'file_path', 'row_index', 'column_name', 'old_value', 'new_value',
+    'status', 'message', 'fixer', 'model', 'created_at',
+]
+# status: 'fix' for a proposed value, 'error' for a cell the model could not fix, 'failed' for a row whose batch failed.
+_CREATE_JOURNAL = f"""
+CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    file_hash TEXT,
+    file_path TEXT,
+    row_index INTEGER,
+    column_name TEXT,
+    old_value TEXT,
+    new_value TEXT,
+    status TEXT NOT NULL CHECK (status IN ('fix', 'error', 'failed')),
+    message TEXT,
+    fixer TEXT,
+    model TEXT,
+    created_at TEXT NOT NULL
+)"""
+_JOURNAL_INDEXES = {
+    'ix_improvements_cell': '(file_hash, row_index, column_name)',
+    'ix_improvements_run': '(run_id)',
+    'ix_improvements_fixer': '(fixer, created_at)',
+}
+
+
+def file_hash(filepath: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content, read `block_size` bytes at a time."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def journal_text(value: Any) -> Optional[str]:
+    """Cell value as stored in the journal: text, or NULL for a missing value."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value)
+
+
+def same_cell_value(value: Any, recorded: Optional[str]) -> bool:
+    """
+    Whether a cell still holds the old value recorded in the journal. A
+    number is compared by value, so 12 matches '12.0' after a column went
+    from int64 to float64 between file versions; text is compared as is.
+    """
+    current = journal_text(value)
+    if current == recorded:
+        return True
+    if current is None or recorded is None or isinstance(value, (str, bool, np.bool_)):
+        return False
+    if not isinstance(value, (numbers.Number, np.number)):
+        return False
+    try:
+        return float(value) == float(recorded)
+    except (ValueError, TypeError):
+        return False
+
+
+class ImprovementJournal:
+    """
+    Every cell fix and failure of the fixers, kept in an indexed SQLite table
+    across runs: which file version (content hash), row and column, the old
+    and new value, the fixer and model, and when. Each fixer call is one run.
+    Attach it to a CSVLoader with `journal=`; the journal can then be queried,
+    exported as a changelog, or replayed on a new version of the file with
+    `CSVLoader.reapply_improvements`.
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.manager = SQLiteManager(db_path, pragmas)
+        self.manager.create_table(_CREATE_JOURNAL)
+        for index_name, columns in _JOURNAL_INDEXES.items():
+            self.manager.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {JOURNAL_TABLE} {columns}")
+
+    def close(self) -> None:
+        self.manager.close()
+
+    def record(
+            self,
+            improvements: Iterable[ImprovesItem],
+            cant_improvements: Iterable[Any] = (),
+            file_hash: Optional[str] = None,
+            file_path: Optional[str] = None,
+            fixer: Optional[str] = None,
+            model: Optional[str] = None,
+            old_values: Optional[Dict[Tuple[int, str], Any]] = None,
+            run_id: Optional[str] = None,
+    ) -> str:
+        """Insert the results of one fixer call (batched executemany) and return its run id."""
+        run_id = run_id or uuid.uuid4().hex
+        created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        old_values = old_values or {}
+
+        def _rows() -> Iterator[Tuple[Any, ...]]:
+            for row, column, new_value, status, message in self._entries(improvements, cant_improvements):
+                old_value = journal_text(old_values.get((row, column))) if column is not None else None
+                yield (run_id, file_hash, file_path, row, column, old_value, new_value,
+                       status, message, fixer, model, created_at)
+
+        self.manager.bulk_insert(JOURNAL_TABLE, JOURNAL_COLUMNS, _rows())
+        return run_id
+
+    @staticmethod
+    def _entries(improvements: Iterable[ImprovesItem], cant_improvements: Iterable[Any]):
+        """(row, column, new value, status, message) of fixes, error cells and failed batch rows."""
+        for item in improvements:
+            for cell in item.attr:
+                yield item.row, cell.name, journal_text(cell.value), 'fix', None
+        for item in cant_improvements:
+            if isinstance(item, NotImprovesItem):
+                for column in item.attr:
+                    yield item.row, column, None, 'error', None
+            elif isinstance(item, dict):
+                # A batch that failed after bisection: {"batch_index", "rows" (optional), "error"}.
+                for row in item.get('rows') or [None]:
+                    yield row, None, None, 'failed', str(item.get('error', ''))
+
+    @staticmethod
+    def _filters(**filters: Any) -> Tuple[Optional[str], Tuple[Any, ...]]:
+        clauses = [(f"{column} = ?", value) for column, value in filters.items() if value is not None]
+        if not clauses:
+            return None, ()
+        return ' AND '.join(clause for clause, _ in clauses), tuple(value for _, value in clauses)
+
+    def history(
+            self,
+            run_id: Optional[str] = None,
+            file_hash: Optional[str] = None,
+            fixer: Optional[str] = None,
+            row_index: Optional[int] = None,
+            column_name: Optional[str] = None,
+            status: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Journal entries matching every given filter, oldest first."""
+        where, parameters = self._filters(
+            run_id=run_id, file_hash=file_hash, fixer=fixer, row_index=row_index, column_name=column_name, status=status,
+        )
+        return self.manager.export_to_dataframe(JOURNAL_TABLE, where=where, parameters=parameters, order_by='id')
+
+    def runs(self, file_hash: Optional[str] = None) -> pd.DataFrame:
+        """One line per run: file, fixer, model, start time and number of fixes, errors and failed rows."""
+        where, parameters = self._filters(file_hash=file_hash)
+        sql = (
+            f"SELECT run_id, file_hash, file_path, fixer, model, min(created_at) AS created_at, "
+            f"sum(status = 'fix') AS fixes, sum(status = 'error') AS errors, sum(status = 'failed') AS failed "
+            f"FROM {JOURNAL_TABLE}{f' WHERE {where}' if where else ''} GROUP BY run_id ORDER BY min(id)"
+        )
+        return pd.read_sql(sql, self.manager.connection, params=parameters)
+
+    def fixes(
+            self,
+            run_id: Optional[str] = None,
+            file_hash: Optional[str] = None,
+            fixer: Optional[str] = None,
+    ) -> List[Tuple[int, str, Optional[str], Optional[str]]]:
+        """(row, column, old value, new value) of the matching fixes; the latest one wins for a cell fixed several times."""
+        where, parameters = self._filters(run_id=run_id, file_hash=file_hash, fixer=fixer)
+        where = f"status = 'fix'{f' AND {where}' if where else ''}"
+        latest: Dict[Tuple[int, str], Tuple[int, str, Optional[str], Optional[str]]] = {}
+        sql = (f"SELECT row_index, column_name, old_value, new_value FROM {JOURNAL_TABLE} "
+               f"WHERE {where} ORDER BY id")
+        for rows in self.manager.iter_query(sql, parameters):
+            for row, column, old_value, new_value in rows:
+                latest[(row, column)] = (row, column, old_value, new_value)
+        return list(latest.values())
+
+    def improvement_store(
+            self,
+            run_id: Optional[str] = None,
+            file_hash: Optional[str] = None,
+            fixer: Optional[str] = None,
+    ) -> ImprovementStore:
+        """The matching fixes as an ImprovementStore, ready for `CSVLoader.apply_improvements`."""
+        store = ImprovementStore()
+        for row, column, _, new_value in self.fixes(run_id, file_hash, fixer):
+            store.add(row, column, new_value)
+        return store
+
+    def changelog(self, **filters: Any) -> pd.DataFrame:
+        """Fixes in the layout of the examples' *_CHANGELOG.csv files (row, column, original and modified value)."""
+        history = self.history(status='fix', **filters)
+        return history.rename(columns={
+            'row_index': 'row', 'column_name': 'column', 'old_value': 'original_value', 'new_value': 'modified_value',
+        })[['row', 'column', 'original_value', 'modified_value', 'fixer', 'model', 'created_at', 'run_id']]
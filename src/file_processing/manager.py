@@ -1,4 +1,4 @@
-from file_processing.csv import CSVLoader
+from src.file_processing.csv import CSVLoader
 
 
 class Manager:
@@ -0,0 +1,108 @@
+import json
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Tuple, Optional, Union
+
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+from src.llm_providers.prompts_fix_data import MULTI_TASK_RULES
+
+TASK_NUMBER = 'number'
+TASK_DATETIME = 'datetime'
+TASK_TYPOGRAPHY = 'typography'
+TASK_PATTERN = 'pattern'
+TASKS = (TASK_NUMBER, TASK_DATETIME, TASK_TYPOGRAPHY, TASK_PATTERN)
+
+# Tasks solved by the model; pattern columns are corrected locally with correct_to_pattern.
+LLM_TASKS = (TASK_NUMBER, TASK_DATETIME, TASK_TYPOGRAPHY)
+
+
+@dataclass
+class ColumnTask:
+    """
+    The fix to run on one column: `format` is the target format of number and
+    datetime columns, `pattern` the regex of pattern columns (defaults to the
+    schema pattern) and `examples` few-shot (original, fixed) pairs.
+    """
+    task: str
+    format: Optional[str] = None
+    examples: List[Tuple[str, str]] = field(default_factory=list)
+    pattern: Optional[str] = None
+
+
+def parse_column_tasks(tasks: Dict[str, Union[str, Dict[str, Any], ColumnTask]]) -> Dict[str, ColumnTask]:
+    """Accept {column: 'number'}, {column: {'task': 'datetime', 'format': 'YYYY-MM-DD'}} or ColumnTask values."""
+    column_tasks: Dict[str, ColumnTask] = {}
+    for column, task in tasks.items():
+        if isinstance(task, str):
+            task = ColumnTask(task=task)
+        elif isinstance(task, dict):
+            task = ColumnTask(**task)
+        if task.task not in TASKS:
+            raise ValueError(f"Unknown task '{task.task}' for column '{column}', expected one of {TASKS}.")
+        column_tasks[column] = task
+    return column_tasks
+
+
+def task_prompt_inputs(column_tasks: Dict[str, ColumnTask]) -> Dict[str, str]:
+    """The rules, tasks and context inputs of PROMPT_FIX_MULTI_TASK for the model-solved columns."""
+    llm_tasks = {column: task for column, task in column_tasks.items() if task.task in LLM_TASKS}
+    present = [name for name in LLM_TASKS if any(task.task == name for task in llm_tasks.values())]
+
+    examples: Dict[str, List[Tuple[str, str]]] = {}
+    for task in llm_tasks.values():
+        for example in task.examples:
+            if list(example) not in [list(e) for e in examples.setdefault(task.task, [])]:
+                examples[task.task].append(example)
+
+    compact = dict(ensure_ascii=False, separators=(',', ':'))
+    return {
+        "rules": "\n\n".join(MULTI_TASK_RULES[name] for name in present),
+        "tasks": json.dumps(
+            {column: {"task": task.task, "format": task.format} if task.format else {"task": task.task}
+             for column, task in llm_tasks.items()},
+            **compact,
+        ),
+        "context": json.dumps(examples, **compact),
+    }
+
+
+def split_by_task(
+        improvements: List[ImprovesItem],
+        cant_improvements: List[Any],
+        column_tasks: Dict[str, ColumnTask],
+) -> Dict[str, Tuple[List[ImprovesItem], List[Any]]]:
+    """
+    Split the improvements and error cells of a fused run into one
+    (improvements, cant_improvements) pair per task, by column. Cells of
+    columns without a task are dropped; batch failure records are reported
+    under every model-solved task.
+    """
+    results: Dict[str, Tuple[List[ImprovesItem], List[Any]]] = {
+        task.task: ([], []) for task in column_tasks.values()
+    }
+
+    for item in improvements:
+        cells_by_task: Dict[str, list] = {}
+        for cell in item.attr:
+            task = column_tasks.get(cell.name)
+            if task is None:
+                print(f"Warning: Dropping fix for column '{cell.name}' at row {item.row}: no task for this column.")
+                continue
+            cells_by_task.setdefault(task.task, []).append(cell)
+        for name, cells in cells_by_task.items():
+            results[name][0].append(ImprovesItem(row=item.row, attr=cells))
+
+    for item in cant_improvements:
+        if not isinstance(item, NotImprovesItem):
+            for name in results:
+                if name in LLM_TASKS:
+                    results[name][1].append(item)
+            continue
+        columns_by_task: Dict[str, List[str]] = {}
+        for column in item.attr:
+            task = column_tasks.get(column)
+            if task is not None:
+                columns_by_task.setdefault(task.task, []).append(column)
+        for name, columns in columns_by_task.items():
+            results[name][1].append(NotImprovesItem(row=item.row, attr=columns))
+
+    return results
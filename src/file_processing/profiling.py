@@ -0,0 +1,307 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def hash_values(values: pd.Index) -> np.ndarray:
+    """Stable 64-bit hashes of distinct values (no factorizing: they are already unique)."""
+    return pd.util.hash_array(values.to_numpy(), categorize=False)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit hashes: 2**precision one-byte registers, ~1.04/sqrt(2**precision) error."""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes << np.uint64(self.precision)
+        # Rank of the first set bit of the remaining bits; frexp gives the bit length.
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = np.where(rest == 0, 64 - self.precision + 1, np.maximum(64 - bit_length + 1, 1)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class Reservoir:
+    """Uniform sample of at most `size` values of a stream (algorithm R), updated a chunk at a time."""
+
+    def __init__(self, size: int, rng: np.random.Generator):
+        self.size = size
+        self.rng = rng
+        self.values: List[Any] = []
+        self.seen = 0
+
+    def add(self, values: np.ndarray) -> None:
+        free = max(0, self.size - len(self.values))
+        if free:
+            self.values.extend(values[:free].tolist())
+        rest = values[free:]
+        if len(rest):
+            positions = self.seen + free + np.arange(1, len(rest) + 1)
+            slots = (self.rng.random(len(rest)) * positions).astype(np.int64)
+            keep = slots < self.size
+            # Later values overwrite earlier ones in the same slot, as in the sequential algorithm.
+            for slot, value in zip(slots[keep].tolist(), rest[keep].tolist()):
+                self.values[slot] = value
+        self.seen += len(values)
+
+
+class ColumnProfile:
+    """
+    Statistics of one column, updated chunk by chunk: one factorize per
+    chunk gives the null count, the distinct values and the heavy hitters.
+    Distinct values are counted exactly or, with `sketch`, with HyperLogLog;
+    a reservoir of values gives the sample and the numeric quantiles.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            unique_threshold: int = 20,
+            sketch: bool = False,
+            top_k: int = 10,
+            reservoir_size: int = 1024,
+            hll_precision: int = 12,
+            seed: int = 42,
+    ):
+        self.name = name
+        self.unique_threshold = unique_threshold
+        self.sketch = sketch
+        self.top_k = top_k
+        self.rows = 0
+        self.null_count = 0
+        self.dtype: Optional[np.dtype] = None
+        self.rng = np.random.default_rng(seed)
+        self.reservoir = Reservoir(reservoir_size, self.rng)
+        self.hll = HyperLogLog(hll_precision) if sketch else None
+        self.distinct: Optional[pd.Index] = None
+        # Exact distinct values, in order of appearance, until there are more than `unique_threshold`.
+        self.small_values: Optional[Dict[Any, None]] = {}
+        self.heavy: Dict[Any, int] = {}
+        self.minimum: Any = None
+        self.maximum: Any = None
+        self.total = 0.0
+
+    def _merge_dtype(self, dtype: np.dtype) -> None:
+        if self.dtype is None or self.dtype == dtype:
+            self.dtype = dtype
+        elif pd.api.types.is_numeric_dtype(self.dtype) and pd.api.types.is_numeric_dtype(dtype) \
+                and not pd.api.types.is_bool_dtype(self.dtype) and not pd.api.types.is_bool_dtype(dtype):
+            self.dtype = np.dtype('float64')
+        else:
+            self.dtype = np.dtype('object')
+
+    def update(self, series: pd.Series) -> None:
+        self._merge_dtype(series.dtype)
+        # One hash pass: codes of the values (-1 for nulls) and the distinct values in order of appearance.
+        codes, distinct = pd.factorize(series)
+        present = codes >= 0
+        counts_array = np.bincount(codes[present], minlength=len(distinct))
+        non_null = int(counts_array.sum())
+        self.rows += len(series)
+        self.null_count += len(series) - non_null
+
+        if self.hll is not None:
+            self.hll.add_hashes(hash_values(distinct))
+        elif self.distinct is None:
+            self.distinct = distinct
+        else:
+            self.distinct = self.distinct.append(distinct).unique()
+
+        if self.small_values is not None:
+            if len(distinct) > self.unique_threshold:
+                self.small_values = None
+            else:
+                self.small_values.update(dict.fromkeys(distinct.tolist()))
+                if len(self.small_values) > self.unique_threshold:
+                    self.small_values = None
+
+        # Heavy hitters: the top candidates of each chunk, merged; exact for a single chunk.
+        top = np.argpartition(-counts_array, 10 * self.top_k)[:10 * self.top_k] \
+            if len(counts_array) > 10 * self.top_k else np.arange(len(counts_array))
+        for value, count in zip(distinct[top].tolist(), counts_array[top].tolist()):
+            self.heavy[value] = self.heavy.get(value, 0) + count
+        if len(self.heavy) > 10 * self.top_k:
+            self.heavy = dict(sorted(self.heavy.items(), key=lambda item: -item[1])[:10 * self.top_k])
+
+        if non_null and pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            low, high = distinct.min(), distinct.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+            self.total += float((distinct.to_numpy(dtype=np.float64) * counts_array).sum())
+
+        if non_null:
+            self.reservoir.add(series.to_numpy()[present])
+
+    @property
+    def unique_count(self) -> int:
+        if self.small_values is not None:
+            return len(self.small_values)
+        if self.hll is not None:
+            return self.hll.count()
+        return len(self.distinct) if self.distinct is not None else 0
+
+    def type_category(self) -> str:
+        dtype = self.dtype if self.dtype is not None else np.dtype('object')
+        if pd.api.types.is_bool_dtype(dtype):
+            return 'boolean'
+        if pd.api.types.is_numeric_dtype(dtype):
+            return 'numerical'
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return 'datetime'
+        if isinstance(dtype, pd.CategoricalDtype):
+            return 'categorical'
+        return 'string/object'
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The summary of `CSVLoader.get_column_info`, plus top values and numeric statistics."""
+        non_null = self.rows - self.null_count
+        unique_count = self.unique_count
+        summary: Dict[str, Any] = {
+            'column_name': self.name,
+            'dtype': str(self.dtype),
+            'non_null_count': non_null,
+            'null_count': self.null_count,
+            'null_percentage': round((self.null_count / self.rows) * 100, 2) if self.rows > 0 else 0,
+            'unique_count': unique_count,
+            'unique_count_estimated': self.small_values is None and self.hll is not None,
+            'type_category': self.type_category(),
+        }
+        if summary['type_category'] == 'boolean':
+            summary['value_distribution'] = dict(self.heavy)
+
+        if self.small_values is not None:
+            summary['unique_values'] = list(self.small_values)
+        else:
+            sample_n = min(self.unique_threshold, len(self.reservoir.values))
+            picks = self.rng.choice(len(self.reservoir.values), sample_n, replace=False) if sample_n else []
+            summary['unique_sample'] = [self.reservoir.values[i] for i in picks]
+
+        summary['top_values'] = [
+            [value, count] for value, count in sorted(self.heavy.items(), key=lambda item: -item[1])[:self.top_k]
+        ]
+        # A column read as numbers in some chunks and as text in others has no numeric statistics, as when read whole.
+        if self.minimum is not None and summary['type_category'] == 'numerical':
+            summary['min'] = self.minimum.item() if hasattr(self.minimum, 'item') else self.minimum
+            summary['max'] = self.maximum.item() if hasattr(self.maximum, 'item') else self.maximum
+            summary['mean'] = self.total / non_null
+            sample = np.asarray(self.reservoir.values, dtype=np.float64)
+            summary['quantiles'] = {
+                f"p{int(q * 100):02d}": float(value) for q, value in zip(_QUANTILES, np.quantile(sample, _QUANTILES))
+            }
+        return summary
+
+
+def profile_chunks(
+        chunks: Iterable[pd.DataFrame],
+        unique_threshold: int = 20,
+        sketch: bool = False,
+        **options: Any,
+) -> List[Dict[str, Any]]:
+    """Profile a table given as a stream of DataFrame chunks, in bounded memory with `sketch`."""
+    profiles: Dict[str, ColumnProfile] = {}
+    for chunk in chunks:
+        for column in chunk.columns:
+            profile = profiles.get(column)
+            if profile is None:
+                profile = profiles[column] = ColumnProfile(column, unique_threshold, sketch, **options)
+            profile.update(chunk[column])
+    return [profile.to_dict() for profile in profiles.values()]
+
+
+def profile_frame(
+        df: pd.DataFrame,
+        unique_threshold: int = 20,
+        sketch: bool = False,
+        chunksize: Optional[int] = None,
+        **options: Any,
+) -> List[Dict[str, Any]]:
+    """Profile an in-memory DataFrame, whole or `chunksize` rows at a time."""
+    if chunksize is None or chunksize >= len(df):
+        chunks: Iterable[pd.DataFrame] = [df]
+    else:
+        chunks = (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
+    return profile_chunks(chunks, unique_threshold, sketch, **options)
+
+
+class ProfileCache:
+    """Profiles of CSV files keyed by path, size, modification time and options; the `max_entries` most recent are kept."""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._profiles: OrderedDict[Tuple, List[Dict[str, Any]]] = OrderedDict()
+
+    @staticmethod
+    def key(filepath: str, **options: Any) -> Tuple:
+        stat = os.stat(filepath)
+        return (os.path.realpath(filepath), stat.st_size, stat.st_mtime_ns, tuple(sorted(options.items())))
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+            return profile
+
+    def put(self, key: Tuple, profile: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._profiles[key] = profile
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_cache = ProfileCache()
+
+
+def profile_csv(
+        filepath: str,
+        chunksize: int = 100_000,
+        unique_threshold: int = 20,
+        sketch: bool = True,
+        use_cache: bool = True,
+        **options: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Profile a CSV file read `chunksize` rows at a time, without loading it.
+    Profiles are cached per file version (path, size, modification time).
+    """
+    key = ProfileCache.key(filepath, chunksize=chunksize, unique_threshold=unique_threshold, sketch=sketch, **options)
+    if use_cache:
+        cached = profile_cache.get(key)
+        if cached is not None:
+            return [dict(summary) for summary in cached]
+
+    with pd.read_csv(filepath, chunksize=chunksize) as reader:
+        profile = profile_chunks(reader, unique_threshold, sketch, **options)
+    if use_cache:
+        profile_cache.put(key, profile)
+    return [dict(summary) for summary in profile]
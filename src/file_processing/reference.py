@@ -0,0 +1,151 @@
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple, Optional, Sequence, Set
+
+import numpy as np
+import pandas as pd
+from thefuzz import fuzz
+
+from src.file_processing.regex import normalise
+from src.file_processing.schema import ImprovesItem, CellInfo
+
+
+def _cell_to_str(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return ''
+        # A whole number pandas read as float (a column with gaps) compares equal to its integer text: 84.0 -> '84'.
+        if float(value).is_integer():
+            return str(int(value))
+    return str(value)
+
+
+class CompositeReferenceMatcher:
+    """
+    Match rows against a reference table on several dependent columns at once
+    (e.g. city/region/country), so that all columns of a row are corrected to
+    one consistent reference record.
+
+    Candidates are blocked on a short prefix of the normalised value of each
+    column. Blocks larger than `max_candidates` (e.g. of a low-cardinality
+    country column) only narrow the selective ones down; candidates are ranked
+    by the number of columns whose prefix (then exact value) they share, and
+    only the best `max_candidates` are scored, so a lookup never scans most of
+    a large reference table.
+    """
+
+    def __init__(
+            self,
+            reference: pd.DataFrame,
+            columns: List[str],
+            weights: Optional[Sequence[float]] = None,
+            prefix_length: int = 2,
+            max_candidates: int = 100,
+    ):
+        missing = [col for col in columns if col not in reference.columns]
+        if missing:
+            raise ValueError(f"Reference data does not contain columns: {missing}")
+        if weights is not None and len(weights) != len(columns):
+            raise ValueError("'weights' must have one entry per column.")
+
+        self.columns: List[str] = list(columns)
+        self.weights: List[float] = list(weights) if weights is not None else [1.0] * len(columns)
+        self.prefix_length: int = prefix_length
+        self.max_candidates: int = max_candidates
+
+        ref = reference[self.columns].dropna(how='all').drop_duplicates()
+        self.records: List[Tuple[str, ...]] = [
+            tuple(_cell_to_str(v) for v in row) for row in ref.itertuples(index=False, name=None)
+        ]
+        self.normalised: List[Tuple[str, ...]] = [
+            tuple(normalise(v) for v in record) for record in self.records
+        ]
+
+        self.exact: Dict[Tuple[str, ...], int] = {}
+        # Records per (column, prefix of the value) and per (column, value).
+        self.blocks: Dict[Tuple[int, str], Set[int]] = defaultdict(set)
+        self.exact_blocks: Dict[Tuple[int, str], Set[int]] = defaultdict(set)
+        for rec_idx, record in enumerate(self.normalised):
+            self.exact.setdefault(record, rec_idx)
+            for col_idx, key in enumerate(record):
+                if not key:
+                    continue
+                self.blocks[(col_idx, key[:self.prefix_length])].add(rec_idx)
+                self.exact_blocks[(col_idx, key)].add(rec_idx)
+
+    def _candidates(self, values: Tuple[str, ...]) -> List[int]:
+        """The `max_candidates` records sharing the most column prefixes (then exact values) with `values`."""
+        blocks: List[Set[int]] = []
+        exact_blocks: List[Set[int]] = []
+        for col_idx, key in enumerate(values):
+            if not key:
+                continue
+            block = self.blocks.get((col_idx, key[:self.prefix_length]))
+            if block:
+                blocks.append(block)
+                exact_blocks.append(self.exact_blocks.get((col_idx, key), set()))
+        if not blocks:
+            return []
+
+        selective = [block for block in blocks if len(block) <= self.max_candidates]
+        # Only the selective blocks are enumerated; when there are none, records must share every prefix.
+        pool = set().union(*selective) if selective else set.intersection(*sorted(blocks, key=len))
+
+        def _rank(rec_idx: int) -> Tuple[int, int, int]:
+            shared = sum(rec_idx in block for block in blocks)
+            exact = sum(rec_idx in block for block in exact_blocks)
+            return -shared, -exact, rec_idx
+
+        return sorted(pool, key=_rank)[:self.max_candidates]
+
+    def _score(self, values: Tuple[str, ...], rec_idx: int) -> float:
+        record = self.normalised[rec_idx]
+        total = 0.0
+        for weight, value, ref_value in zip(self.weights, values, record):
+            total += weight * fuzz.ratio(value, ref_value)
+        return total / sum(self.weights)
+
+    def match(self, row_values: Sequence[Any]) -> Tuple[Optional[int], float]:
+        """Return the index of the best matching reference record and its score (0-100)."""
+        values = tuple(normalise(_cell_to_str(v)) for v in row_values)
+        exact_idx = self.exact.get(values)
+        if exact_idx is not None:
+            return exact_idx, 100.0
+
+        best_idx, best_score = None, 0.0
+        for rec_idx in self._candidates(values):
+            score = self._score(values, rec_idx)
+            if score > best_score:
+                best_idx, best_score = rec_idx, score
+        return best_idx, best_score
+
+    def find_improvements(self, data: pd.DataFrame, threshold: float = 80.0) -> List[ImprovesItem]:
+        """
+        Match every row of `data` and return one improvement per row that
+        rewrites all differing columns to the matched reference record.
+        """
+        subset = data[self.columns]
+        # Score each distinct combination once, then fan the result out to its rows.
+        resolved: Dict[Tuple[str, ...], Optional[Tuple[str, ...]]] = {}
+        improvements: List[ImprovesItem] = []
+
+        for row_idx, row in zip(subset.index, subset.itertuples(index=False, name=None)):
+            values = tuple(_cell_to_str(v) for v in row)
+            if values not in resolved:
+                rec_idx, score = self.match(values)
+                resolved[values] = self.records[rec_idx] if rec_idx is not None and score >= threshold else None
+
+            record = resolved[values]
+            if record is None:
+                continue
+
+            attr = [
+                CellInfo(name=col, value=ref_value)
+                for col, value, ref_value in zip(self.columns, values, record)
+                if value != ref_value
+            ]
+            if attr:
+                improvements.append(ImprovesItem(row=int(row_idx), attr=attr))
+
+        return improvements
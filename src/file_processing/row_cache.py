@@ -0,0 +1,167 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable, Set, Tuple
+
+import pandas as pd
+
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+from src.file_processing.sqlite import SQLiteManager
+
+ROW_CACHE_TABLE = 'row_results'
+_CREATE_ROW_CACHE = f"""
+CREATE TABLE IF NOT EXISTS {ROW_CACHE_TABLE} (
+    key TEXT PRIMARY KEY,
+    fixes TEXT NOT NULL,
+    errors TEXT NOT NULL,
+    created_at TEXT NOT NULL
+)"""
+_LOOKUP_BATCH = 500
+
+# Per row: the fixed cells [[column, value], ...] and the columns the model could not fix.
+RowResult = Tuple[List[List[str]], List[str]]
+
+
+def context_key(**parts: Any) -> str:
+    """Hash of everything besides the row that decides a fixer's answer (fixer, prompt, schema, formats, examples, model)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def row_keys(df: pd.DataFrame, context: str) -> List[str]:
+    """One key per row: the context hash and a 64-bit hash of the row's values (not its position)."""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return [f"{context}:{value:016x}" for value in hashes.tolist()]
+
+
+class RowResultCache:
+    """
+    Fixer results per row content, kept in SQLite (in memory by default, or a
+    file shared across runs). A row already answered for the same context is
+    not sent to the model again, wherever it sits in the file, so a daily
+    re-export only pays for its new and changed rows. Rows of failed batches
+    are not cached. `stats` counts the rows reused and sent.
+    """
+
+    def __init__(self, db_path: str = ':memory:', pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.manager = SQLiteManager(db_path, pragmas)
+        self.manager.create_table(_CREATE_ROW_CACHE)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    def close(self) -> None:
+        self.manager.close()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of the rows looked up whose result was reused."""
+        stats = self.stats
+        looked_up = stats['hits'] + stats['misses']
+        return stats['hits'] / looked_up if looked_up else 0.0
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, RowResult]:
+        keys = list(dict.fromkeys(keys))
+        results: Dict[str, RowResult] = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            placeholders = ', '.join('?' for _ in batch)
+            for key, fixes, errors in self.manager.query(
+                    f"SELECT key, fixes, errors FROM {ROW_CACHE_TABLE} WHERE key IN ({placeholders})", tuple(batch),
+            ):
+                results[key] = (json.loads(fixes), json.loads(errors))
+        return results
+
+    def store(self, results: Dict[str, RowResult]) -> int:
+        created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        rows = (
+            (key, json.dumps(fixes, ensure_ascii=False), json.dumps(errors, ensure_ascii=False), created_at)
+            for key, (fixes, errors) in results.items()
+        )
+        stored = self.manager.bulk_insert(
+            ROW_CACHE_TABLE, ['key', 'fixes', 'errors', 'created_at'], rows, on_conflict='REPLACE',
+        )
+        with self._lock:
+            self._stats['stored'] += stored
+        return stored
+
+    def split(
+            self,
+            batches: List[pd.DataFrame],
+            context: str,
+            batch_size: int,
+    ) -> Tuple[List[pd.DataFrame], Dict[Any, str], List[ImprovesItem], List[NotImprovesItem]]:
+        """
+        Answer the cached rows of `batches` and re-batch the others into
+        batches of `batch_size`. Returns the batches still to send, the keys
+        of their rows, and the improvements and errors of the cached rows.
+        """
+        if not batches:
+            return [], {}, [], []
+        data = pd.concat(batches)
+        keys = row_keys(data, context)
+        cached = self.lookup(keys)
+
+        improvements: List[ImprovesItem] = []
+        errors: List[NotImprovesItem] = []
+        pending: Dict[Any, str] = {}
+        for row, key in zip(data.index.tolist(), keys):
+            result = cached.get(key)
+            if result is None:
+                pending[row] = key
+                continue
+            fixes, error_columns = result
+            if fixes:
+                improvements.append(ImprovesItem(row=row, attr=[{"name": name, "value": value} for name, value in fixes]))
+            if error_columns:
+                errors.append(NotImprovesItem(row=row, attr=error_columns))
+
+        with self._lock:
+            self._stats['hits'] += len(keys) - len(pending)
+            self._stats['misses'] += len(pending)
+        if len(pending) == len(data):
+            return batches, pending, improvements, errors
+        remaining = data.loc[data.index.isin(list(pending))]
+        rebatched = [remaining.iloc[start:start + batch_size] for start in range(0, len(remaining), batch_size)]
+        return rebatched, pending, improvements, errors
+
+    def record(
+            self,
+            batches: List[pd.DataFrame],
+            keys: Dict[Any, str],
+            improvements: List[ImprovesItem],
+            cant_improvements: List[Any],
+            first_index: int = 0,
+    ) -> int:
+        """Cache the result of every row of `batches` (keyed by `keys`) except those of failed batches."""
+        failed: Set[Any] = set()
+        for item in cant_improvements:
+            if isinstance(item, dict):
+                rows = item.get('rows')
+                if rows is None and 0 <= item.get('batch_index', -1) - first_index < len(batches):
+                    rows = batches[item['batch_index'] - first_index].index.tolist()
+                failed.update(rows or ())
+
+        fixes: Dict[Any, List[List[str]]] = {}
+        for item in improvements:
+            fixes.setdefault(item.row, []).extend([cell.name, cell.value] for cell in item.attr)
+        error_columns: Dict[Any, List[str]] = {}
+        for item in cant_improvements:
+            if isinstance(item, NotImprovesItem):
+                error_columns.setdefault(item.row, []).extend(item.attr)
+
+        results = {
+            key: (fixes.get(row, []), error_columns.get(row, []))
+            for row, key in keys.items() if row not in failed
+        }
+        return self.store(results)
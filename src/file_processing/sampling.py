@@ -0,0 +1,161 @@
+from typing import List, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+
+_HEAD_ROWS = 4096
+
+
+class _BottomK:
+    """The `size` rows with the smallest random keys seen so far: a uniform sample without replacement, mergeable across chunks."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.keys = np.empty(0)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.seen = 0
+
+    def add(self, keys: np.ndarray, rows: np.ndarray, seen: Optional[int] = None) -> None:
+        """Offer candidate rows; `seen` is the number of stream rows they were drawn from (default: all of them)."""
+        self.seen += len(rows) if seen is None else seen
+        if self.size <= 0 or not len(rows):
+            return
+        keys = np.concatenate([self.keys, keys])
+        rows = np.concatenate([self.rows, rows])
+        if len(rows) > self.size:
+            smallest = np.argpartition(keys, self.size - 1)[:self.size]
+            keys, rows = keys[smallest], rows[smallest]
+        self.keys, self.rows = keys, rows
+
+
+class StratifiedSampler:
+    """
+    One-pass stratified sample of a table read chunk by chunk, keeping only
+    the candidate rows in memory. Every row gets a random key. For each
+    column the `per_column_quota` null and non-null rows with the smallest
+    keys are kept, and so are `null_fraction` of `sample_size` rows with a
+    null and the rest without; the union is cut or topped up to
+    `sample_size` by key. The null mask of a chunk is computed once for all
+    columns. Chunking does not change the sample for a given `random_state`.
+    """
+
+    def __init__(
+            self,
+            sample_size: int = 50,
+            per_column_quota: int = 2,
+            null_fraction: float = 0.30,
+            random_state: Optional[int] = None,
+    ):
+        self.sample_size = sample_size
+        self.per_column_quota = per_column_quota
+        self.null_fraction = null_fraction
+        self.rng = np.random.default_rng(random_state)
+        self.column_strata: List[_BottomK] = []
+        self.null_rows = _BottomK(int(sample_size * null_fraction))
+        self.complete_rows = _BottomK(sample_size)
+        self.any_rows = _BottomK(sample_size)
+        self.pool: Optional[pd.DataFrame] = None
+        self.pool_keys = np.empty(0)
+        self.pool_rows = np.empty(0, dtype=np.int64)
+        self.rows = 0
+
+    def _strata(self) -> List[_BottomK]:
+        return self.column_strata + [self.null_rows, self.complete_rows, self.any_rows]
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        if not self.column_strata:
+            self.column_strata = [_BottomK(self.per_column_quota) for _ in range(2 * len(chunk.columns))]
+
+        keys = self.rng.random(len(chunk))
+        # Rows in key order: the candidates of a stratum are its first rows in that order.
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        mask = chunk.isna().to_numpy()
+
+        # The quotas are nearly always filled from the first rows; only sparse strata scan a whole column.
+        head_mask = mask[order[:_HEAD_ROWS]]
+        for column in range(mask.shape[1]):
+            for stratum, null in ((self.column_strata[2 * column], True), (self.column_strata[2 * column + 1], False)):
+                hits = np.flatnonzero(head_mask[:, column] == null)[:stratum.size]
+                if len(hits) < stratum.size and len(order) > _HEAD_ROWS:
+                    hits = np.flatnonzero(mask[order, column] == null)[:stratum.size]
+                stratum.add(sorted_keys[hits], self.rows + order[hits])
+
+        has_null = mask.any(axis=1)[order]
+        null_hits = np.flatnonzero(has_null)
+        complete_hits = np.flatnonzero(~has_null)
+        self.null_rows.add(sorted_keys[null_hits[:self.null_rows.size]],
+                           self.rows + order[null_hits[:self.null_rows.size]], len(null_hits))
+        self.complete_rows.add(sorted_keys[complete_hits[:self.complete_rows.size]],
+                               self.rows + order[complete_hits[:self.complete_rows.size]], len(complete_hits))
+        self.any_rows.add(sorted_keys[:self.any_rows.size], self.rows + order[:self.any_rows.size], len(order))
+
+        kept = np.unique(np.concatenate([stratum.rows for stratum in self._strata()]))
+        old = np.isin(self.pool_rows, kept)
+        new = kept[kept >= self.rows] - self.rows
+        new_rows = chunk.iloc[new]
+        self.pool = new_rows if self.pool is None else pd.concat([self.pool[old], new_rows])
+        self.pool_keys = np.concatenate([self.pool_keys[old], keys[new]])
+        self.pool_rows = np.concatenate([self.pool_rows[old], new + self.rows])
+        self.rows += len(chunk)
+
+    def sample(self) -> pd.DataFrame:
+        """The sample, in random order; rows keep their index (the row number for chunks read from a file)."""
+        if self.pool is None:
+            raise ValueError("No data to sample.")
+        need_null = min(self.null_rows.size, self.null_rows.seen)
+        need_complete = min(self.sample_size - need_null, self.complete_rows.seen)
+        complete = self.complete_rows.rows[np.argsort(self.complete_rows.keys)][:need_complete]
+        selected = np.unique(np.concatenate(
+            [stratum.rows for stratum in self.column_strata] + [self.null_rows.rows, complete]
+        ))
+
+        position = {row: i for i, row in enumerate(self.pool_rows.tolist())}
+        picks = np.array([position[row] for row in selected.tolist()], dtype=np.int64)
+        if len(picks) > self.sample_size:
+            picks = picks[np.argsort(self.pool_keys[picks])[:self.sample_size]]
+        elif len(picks) < self.sample_size:
+            chosen = set(selected.tolist())
+            extra = [position[row] for row in self.any_rows.rows[np.argsort(self.any_rows.keys)].tolist()
+                     if row not in chosen]
+            picks = np.concatenate([picks, np.array(extra[:self.sample_size - len(picks)], dtype=np.int64)])
+        return self.pool.iloc[self.rng.permutation(picks)]
+
+
+def representative_sample(
+        df: pd.DataFrame,
+        sample_size: int = 50,
+        per_column_quota: int = 2,
+        null_fraction: float = 0.30,
+        random_state: Optional[int] = None,
+) -> pd.DataFrame:
+    """Stratified sample of an in-memory frame (see `StratifiedSampler`)."""
+    sampler = StratifiedSampler(sample_size, per_column_quota, null_fraction, random_state)
+    sampler.add(df)
+    return sampler.sample()
+
+
+def sample_chunks(
+        chunks: Iterable[pd.DataFrame],
+        sample_size: int = 50,
+        per_column_quota: int = 2,
+        null_fraction: float = 0.30,
+        random_state: Optional[int] = None,
+) -> pd.DataFrame:
+    sampler = StratifiedSampler(sample_size, per_column_quota, null_fraction, random_state)
+    for chunk in chunks:
+        sampler.add(chunk)
+    return sampler.sample()
+
+
+def sample_csv(
+        filepath: str,
+        sample_size: int = 50,
+        per_column_quota: int = 2,
+        null_fraction: float = 0.30,
+        random_state: Optional[int] = None,
+        chunksize: int = 100_000,
+) -> pd.DataFrame:
+    """Stratified sample of a CSV file read `chunksize` rows at a time, without loading it."""
+    with pd.read_csv(filepath, chunksize=chunksize) as reader:
+        return sample_chunks(reader, sample_size, per_column_quota, null_fraction, random_state)
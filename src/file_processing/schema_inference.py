@@ -0,0 +1,175 @@
+import re
+from typing import List, Dict, Any, Tuple, Optional
+
+import pandas as pd
+
+from src.file_processing.schema_merge import DRAFT_2020_12
+
+# (strptime format, JSON Schema format or None for a pattern), tried in order.
+DATE_FORMATS: List[Tuple[str, Optional[str]]] = [
+    ('%Y-%m-%d', 'date'),
+    ('%Y-%m-%dT%H:%M:%S', 'date-time'),
+    ('%Y-%m-%d %H:%M:%S', None),
+    ('%d/%m/%Y', None),
+    ('%m/%d/%Y', None),
+    ('%d-%m-%Y', None),
+    ('%Y/%m/%d', None),
+    ('%d.%m.%Y', None),
+]
+_EMAIL_RE = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+_URI_RE = r'^[a-zA-Z][a-zA-Z0-9+.-]*://\S+$'
+_BOOLEAN_VALUES = {'true', 'false'}
+_MAX_EXAMPLES = 3
+
+
+def value_shape(values: pd.Series) -> pd.Series:
+    """Character-class shape of each value: digits become 9, capitals A and lower-case letters a."""
+    return (values.str.replace(r'\d', '9', regex=True)
+            .str.replace(r'[A-Z]', 'A', regex=True)
+            .str.replace(r'[a-z]', 'a', regex=True))
+
+
+def shape_pattern(shape: str) -> str:
+    """Anchored regex of a shape from `value_shape`, runs of one class collapsed, e.g. AAA-99999 -> ^[A-Z]{3}-\\d{5}$."""
+    classes = {'9': r'\d', 'A': '[A-Z]', 'a': '[a-z]'}
+    parts = []
+    for run in re.finditer(r'(.)\1*', shape):
+        char, length = run.group(1), len(run.group(0))
+        token = classes.get(char, re.escape(char))
+        parts.append(token if length == 1 else f"{token}{{{length}}}")
+    return '^' + ''.join(parts) + '$'
+
+
+def date_pattern(date_format: str) -> str:
+    """Anchored regex of a strptime format, e.g. %d/%m/%Y -> ^\\d{1,2}/\\d{1,2}/\\d{4}$."""
+    directives = {'%Y': r'\d{4}', '%m': r'\d{1,2}', '%d': r'\d{1,2}', '%H': r'\d{1,2}', '%M': r'\d{2}', '%S': r'\d{2}'}
+    parts = re.split(r'(%[A-Za-z])', date_format)
+    return '^' + ''.join(directives.get(part, re.escape(part)) for part in parts) + '$'
+
+
+def _typed(json_type: str, nullable: bool) -> Any:
+    return [json_type, 'null'] if nullable else json_type
+
+
+def _infer_numeric(values: pd.Series, nullable: bool) -> Dict[str, Any]:
+    integral = bool((values % 1 == 0).all())
+    minimum, maximum = values.min(), values.max()
+    cast = int if integral else float
+    return {
+        'type': _typed('integer' if integral else 'number', nullable),
+        'minimum': cast(minimum),
+        'maximum': cast(maximum),
+    }
+
+
+def _infer_text(
+        values: pd.Series,
+        info: Dict[str, Any],
+        nullable: bool,
+        enum_threshold: int,
+        id_ratio: float,
+        min_share: float,
+) -> Tuple[Dict[str, Any], bool]:
+    """Schema of a text column and whether it is ambiguous."""
+    stripped = values.str.strip()
+
+    if stripped.str.lower().isin(_BOOLEAN_VALUES).all():
+        return {'type': _typed('boolean', nullable)}, False
+
+    numbers = pd.to_numeric(stripped, errors='coerce')
+    parsed = numbers.notna().mean()
+    if parsed == 1:
+        return _infer_numeric(numbers, nullable), False
+    if parsed >= min_share:
+        return {'type': _typed('string', nullable)}, True
+
+    head = stripped.head(20)
+    for date_format, json_format in DATE_FORMATS:
+        # Most columns are not dates in any format: rule formats out on the first values.
+        if pd.to_datetime(head, format=date_format, errors='coerce').notna().mean() < min_share:
+            continue
+        dates = pd.to_datetime(stripped, format=date_format, errors='coerce')
+        share = dates.notna().mean()
+        if share == 1:
+            schema = {'type': _typed('string', nullable)}
+            if json_format:
+                schema['format'] = json_format
+            else:
+                schema['pattern'] = date_pattern(date_format)
+            return schema, False
+        if share >= min_share:
+            return {'type': _typed('string', nullable)}, True
+
+    unique_values = info.get('unique_values')
+    if unique_values is not None and info['unique_count'] <= enum_threshold \
+            and info['unique_count'] * 2 <= len(values):
+        enum = list(unique_values) + ([None] if nullable else [])
+        return {'type': _typed('string', nullable), 'enum': enum}, False
+
+    for pattern, json_format in ((_EMAIL_RE, 'email'), (_URI_RE, 'uri')):
+        if stripped.str.match(pattern).all():
+            return {'type': _typed('string', nullable), 'format': json_format}, False
+
+    if not stripped.str.contains(r'\s').any() and stripped.str.len().max() <= 40:
+        shapes = value_shape(stripped).value_counts()
+        id_like = info['unique_count'] >= id_ratio * len(values)
+        if len(shapes) == 1 and (id_like or len(values) > enum_threshold):
+            return {'type': _typed('string', nullable), 'pattern': shape_pattern(shapes.index[0])}, False
+        if shapes.iloc[0] >= min_share * len(values):
+            return {'type': _typed('string', nullable)}, True
+
+    return {'type': _typed('string', nullable)}, True
+
+
+def infer_schema(
+        df: pd.DataFrame,
+        column_info: List[Dict[str, Any]],
+        enum_threshold: int = 20,
+        id_ratio: float = 0.9,
+        min_share: float = 0.9,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Infer a Draft 2020-12 schema of one row from the data and its
+    `get_column_info` summaries, without the model: numeric types and ranges,
+    boolean columns, low-cardinality enums (at most `enum_threshold` values),
+    null presence, date formats, e-mail/URI formats and ID-like patterns
+    (one character-class shape over the whole column).
+
+    Also returns the ambiguous columns: free text, and columns where only
+    `min_share` or more of the values fit a type, format or shape, which
+    usually means formatting errors the model should look at.
+    """
+    info_by_column = {info['column_name']: info for info in column_info}
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    ambiguous: List[str] = []
+
+    for column in df.columns:
+        info = info_by_column[column]
+        series = df[column]
+        nullable = info['null_count'] > 0
+        values = series.dropna()
+        if not nullable:
+            required.append(column)
+
+        if values.empty:
+            schema, is_ambiguous = {'type': 'null'}, True
+        elif pd.api.types.is_bool_dtype(series):
+            schema, is_ambiguous = {'type': _typed('boolean', nullable)}, False
+        elif pd.api.types.is_numeric_dtype(series):
+            schema, is_ambiguous = _infer_numeric(values, nullable), False
+        else:
+            schema, is_ambiguous = _infer_text(
+                values.astype(str), info, nullable, enum_threshold, id_ratio, min_share,
+            )
+
+        if not values.empty:
+            schema['examples'] = values.drop_duplicates().head(_MAX_EXAMPLES).tolist()
+        properties[column] = schema
+        if is_ambiguous:
+            ambiguous.append(column)
+
+    schema = {"$schema": DRAFT_2020_12, "type": "object", "properties": properties}
+    if required:
+        schema['required'] = required
+    return schema, ambiguous
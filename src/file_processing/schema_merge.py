@@ -0,0 +1,182 @@
+import json
+import re
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+DRAFT_2020_12 = "https://json-schema.org/draft/2020-12/schema"
+
+_LOWER_BOUNDS = ('minimum', 'exclusiveMinimum', 'minLength', 'minItems')
+_UPPER_BOUNDS = ('maximum', 'exclusiveMaximum', 'maxLength', 'maxItems')
+_MAX_EXAMPLES = 5
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _types_of(schema: Dict[str, Any]) -> List[str]:
+    types = schema.get('type', [])
+    return [types] if isinstance(types, str) else list(types)
+
+
+def merge_types(type_lists: List[List[str]]) -> Optional[Any]:
+    """
+    Widen the types seen across samples: integer and number give number, any
+    other mix of types gives string (every CSV value is a string), and null
+    is kept if one sample allowed it.
+    """
+    types = {t for type_list in type_lists for t in type_list}
+    nullable = 'null' in types
+    types.discard('null')
+    if {'integer', 'number'} <= types:
+        types.discard('integer')
+    if len(types) > 1:
+        types = {'string'}
+    if not types:
+        return 'null' if nullable else None
+    merged = types.pop()
+    return [merged, 'null'] if nullable else merged
+
+
+def _union(lists: List[List[Any]], cap: Optional[int] = None) -> Optional[List[Any]]:
+    """Union of the lists in first-seen order, or None past `cap` values."""
+    seen, union = set(), []
+    for values in lists:
+        for value in values:
+            key = _dump(value)
+            if key not in seen:
+                seen.add(key)
+                union.append(value)
+    if cap is not None and len(union) > cap:
+        return None
+    return union
+
+
+def _match_share(pattern: str, values: pd.Series) -> float:
+    """Share of `values` matching `pattern`, 0 for an invalid pattern."""
+    try:
+        matches = values.str.contains(pattern, regex=True)
+    except re.error:
+        return 0.0
+    return float(matches.mean()) if len(values) else 1.0
+
+
+def merge_patterns(
+        patterns: List[Optional[str]],
+        values: Optional[pd.Series] = None,
+        min_match: float = 0.8,
+) -> List[str]:
+    """
+    The patterns to keep, most proposed first: those proposed by a majority of
+    the samples and, with `values` (the non-null column values as strings),
+    any other matching at least `min_match` of them. The column is still to be
+    cleaned, so a pattern is not expected to match every value.
+    """
+    counts: Dict[str, int] = {}
+    for pattern in patterns:
+        if pattern is not None:
+            counts[pattern] = counts.get(pattern, 0) + 1
+    ranked = sorted(counts, key=lambda p: -counts[p])
+    kept = []
+    for pattern in ranked:
+        try:
+            re.compile(pattern)
+        except re.error:
+            continue
+        if 2 * counts[pattern] > len(patterns) or (values is not None and _match_share(pattern, values) >= min_match):
+            kept.append(pattern)
+    return kept
+
+
+def merge_property(
+        schemas: List[Dict[str, Any]],
+        values: Optional[pd.Series] = None,
+        enum_cap: int = 50,
+        min_match: float = 0.8,
+) -> Dict[str, Any]:
+    """Merge the schemas proposed for one column by several samples."""
+    merged: Dict[str, Any] = {}
+
+    types = merge_types([_types_of(schema) for schema in schemas if 'type' in schema])
+    if types is not None:
+        merged['type'] = types
+
+    if all('enum' in schema for schema in schemas):
+        enum = _union([schema['enum'] for schema in schemas], cap=enum_cap)
+        if enum is not None:
+            merged['enum'] = enum
+
+    patterns = merge_patterns([schema.get('pattern') for schema in schemas], values, min_match)
+    if patterns:
+        merged['pattern'] = patterns[0]
+        if len(patterns) > 1:
+            merged['allOf'] = [{'pattern': pattern} for pattern in patterns[1:]]
+
+    for key in _LOWER_BOUNDS + _UPPER_BOUNDS:
+        if all(key in schema for schema in schemas):
+            bounds = [schema[key] for schema in schemas]
+            merged[key] = min(bounds) if key in _LOWER_BOUNDS else max(bounds)
+
+    descriptions = [schema['description'] for schema in schemas if schema.get('description')]
+    if descriptions:
+        merged['description'] = descriptions[0]
+
+    examples = _union([
+        schema['examples'] if isinstance(schema['examples'], list) else [schema['examples']]
+        for schema in schemas if 'examples' in schema
+    ])
+    if examples:
+        merged['examples'] = examples[:_MAX_EXAMPLES]
+
+    # Any other keyword (format, const, ...) is kept only when every sample agrees on it.
+    handled = {'type', 'enum', 'pattern', 'allOf', 'description', 'examples', *_LOWER_BOUNDS, *_UPPER_BOUNDS}
+    for key in _union([list(schema) for schema in schemas]):
+        if key not in handled and len({_dump(schema.get(key)) for schema in schemas}) == 1:
+            merged[key] = schemas[0][key]
+    return merged
+
+
+def merge_schemas(
+        schemas: List[Dict[str, Any]],
+        data: Optional[pd.DataFrame] = None,
+        enum_cap: int = 50,
+        min_match: float = 0.8,
+) -> Dict[str, Any]:
+    """
+    Deterministically merge the JSON Schemas inferred on several samples of
+    one table: types are widened, enums united up to `enum_cap` values,
+    patterns kept when a majority of samples propose them or they match at
+    least `min_match` of the column values of `data` (`pattern` plus `allOf`
+    when several are kept), bounds widened, and a column is required
+    only if every sample requires it. The result depends only on the order
+    of `schemas`.
+    """
+    if not schemas:
+        raise ValueError("No schema to merge.")
+
+    columns = _union([list(schema.get('properties', {})) for schema in schemas])
+    if data is not None:
+        columns = [c for c in data.columns if c in columns] + [c for c in columns if c not in data.columns]
+
+    properties: Dict[str, Any] = {}
+    for column in columns:
+        proposed = [schema['properties'][column] for schema in schemas if column in schema.get('properties', {})]
+        values = None
+        # Patterns are checked on text columns only: pandas renders parsed numbers differently from the file.
+        if data is not None and column in data.columns and data[column].dtype == object:
+            values = data[column].dropna().astype(str)
+        properties[column] = merge_property(proposed, values, enum_cap, min_match)
+
+    required = [
+        column for column in columns
+        if all(column in schema.get('required', []) for schema in schemas)
+    ]
+
+    merged: Dict[str, Any] = {"$schema": DRAFT_2020_12, "type": "object", "properties": properties}
+    if required:
+        merged['required'] = required
+    for key in _union([list(schema) for schema in schemas]):
+        if key not in merged and key != 'required' and len({_dump(schema.get(key)) for schema in schemas}) == 1:
+            merged[key] = schemas[0][key]
+    return merged
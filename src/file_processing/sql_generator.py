@@ -0,0 +1,135 @@
+import math
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.file_processing.csv import CSVLoader
+
+# JSON Schema type -> SQLite column type (booleans are stored as 0/1 integers, arrays and objects as JSON text).
+SQLITE_TYPES: Dict[str, str] = {
+    'integer': 'INTEGER',
+    'number': 'REAL',
+    'boolean': 'INTEGER',
+    'string': 'TEXT',
+    'array': 'TEXT',
+    'object': 'TEXT',
+    'null': 'TEXT',
+}
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def quote_literal(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)) and not (isinstance(value, float) and not math.isfinite(value)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _json_types(property_schema: Dict[str, Any]) -> List[str]:
+    types = property_schema.get('type', [])
+    return [types] if isinstance(types, str) else list(types)
+
+
+def sqlite_type(property_schema: Dict[str, Any]) -> str:
+    """SQLite type of a column from its JSON schema: the first non-null type, TEXT when unknown."""
+    for json_type in _json_types(property_schema):
+        if json_type != 'null':
+            return SQLITE_TYPES.get(json_type, 'TEXT')
+    return 'TEXT'
+
+
+def sqlite_type_of_dtype(dtype: Any) -> str:
+    """SQLite type of a pandas dtype, for columns without a schema."""
+    kind = getattr(dtype, 'kind', 'O')
+    if kind in 'iub':
+        return 'INTEGER'
+    if kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+def check_constraints(name: str, property_schema: Dict[str, Any]) -> List[str]:
+    """
+    CHECK expressions for the enum, range and length keywords of a column.
+    Patterns and formats have no SQLite equivalent and are left to
+    `CSVLoader.validate_dataset`. NULL passes every CHECK, as in SQL.
+    """
+    column = quote_identifier(name)
+    checks: List[str] = []
+    if 'boolean' in _json_types(property_schema):
+        checks.append(f"{column} IN (0, 1)")
+
+    enum = [value for value in property_schema.get('enum', []) if value is not None]
+    if enum:
+        checks.append(f"{column} IN ({', '.join(quote_literal(value) for value in enum)})")
+
+    for keyword, operator in (('minimum', '>='), ('maximum', '<='), ('exclusiveMinimum', '>'), ('exclusiveMaximum', '<')):
+        bound = property_schema.get(keyword)
+        if isinstance(bound, (int, float)) and not isinstance(bound, bool):
+            checks.append(f"{column} {operator} {quote_literal(bound)}")
+
+    for keyword, operator in (('minLength', '>='), ('maxLength', '<=')):
+        bound = property_schema.get(keyword)
+        if isinstance(bound, int) and not isinstance(bound, bool):
+            checks.append(f"length({column}) {operator} {bound}")
+    return checks
+
+
+def column_definition(
+        name: str,
+        property_schema: Optional[Dict[str, Any]],
+        required: bool = False,
+        dtype: Any = None,
+        constraints: bool = True,
+) -> str:
+    """One column of a CREATE TABLE: type, NOT NULL for required non-nullable columns and CHECK constraints."""
+    if not property_schema:
+        return f"{quote_identifier(name)} {sqlite_type_of_dtype(dtype)}"
+
+    parts = [quote_identifier(name), sqlite_type(property_schema)]
+    if required and 'null' not in _json_types(property_schema) and None not in property_schema.get('enum', []):
+        parts.append('NOT NULL')
+    if constraints:
+        parts.extend(f"CHECK ({check})" for check in check_constraints(name, property_schema))
+    return ' '.join(parts)
+
+
+def create_table_sql(
+        table_name: str,
+        columns: List[str],
+        schema: Optional[Dict[str, Any]] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        constraints: bool = True,
+        if_not_exists: bool = True,
+) -> str:
+    """
+    CREATE TABLE statement for `columns`, typed from the JSON schema
+    properties (NOT NULL from `required`, CHECK constraints for enums, ranges
+    and lengths unless `constraints` is False), or from the pandas `dtypes`
+    of columns the schema does not describe.
+    """
+    properties = (schema or {}).get('properties', {})
+    required = set((schema or {}).get('required', []))
+    definitions = [
+        column_definition(column, properties.get(column), column in required, (dtypes or {}).get(column), constraints)
+        for column in columns
+    ]
+    body = ',\n    '.join(definitions)
+    exists = 'IF NOT EXISTS ' if if_not_exists else ''
+    return f"CREATE TABLE {exists}{quote_identifier(table_name)} (\n    {body}\n)"
+
+
+def generate_create_table(csvloader: 'CSVLoader', table_name: str, constraints: bool = True) -> str:
+    """CREATE TABLE statement for the data of a CSVLoader, typed from its schema when it has one."""
+    return create_table_sql(
+        table_name,
+        list(csvloader.data.columns),
+        csvloader.schema,
+        dict(csvloader.data.dtypes),
+        constraints,
+    )
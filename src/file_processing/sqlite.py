@@ -1,13 +1,86 @@
+import bz2
+import csv
+import gzip
+import lzma
 import sqlite3
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Tuple, IO, TYPE_CHECKING
+
 import pandas as pd
 
-from file_processing.sql_generator import generate_create_table
+from src.file_processing.sql_generator import generate_create_table, create_table_sql, quote_identifier
+
+if TYPE_CHECKING:
+    from src.file_processing.csv import CSVLoader
+
+# Write-ahead log, fsync at checkpoints only, a 64 MB page cache and in-memory temp tables:
+# safe against application crashes and much faster for bulk writes than the defaults.
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+IF_EXISTS_MODES = ('fail', 'replace', 'append')
+# Compression of streamed CSV exports, by name and by file extension. Zip is not streamable and is refused.
+COMPRESSIONS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+_COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zip': 'zip'}
+
+
+def select_sql(
+        table_name: str,
+        columns: Optional[Sequence[str]] = None,
+        where: Optional[str] = None,
+        order_by: Optional[str] = None,
+) -> str:
+    """
+    SELECT statement for a table with optional column projection. `where` and
+    `order_by` are SQL fragments; values go in `?` placeholders of `where`
+    and are bound as parameters, never formatted into the statement.
+    """
+    projection = ', '.join(quote_identifier(column) for column in columns) if columns else '*'
+    sql = f"SELECT {projection} FROM {quote_identifier(table_name)}"
+    if where:
+        sql += f" WHERE {where}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    return sql
+
+
+def _open_output(path: str, compression: Optional[str] = 'infer') -> IO[str]:
+    if compression == 'infer':
+        compression = next((name for extension, name in _COMPRESSION_EXTENSIONS.items() if path.endswith(extension)), None)
+    if compression is None:
+        return open(path, 'w', newline='', encoding='utf-8')
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression '{compression}', expected one of {list(COMPRESSIONS)} or None.")
+    return COMPRESSIONS[compression](path, 'wt', newline='', encoding='utf-8')
+
+
+def dataframe_rows(df: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    """
+    Rows of a frame as tuples of Python values sqlite3 can bind: NaN becomes
+    NULL, datetimes ISO text. Converted column by column (`tolist` turns numpy
+    scalars into Python ones), which is faster than iterating over rows.
+    """
+    columns = []
+    for _, series in df.items():
+        if series.dtype.kind == 'M':
+            series = series.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        nulls = series.isna().to_numpy()
+        if nulls.any():
+            values = series.to_numpy(dtype=object)
+            values[nulls] = None
+            columns.append(values.tolist())
+        else:
+            columns.append(series.tolist())
+    return list(zip(*columns))
 
 
 class SQLiteManager:
-    def __init__(self, db_path: str):
-        """Initialize the SQLiteManager with the database path and establish a connection."""
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None):
+        """Initialize the SQLiteManager with the database path and establish a connection, tuned with `pragmas` (default: DEFAULT_PRAGMAS)."""
         self.db_path = db_path
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
         self.connection = None
         self.cursor = None
         self._connect()
@@ -17,6 +90,8 @@ class SQLiteManager:
         try:
             self.connection = sqlite3.connect(self.db_path)
             self.cursor = self.connection.cursor()
+            for name, value in self.pragmas.items():
+                self.cursor.execute(f"PRAGMA {name} = {value}")
         except sqlite3.Error as e:
             raise RuntimeError(f"Failed to connect to database: {e}")
 
@@ -59,14 +134,178 @@ class SQLiteManager:
         except sqlite3.Error as e:
             raise RuntimeError(f"SQL query failed: {e}")
 
-    def import_from_csvloader(self, csvloader: 'CSVLoader', table_name: str = None):
-        """Import data from a CSVLoader into a table."""
+    def iter_query(self, sql: str, parameters: Sequence[Any] = (), batch_size: int = 10_000) -> Iterator[List[tuple]]:
+        """
+        Execute a SELECT query and yield its rows `batch_size` at a time
+        (fetchmany), on a cursor of its own so other statements can run in between.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql, parameters)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        except sqlite3.Error as e:
+            raise RuntimeError(f"SQL query failed: {e}")
+        finally:
+            cursor.close()
+
+    def _prepare_table(self, table_name: str, create_sql: str, if_exists: str) -> None:
+        if if_exists not in IF_EXISTS_MODES:
+            raise ValueError(f"Invalid if_exists '{if_exists}', expected one of {IF_EXISTS_MODES}.")
+        if if_exists == 'replace':
+            self.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        if if_exists == 'fail':
+            create_sql = create_sql.replace('CREATE TABLE IF NOT EXISTS ', 'CREATE TABLE ', 1)
+        self.create_table(create_sql)
+
+    def bulk_insert(
+            self,
+            table_name: str,
+            columns: Sequence[str],
+            rows: Iterable[Sequence[Any]],
+            chunk_size: int = 100_000,
+            on_conflict: Optional[str] = None,
+    ) -> int:
+        """
+        Insert rows with executemany, `chunk_size` rows per transaction.
+        A failing chunk is rolled back; the chunks before it stay committed.
+        `on_conflict` 'REPLACE' or 'IGNORE' resolves unique key conflicts.
+        Returns the number of rows inserted.
+        """
+        if on_conflict not in (None, 'REPLACE', 'IGNORE'):
+            raise ValueError(f"Invalid on_conflict '{on_conflict}', expected 'REPLACE', 'IGNORE' or None.")
+        placeholders = ', '.join('?' for _ in columns)
+        verb = f"INSERT OR {on_conflict}" if on_conflict else "INSERT"
+        sql = (f"{verb} INTO {quote_identifier(table_name)} ({', '.join(quote_identifier(c) for c in columns)}) "
+               f"VALUES ({placeholders})")
+        inserted = 0
+        chunk: List[Sequence[Any]] = []
+        try:
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    inserted += self._insert_chunk(sql, chunk)
+                    chunk = []
+            if chunk:
+                inserted += self._insert_chunk(sql, chunk)
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Bulk insert into {table_name} failed after {inserted} rows: {e}")
+        return inserted
+
+    def _insert_chunk(self, sql: str, rows: List[Sequence[Any]]) -> int:
+        with self.connection:
+            self.cursor.executemany(sql, rows)
+        return len(rows)
+
+    def insert_dataframe(self, table_name: str, df: pd.DataFrame, chunk_size: int = 100_000) -> int:
+        """Bulk insert a frame `chunk_size` rows (one transaction) at a time."""
+        inserted = 0
+        for start in range(0, len(df), chunk_size):
+            rows = dataframe_rows(df.iloc[start:start + chunk_size])
+            inserted += self.bulk_insert(table_name, list(df.columns), rows, chunk_size)
+        return inserted
+
+    def import_from_csvloader(
+            self,
+            csvloader: 'CSVLoader',
+            table_name: str = None,
+            chunk_size: int = 100_000,
+            constraints: bool = True,
+            if_exists: str = 'append',
+    ) -> int:
+        """
+        Import data from a CSVLoader into a table created from its schema
+        (see `generate_create_table`). `constraints=False` leaves out the CHECK
+        constraints, e.g. to store data that is still to be fixed.
+        """
         if table_name is None:
             table_name = csvloader.name if csvloader.name else "default_table"
-        create_sql = generate_create_table(csvloader, table_name)
-        self.create_table(create_sql)
-        csvloader.data.to_sql(table_name, self.connection, if_exists='append', index=False)
+        create_sql = generate_create_table(csvloader, table_name, constraints)
+        self._prepare_table(table_name, create_sql, if_exists)
+        return self.insert_dataframe(table_name, csvloader.data, chunk_size)
+
+    def import_csv(
+            self,
+            filepath: str,
+            table_name: str,
+            schema: Optional[Dict[str, Any]] = None,
+            chunk_size: int = 100_000,
+            constraints: bool = True,
+            if_exists: str = 'append',
+            **read_csv_kwargs: Any,
+    ) -> int:
+        """Import a CSV file `chunk_size` rows at a time, without loading it whole. The table is created from the first chunk."""
+        inserted = 0
+        with pd.read_csv(filepath, chunksize=chunk_size, **read_csv_kwargs) as reader:
+            for index, chunk in enumerate(reader):
+                if index == 0:
+                    create_sql = create_table_sql(table_name, list(chunk.columns), schema, dict(chunk.dtypes), constraints)
+                    self._prepare_table(table_name, create_sql, if_exists)
+                inserted += self.insert_dataframe(table_name, chunk, chunk_size)
+        return inserted
+
+    def export_to_dataframe(
+            self,
+            table_name: str,
+            columns: Optional[Sequence[str]] = None,
+            where: Optional[str] = None,
+            parameters: Sequence[Any] = (),
+            order_by: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Export a table, or the `columns` of its rows matching `where` (see `select_sql`), to a pandas DataFrame."""
+        return pd.read_sql(select_sql(table_name, columns, where, order_by), self.connection, params=parameters)
+
+    def iter_dataframes(
+            self,
+            table_name: str,
+            columns: Optional[Sequence[str]] = None,
+            where: Optional[str] = None,
+            parameters: Sequence[Any] = (),
+            order_by: Optional[str] = None,
+            chunk_size: int = 100_000,
+    ) -> Iterator[pd.DataFrame]:
+        """`export_to_dataframe` as a stream of frames of at most `chunk_size` rows."""
+        sql = select_sql(table_name, columns, where, order_by)
+        names: Optional[List[str]] = None
+        for rows in self.iter_query(sql, parameters, chunk_size):
+            if names is None:
+                names = self._column_names(sql, parameters)
+            yield pd.DataFrame.from_records(rows, columns=names)
+
+    def _column_names(self, sql: str, parameters: Sequence[Any] = ()) -> List[str]:
+        """Result column names of a query, without fetching its rows."""
+        cursor = self.connection.execute(f"SELECT * FROM ({sql}) LIMIT 0", parameters)
+        try:
+            return [description[0] for description in cursor.description]
+        finally:
+            cursor.close()
 
-    def export_to_dataframe(self, table_name: str) -> pd.DataFrame:
-        """Export a table to a pandas DataFrame."""
-        return pd.read_sql(f"SELECT * FROM {table_name}", self.connection)
\ No newline at end of file
+    def export_to_csv(
+            self,
+            table_name: str,
+            path: str,
+            columns: Optional[Sequence[str]] = None,
+            where: Optional[str] = None,
+            parameters: Sequence[Any] = (),
+            order_by: Optional[str] = None,
+            compression: Optional[str] = 'infer',
+            batch_size: int = 10_000,
+    ) -> int:
+        """
+        Write the rows of a query (see `export_to_dataframe`) to a CSV file,
+        `batch_size` rows at a time, gzip/bz2/xz compressed when asked or when
+        the path ends in .gz/.bz2/.xz. NULL is written as an empty field, as
+        pandas does. Returns the number of rows written.
+        """
+        sql = select_sql(table_name, columns, where, order_by)
+        written = 0
+        with _open_output(path, compression) as handle:
+            writer = csv.writer(handle)
+            writer.writerow(self._column_names(sql, parameters))
+            for rows in self.iter_query(sql, parameters, batch_size):
+                writer.writerows(rows)
+                written += len(rows)
+        return written
\ No newline at end of file
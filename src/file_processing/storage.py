@@ -0,0 +1,177 @@
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.file_processing.sql_generator import create_table_sql, quote_identifier
+from src.file_processing.sqlite import SQLiteManager
+
+# Declared SQLite column type -> pandas dtype of the values read back.
+SQLITE_DTYPES: Dict[str, np.dtype] = {
+    'INTEGER': np.dtype('int64'),
+    'REAL': np.dtype('float64'),
+    'TEXT': np.dtype('object'),
+}
+_ROW = '__row'
+
+
+def _sqlite_value(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class SQLiteStorage:
+    """
+    The table of a CSV file kept in a SQLite database instead of memory. Row
+    `i` of the file is rowid `i + 1`, so batches are read by rowid range and
+    cells updated by rowid. Updates are committed in transactions of
+    `batch_size` cells, and the database (WAL) survives a crash of the process.
+    """
+
+    def __init__(self, db_path: str, table_name: str = 'data', pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.table_name = table_name
+        self.manager = SQLiteManager(db_path, pragmas)
+        self._columns: Optional[List[Tuple[str, str]]] = None
+
+    @property
+    def _table(self) -> str:
+        return quote_identifier(self.table_name)
+
+    def close(self) -> None:
+        self.manager.close()
+
+    def exists(self) -> bool:
+        return bool(self.manager.query(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table_name,),
+        ))
+
+    def load_csv(self, filepath: str, chunksize: int = 100_000, **read_csv_kwargs: Any) -> int:
+        """(Re)load the table from a CSV file, `chunksize` rows at a time. No CHECK constraints: the data is still to be fixed."""
+        self._columns = None
+        return self.manager.import_csv(
+            filepath, self.table_name, chunk_size=chunksize, constraints=False, if_exists='replace', **read_csv_kwargs,
+        )
+
+    def write_frame(self, df: pd.DataFrame, chunksize: int = 100_000) -> int:
+        """Replace the table with the rows of `df`."""
+        self._columns = None
+        self.manager.execute(f"DROP TABLE IF EXISTS {self._table}")
+        self.manager.create_table(create_table_sql(self.table_name, list(df.columns), dtypes=dict(df.dtypes)))
+        return self.manager.insert_dataframe(self.table_name, df.reset_index(drop=True), chunksize)
+
+    def _column_types(self) -> List[Tuple[str, str]]:
+        if self._columns is None:
+            self._columns = [(row[1], row[2].upper()) for row in self.manager.query(f"PRAGMA table_info({self._table})")]
+        return self._columns
+
+    @property
+    def columns(self) -> List[str]:
+        return [name for name, _ in self._column_types()]
+
+    @property
+    def dtypes(self) -> Dict[str, np.dtype]:
+        return {name: SQLITE_DTYPES.get(sqlite_type, np.dtype('object')) for name, sqlite_type in self._column_types()}
+
+    @property
+    def num_rows(self) -> int:
+        # Rowids are dense from 1, so the largest one is the row count, read from the rowid b-tree without a scan.
+        return self.manager.query(f"SELECT max(rowid) FROM {self._table}")[0][0] or 0
+
+    def read_range(self, start: int, end: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Rows `start` to `end` (excluded), indexed by row number like the in-memory frame."""
+        columns = columns or self.columns
+        select = ', '.join(quote_identifier(column) for column in columns)
+        df = pd.read_sql(
+            f"SELECT rowid - 1 AS {_ROW}, {select} FROM {self._table} WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+            self.manager.connection,
+            params=(start, end),
+            index_col=_ROW,
+        )
+        df.index.name = None
+        dtypes = self.dtypes
+        for column in columns:
+            if dtypes.get(column) == np.dtype('float64') or (dtypes.get(column) == np.dtype('int64') and df[column].isna().any()):
+                # Missing numbers are NaN, as pandas reads them from the file.
+                try:
+                    df[column] = df[column].astype('float64')
+                except (ValueError, TypeError):
+                    pass
+            elif df[column].dtype == object:
+                # Missing text is NaN too, not the None sqlite3 returns for NULL.
+                df[column] = df[column].fillna(np.nan)
+        return df
+
+    def read_all(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        return self.read_range(0, self.num_rows, columns)
+
+    def iter_chunks(self, chunksize: int = 100_000, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        num_rows = self.num_rows
+        for start in range(0, num_rows, chunksize):
+            yield self.read_range(start, min(start + chunksize, num_rows), columns)
+
+    def export_csv(self, path: str, columns: Optional[List[str]] = None, compression: Optional[str] = 'infer') -> int:
+        """Write the table, in file order, to a (compressed) CSV file without loading it."""
+        return self.manager.export_to_csv(self.table_name, path, columns, order_by='rowid', compression=compression)
+
+    def create_index(self, columns: Iterable[str]) -> None:
+        """Index `columns` (one index each), for lookups by value such as `rows_with_value`."""
+        for column in columns:
+            index_name = quote_identifier(f"ix_{self.table_name}_{column}")
+            self.manager.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {self._table} ({quote_identifier(column)})")
+
+    def distinct_values(self, column: str) -> List[Any]:
+        return [row[0] for row in self.manager.query(
+            f"SELECT DISTINCT {quote_identifier(column)} FROM {self._table} WHERE {quote_identifier(column)} IS NOT NULL"
+        )]
+
+    def rows_with_value(self, column: str, value: Any) -> List[int]:
+        return [row[0] for row in self.manager.query(
+            f"SELECT rowid - 1 FROM {self._table} WHERE {quote_identifier(column)} = ? ORDER BY rowid",
+            (_sqlite_value(value),),
+        )]
+
+    def read_cells(self, column: str, rows: List[int], batch_size: int = 500) -> Dict[int, Any]:
+        """{row: value} of `column` at the given rows, looked up by rowid `batch_size` rows per query."""
+        values: Dict[int, Any] = {}
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            placeholders = ', '.join('?' for _ in batch)
+            values.update(self.manager.query(
+                f"SELECT rowid - 1, {quote_identifier(column)} FROM {self._table} WHERE rowid IN ({placeholders})",
+                tuple(row + 1 for row in batch),
+            ))
+        return values
+
+    def update_cells(self, cells: Iterable[Tuple[int, str, Any]], batch_size: int = 10_000) -> int:
+        """
+        Set (row, column, value) cells with one `UPDATE ... WHERE rowid = ?`
+        executemany per column, `batch_size` cells per transaction.
+        Returns the number of cells written.
+        """
+        pending: Dict[str, List[Tuple[Any, int]]] = defaultdict(list)
+        buffered = written = 0
+        for row, column, value in cells:
+            pending[column].append((_sqlite_value(value), row + 1))
+            buffered += 1
+            if buffered >= batch_size:
+                written += self._flush_updates(pending)
+                pending, buffered = defaultdict(list), 0
+        if buffered:
+            written += self._flush_updates(pending)
+        return written
+
+    def _flush_updates(self, pending: Dict[str, List[Tuple[Any, int]]]) -> int:
+        connection = self.manager.connection
+        with connection:
+            for column, parameters in pending.items():
+                connection.executemany(
+                    f"UPDATE {self._table} SET {quote_identifier(column)} = ? WHERE rowid = ?", parameters,
+                )
+        return sum(len(parameters) for parameters in pending.values())
@@ -1,3 +1,11 @@
-from src.llm_providers.llm import base_llm
+from typing import Any
 
-__all__ = ["base_llm"]
\ No newline at end of file
+__all__ = ["base_llm"]
+
+
+def __getattr__(name: str) -> Any:
+    # `base_llm` is built on first access, so importing the package does not load langchain_openai.
+    if name == "base_llm":
+        from src.llm_providers.llm import get_base_llm
+        return get_base_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
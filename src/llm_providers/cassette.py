@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional, List, Dict, Any
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, AIMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+from pydantic import PrivateAttr
+
+CASSETTE_MODES = ("record", "replay", "auto")
+
+
+def request_hash(messages: List[BaseMessage], **kwargs: Any) -> str:
+    """Stable hash of the messages and call options (stop, response_format, ...) of a request."""
+    payload = {
+        "messages": [[message.type, message.content] for message in messages],
+        "options": {key: kwargs[key] for key in sorted(kwargs) if kwargs[key] is not None},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Record/replay wrapper around a chat model.
+
+    In "record" mode every request goes to `model` and the response is appended
+    to a gzip JSON-lines cassette, keyed by the request hash. In "replay" mode
+    responses are served from the cassette without network access, after
+    sleeping for the recorded latency (times `latency_scale`, or a fixed
+    `latency` when given). "auto" replays known requests and records new ones.
+    Identical requests recorded several times are replayed in recording order.
+    """
+    cassette_path: str
+    mode: str = "replay"
+    model: Optional[BaseChatModel] = None
+    latency: Optional[float] = None
+    latency_scale: float = 1.0
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _entries: Optional[Dict[str, List[Dict[str, Any]]]] = PrivateAttr(default=None)
+    _cursor: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _stats: Dict[str, int] = PrivateAttr(default_factory=lambda: {"hits": 0, "misses": 0, "recorded": 0})
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if self.mode not in CASSETTE_MODES:
+            raise ValueError(f"Invalid cassette mode '{self.mode}', expected one of {CASSETTE_MODES}.")
+        if self.mode in ("record", "auto") and self.model is None:
+            raise ValueError(f"A wrapped model is required in '{self.mode}' mode.")
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._entries is None:
+            entries: Dict[str, List[Dict[str, Any]]] = {}
+            if os.path.exists(self.cassette_path):
+                with gzip.open(self.cassette_path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries.setdefault(entry["key"], []).append(entry)
+            self._entries = entries
+        return self._entries
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            recorded = self._load().get(key)
+            if not recorded:
+                return None
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = position + 1
+            self._stats["hits"] += 1
+            return recorded[min(position, len(recorded) - 1)]
+
+    def _record(self, key: str, response: AIMessage, latency: float) -> None:
+        entry = {
+            "key": key,
+            "content": response.content,
+            "response_metadata": response.response_metadata,
+            "usage_metadata": response.usage_metadata,
+            "latency": round(latency, 4),
+        }
+        with self._lock:
+            self._load().setdefault(key, []).append(entry)
+            self._stats["recorded"] += 1
+            directory = os.path.dirname(self.cassette_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.cassette_path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        key = request_hash(messages, stop=stop, **kwargs)
+
+        entry = self._lookup(key) if self.mode != "record" else None
+        if entry is not None:
+            delay = self.latency if self.latency is not None else entry["latency"] * self.latency_scale
+            if delay > 0:
+                time.sleep(delay)
+            message = AIMessage(
+                content=entry["content"],
+                response_metadata=entry.get("response_metadata") or {},
+                usage_metadata=entry.get("usage_metadata"),
+            )
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        if self.mode == "replay":
+            with self._lock:
+                self._stats["misses"] += 1
+            raise ValueError(f"No recorded response in cassette '{self.cassette_path}' for request {key}.")
+
+        start = time.perf_counter()
+        response = self.model.invoke(messages, stop=stop, **kwargs)
+        self._record(key, response, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=response)])
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
+JSON_OBJECT: Dict[str, str] = {"type": "json_object"}
+
+
+def compile_chain(
+        model: BaseChatModel,
+        system_prompt: str,
+        human_prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+) -> Runnable:
+    """
+    Build `prompt | model`. `response_format` is bound on the model itself, so
+    it reaches the provider call.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_messages([('system', system_prompt), ('human', human_prompt)])
+    bound_model = model.bind(response_format=response_format) if response_format else model
+    return prompt | bound_model
+
+
+class ChainRegistry:
+    """
+    Thread-safe cache of compiled chains, one per model and (system prompt,
+    human prompt, response format). Chains are immutable runnables,
+    so the same instance is shared by every thread calling the model. The
+    chains of the `max_models` most recently used models are kept.
+    """
+
+    def __init__(self, max_models: int = 16):
+        self.max_models = max_models
+        self._lock = threading.Lock()
+        self._chains: OrderedDict[int, Tuple[BaseChatModel, Dict[Tuple, Runnable]]] = OrderedDict()
+
+    def get(
+            self,
+            model: BaseChatModel,
+            human_prompt: str,
+            system_prompt: str,
+            response_format: Optional[Dict[str, Any]] = None,
+    ) -> Runnable:
+        key = (system_prompt, human_prompt, json.dumps(response_format, sort_keys=True))
+        with self._lock:
+            entry = self._chains.get(id(model))
+            if entry is None or entry[0] is not model:
+                entry = (model, {})
+                self._chains[id(model)] = entry
+                while len(self._chains) > self.max_models:
+                    self._chains.popitem(last=False)
+            self._chains.move_to_end(id(model))
+            chain = entry[1].get(key)
+            if chain is None:
+                chain = compile_chain(model, system_prompt, human_prompt, response_format)
+                entry[1][key] = chain
+            return chain
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chains.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(chains) for _, chains in self._chains.values())
+
+
+chain_registry = ChainRegistry()
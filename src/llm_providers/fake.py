@@ -0,0 +1,163 @@
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional, List, Dict, Any
+
+import pandas as pd
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, AIMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+from pydantic import PrivateAttr
+
+_CSV_BLOCK_RE = re.compile(r"```csv\s*\n(.*?)\n\s*```", re.DOTALL)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline stand-in for a chat model.
+
+    Schema prompts get a schema typing every column of the sample as a string,
+    fix prompts get one improvement per cell of the CSV block (the stripped cell
+    value). Every call sleeps for `latency` seconds and is counted, so fixers can
+    be benchmarked without network access.
+
+    With `prefix_cache`, usage reports cached prompt tokens the way OpenAI's
+    prompt cache does: the longest prefix shared with a recent prompt, once it
+    reaches `cache_min_tokens`, in steps of `cache_block_tokens`.
+
+    `error_rate` and `slow_rate` (with `slow_latency`) make a seeded share of
+    calls fail or stall, to stand in for a degraded endpoint.
+    """
+    model_name: str = "fake-chat-model"
+    latency: float = 0.0
+    prefix_cache: bool = False
+    cache_min_tokens: int = 1024
+    cache_block_tokens: int = 128
+    error_rate: float = 0.0
+    slow_rate: float = 0.0
+    slow_latency: float = 0.0
+    seed: int = 0
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _random: random.Random = PrivateAttr(default=None)
+    _recent_prompts: deque = PrivateAttr(default_factory=lambda: deque(maxlen=32))
+    _stats: Dict[str, int] = PrivateAttr(default_factory=lambda: {
+        "calls": 0,
+        "prompt_chars": 0,
+        "completion_chars": 0,
+        "cached_chars": 0,
+        "failures": 0,
+    })
+
+    def model_post_init(self, __context: Any) -> None:
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+            self._recent_prompts.clear()
+
+    def _cached_chars(self, prompt: str) -> int:
+        """Length of the cacheable prefix of `prompt`; the caller holds the lock."""
+        if not self.prefix_cache:
+            return 0
+        shared = max((len(os.path.commonprefix([prompt, recent])) for recent in self._recent_prompts), default=0)
+        self._recent_prompts.append(prompt)
+        block = self.cache_block_tokens * 4
+        if shared < self.cache_min_tokens * 4:
+            return 0
+        return shared // block * block
+
+    @staticmethod
+    def _read_csv_block(prompt: str) -> Optional[pd.DataFrame]:
+        match = _CSV_BLOCK_RE.search(prompt)
+        if not match or not match.group(1).strip():
+            return None
+        block = match.group(1)
+        has_index = block.startswith(",")
+        return pd.read_csv(
+            io.StringIO(block),
+            dtype=str,
+            keep_default_na=False,
+            index_col=0 if has_index else None,
+        )
+
+    def _respond(self, prompt: str) -> Dict[str, Any]:
+        df = self._read_csv_block(prompt)
+
+        if '"json_schema"' in prompt:
+            columns = [] if df is None else df.columns.tolist()
+            return {
+                "json_schema": {
+                    "$schema": "https://json-schema.org/draft/2020-12/schema",
+                    "type": "object",
+                    "properties": {col: {"type": ["string", "null"]} for col in columns},
+                    "required": columns,
+                },
+                "other_info": "Generated offline by FakeChatModel.",
+            }
+
+        improves: List[Dict[str, Any]] = []
+        if df is not None:
+            for row_idx, row in zip(df.index, df.itertuples(index=False, name=None)):
+                improves.append({
+                    "row": int(row_idx),
+                    "attr": [{"name": col, "value": value.strip()} for col, value in zip(df.columns, row)],
+                })
+        return {"improves": improves, "error": []}
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        content = json.dumps(self._respond(prompt), ensure_ascii=False)
+
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+            slow = self._random.random() < self.slow_rate
+        latency = self.latency + (self.slow_latency if slow else 0.0)
+        if latency > 0:
+            time.sleep(latency)
+        if fail:
+            with self._lock:
+                self._stats["failures"] += 1
+            raise RuntimeError(f"Simulated failure of {self.model_name}.")
+
+        with self._lock:
+            cached = self._cached_chars(prompt)
+            self._stats["calls"] += 1
+            self._stats["prompt_chars"] += len(prompt)
+            self._stats["completion_chars"] += len(content)
+            self._stats["cached_chars"] += cached
+
+        message = AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model_name},
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": len(prompt) // 4 + len(content) // 4,
+                "input_token_details": {"cache_read": cached // 4},
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
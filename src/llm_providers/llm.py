@@ -1,58 +1,99 @@
+from __future__ import annotations
+
 import json
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
+
+from src.llm_providers.chains import chain_registry, JSON_OBJECT
+from src.llm_providers.metrics import LLMMetrics, record_llm_call
+from src.llm_providers.rate_limit import invoke_with_limits, estimate_tokens
+from src.utils.tracing import tracer
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+_base_llm: Optional[BaseChatModel] = None
+_base_llm_lock = threading.Lock()
 
-from dotenv import load_dotenv
-from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
 
-load_dotenv()
+def get_base_llm() -> BaseChatModel:
+    """The default model, created (and `.env` loaded) on first use rather than at import time."""
+    global _base_llm
+    if _base_llm is None:
+        with _base_llm_lock:
+            if _base_llm is None:
+                from dotenv import load_dotenv
+                from langchain_openai import ChatOpenAI
+
+                load_dotenv()
+                _base_llm = ChatOpenAI(
+                    model='o4-mini',
+                )
+    return _base_llm
+
+
+def __getattr__(name: str) -> Any:
+    if name == 'base_llm':
+        return get_base_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-base_llm: BaseChatModel = ChatOpenAI(
-    model='o4-mini',
-)
 
 class LLMProvider:
-    def __init__(self, model: BaseChatModel):
+    def __init__(self, model: BaseChatModel, metrics: Optional[LLMMetrics] = None):
         self.model = model
+        self.metrics = metrics
 
     def generate(
         self,
         system_prompt: str,
         human_prompt: str,
         force_json: bool = False, # Added flag to force JSON output
-        additional_data: Optional[Dict[str, Any]] = None
+        additional_data: Optional[Dict[str, Any]] = None,
+        labels: Optional[Dict[str, Any]] = None,
     ) -> str:
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=human_prompt),
-        ]
-
-        model_to_invoke = self.model
+        response_format = None
 
         if force_json:
             if "json" not in system_prompt.lower():
                 print("Warning: force_json=True but 'json' not mentioned in system_prompt. Consider instructing the model to output JSON in the system prompt for reliability.")
-            try:
-                 model_to_invoke = self.model.bind(
-                     response_format={"type": "json_object"}
-                 )
-            except Exception as e:
-                 print(f"Warning: Could not bind response_format for JSON. The model might not support it or the syntax changed. Error: {e}")
+            response_format = JSON_OBJECT
+
+        # The prompts are passed as variables, so one compiled chain per model serves every call and
+        # their text is sent verbatim (braces included).
+        try:
+            chain = chain_registry.get(self.model, '{human_prompt}', '{system_prompt}', response_format)
+        except Exception as e:
+            print(f"Warning: Could not bind response_format for JSON. The model might not support it or the syntax changed. Error: {e}")
+            chain = chain_registry.get(self.model, '{human_prompt}', '{system_prompt}')
+        labels = labels or {'fixer': 'generate'}
+
 
-        chain = ChatPromptTemplate.from_messages(messages) | model_to_invoke
+        def _call():
+            with tracer.span('model_call', provider=type(self.model).__name__):
+                return chain.invoke({'system_prompt': system_prompt, 'human_prompt': human_prompt})
 
+        start = time.perf_counter()
         try:
-            response = chain.invoke(additional_data)
+            try:
+                response, retries = invoke_with_limits(
+                    _call,
+                    estimate_tokens(system_prompt, human_prompt, *(additional_data or {}).values()),
+                )
+            except Exception as e:
+                record_llm_call(self.metrics, labels, None, self.model, time.perf_counter() - start,
+                                error=True, retries=getattr(e, 'llm_retries', 0))
+                raise
+            record_llm_call(self.metrics, labels, response, self.model, time.perf_counter() - start, retries=retries)
             content = str(response)
             if hasattr(response, 'content'):
                 content = response.content
 
             if force_json:
                 try:
-                    json.loads(content)
+                    with tracer.span('json_parse'):
+                        json.loads(content)
                 except json.JSONDecodeError:
                     print(f"Warning: Model output was not valid JSON despite force_json=True:\n{content}")
 
@@ -0,0 +1,221 @@
+import threading
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, List, Dict, Any, Tuple
+
+from src.utils.tracing import percentile
+
+
+@dataclass
+class LLMCallRecord:
+    """Usage and latency of one model call. `batch` is the first data row of the batch."""
+    fixer: str
+    column: str
+    batch: Optional[int]
+    model: str
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    rows: int = 0
+    error: bool = False
+
+
+def extract_usage(response: Any) -> Dict[str, int]:
+    """Read prompt/completion/cached token counts from a LangChain message, whatever the provider."""
+    usage = getattr(response, 'usage_metadata', None) or {}
+    if usage:
+        details = usage.get('input_token_details') or {}
+        return {
+            'prompt_tokens': int(usage.get('input_tokens', 0) or 0),
+            'completion_tokens': int(usage.get('output_tokens', 0) or 0),
+            'cached_tokens': int(details.get('cache_read', 0) or 0),
+        }
+
+    metadata = getattr(response, 'response_metadata', None) or {}
+    token_usage = metadata.get('token_usage') or metadata.get('usage') or {}
+    details = token_usage.get('prompt_tokens_details') or {}
+    return {
+        'prompt_tokens': int(token_usage.get('prompt_tokens', 0) or 0),
+        'completion_tokens': int(token_usage.get('completion_tokens', 0) or 0),
+        'cached_tokens': int(details.get('cached_tokens', 0) or 0),
+    }
+
+
+def extract_model_name(response: Any, model: Any = None) -> str:
+    metadata = getattr(response, 'response_metadata', None) or {}
+    name = metadata.get('model_name') or metadata.get('model')
+    if not name and model is not None:
+        name = next(
+            (value for value in (getattr(model, 'model_name', None), getattr(model, 'model', None))
+             if isinstance(value, str) and value),
+            None,
+        )
+    return str(name or type(model).__name__)
+
+
+def escape_label_value(value: Any) -> str:
+    """A label value escaped for the Prometheus text format: backslash, double quote and newline."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class LLMMetrics:
+    """
+    Thread-safe collector of per-call model metrics (tokens, latency, retries),
+    attached to a CSVLoader or LLMProvider through their `metrics` argument.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: List[LLMCallRecord] = []
+
+    def record(self, record: LLMCallRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    @property
+    def records(self) -> List[LLMCallRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records = []
+
+    @staticmethod
+    def _aggregate(records: List[LLMCallRecord]) -> Dict[str, Any]:
+        latencies = sorted(r.latency for r in records)
+        prompt_tokens = sum(r.prompt_tokens for r in records)
+        completion_tokens = sum(r.completion_tokens for r in records)
+        cached_tokens = sum(r.cached_tokens for r in records)
+        rows = sum(r.rows for r in records)
+        return {
+            'calls': len(records),
+            'errors': sum(r.error for r in records),
+            'retries': sum(r.retries for r in records),
+            'rows': rows,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'cached_tokens': cached_tokens,
+            'cached_token_ratio': round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+            'tokens_per_row': round((prompt_tokens + completion_tokens) / rows, 2) if rows else 0.0,
+            'latency_total_s': round(sum(latencies), 4),
+            'latency_p50_s': round(percentile(latencies, 50), 4),
+            'latency_p95_s': round(percentile(latencies, 95), 4),
+            'latency_p99_s': round(percentile(latencies, 99), 4),
+        }
+
+    def summary(self, group_by: Tuple[str, ...] = ('fixer',)) -> Dict[str, Any]:
+        """
+        Totals over all calls plus the same aggregates per group, e.g.
+        group_by=('fixer', 'column') or ('fixer', 'batch').
+        """
+        records = self.records
+        groups: Dict[str, List[LLMCallRecord]] = {}
+        for record in records:
+            key = '/'.join(str(getattr(record, field)) for field in group_by)
+            groups.setdefault(key, []).append(record)
+        return {
+            'total': self._aggregate(records),
+            'groups': {key: self._aggregate(group) for key, group in sorted(groups.items())},
+        }
+
+    def to_prometheus(self, prefix: str = 'pycsvllm_llm') -> str:
+        """Render the metrics in the Prometheus text exposition format, labelled by fixer and model."""
+        groups: Dict[Tuple[str, str], List[LLMCallRecord]] = {}
+        for record in self.records:
+            groups.setdefault((record.fixer, record.model), []).append(record)
+
+        counters = [
+            ('calls_total', 'Number of model calls.', lambda rs: len(rs)),
+            ('errors_total', 'Number of failed model calls.', lambda rs: sum(r.error for r in rs)),
+            ('retries_total', 'Number of retried model calls.', lambda rs: sum(r.retries for r in rs)),
+            ('rows_total', 'Number of data rows sent to the model.', lambda rs: sum(r.rows for r in rs)),
+            ('prompt_tokens_total', 'Prompt tokens used.', lambda rs: sum(r.prompt_tokens for r in rs)),
+            ('completion_tokens_total', 'Completion tokens used.', lambda rs: sum(r.completion_tokens for r in rs)),
+            ('cached_tokens_total', 'Prompt tokens served from the provider cache.', lambda rs: sum(r.cached_tokens for r in rs)),
+        ]
+
+        def _labels(fixer: str, model: str, **extra: str) -> str:
+            pairs = {'fixer': fixer, 'model': model, **extra}
+            return ','.join(f'{k}="{escape_label_value(v)}"' for k, v in pairs.items())
+
+        lines = []
+        for name, help_text, value in counters:
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for (fixer, model), records in sorted(groups.items()):
+                lines.append(f'{prefix}_{name}{{{_labels(fixer, model)}}} {value(records)}')
+
+        lines.append(f'# HELP {prefix}_latency_seconds Latency of model calls.')
+        lines.append(f'# TYPE {prefix}_latency_seconds summary')
+        for (fixer, model), records in sorted(groups.items()):
+            latencies = sorted(r.latency for r in records)
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'{prefix}_latency_seconds{{{_labels(fixer, model, quantile=str(q))}}} '
+                             f'{percentile(latencies, q * 100):.6f}')
+            lines.append(f'{prefix}_latency_seconds_sum{{{_labels(fixer, model)}}} {sum(latencies):.6f}')
+            lines.append(f'{prefix}_latency_seconds_count{{{_labels(fixer, model)}}} {len(latencies)}')
+
+        lines.append(f'# HELP {prefix}_cached_token_ratio Share of prompt tokens served from the provider cache.')
+        lines.append(f'# TYPE {prefix}_cached_token_ratio gauge')
+        for (fixer, model), records in sorted(groups.items()):
+            prompt_tokens = sum(r.prompt_tokens for r in records)
+            ratio = sum(r.cached_tokens for r in records) / prompt_tokens if prompt_tokens else 0.0
+            lines.append(f'{prefix}_cached_token_ratio{{{_labels(fixer, model)}}} {ratio:.4f}')
+        return '\n'.join(lines) + '\n'
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [asdict(record) for record in self.records]
+
+
+def start_metrics_server(metrics: LLMMetrics, port: int = 9464, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve `metrics.to_prometheus()` on http://host:port/metrics from a daemon thread."""
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def record_llm_call(
+        metrics: Optional[LLMMetrics],
+        labels: Dict[str, Any],
+        response: Any,
+        model: Any,
+        latency: float,
+        error: bool = False,
+        retries: int = 0,
+) -> None:
+    """Build an LLMCallRecord from a response and its call labels and add it to `metrics` (if any)."""
+    if metrics is None:
+        return
+    usage = extract_usage(response) if response is not None else {}
+    batch = labels.get('batch')
+    metrics.record(LLMCallRecord(
+        fixer=str(labels.get('fixer', '')),
+        column=str(labels.get('column', '')),
+        batch=int(batch) if batch is not None else None,
+        model=extract_model_name(response, model),
+        latency=latency,
+        retries=retries,
+        rows=int(labels.get('rows', 0)),
+        error=error,
+        **usage,
+    ))
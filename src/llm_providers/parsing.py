@@ -0,0 +1,305 @@
+import json
+import sys
+from typing import List, Dict, Any, Tuple, Sequence, Optional, Iterable, Iterator, TypedDict
+
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+
+from src.file_processing.schema import PotentialErrorQueryResponse, ImprovesItem, NotImprovesItem, CellInfo
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_decoder = json.JSONDecoder()
+
+
+def _as_text(content: Any) -> str:
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return bytes(content).decode('utf-8')
+    return content if isinstance(content, str) else str(content)
+
+
+def strip_code_fences(content: Any) -> str:
+    """Remove a surrounding ```json ... ``` fence from a model reply, if any."""
+    text = _as_text(content).strip()
+    if not text.startswith('```'):
+        return text
+    newline = text.find('\n')
+    body = text[newline + 1:] if newline != -1 else ''
+    closing = body.rfind('```')
+    return (body[:closing] if closing != -1 else body).strip()
+
+
+def extract_json(content: Any) -> str:
+    """
+    The JSON document of a model reply: code fences, leading prose and trailing
+    text are dropped. Truncated documents are returned as is, from their first
+    bracket, for the caller's parser to reject or salvage.
+    """
+    text = strip_code_fences(content)
+    starts = [pos for pos in (text.find('{'), text.find('[')) if pos != -1]
+    if not starts:
+        return text
+    start = min(starts)
+    try:
+        _, end = _decoder.raw_decode(text, start)
+    except json.JSONDecodeError:
+        return text[start:]
+    return text[start:end]
+
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def loads(content: Any) -> Any:
+    """
+    json.loads for model replies: uses orjson when installed and tolerates code
+    fences and text around the document. Raises json.JSONDecodeError.
+    """
+    text = strip_code_fences(content)
+    try:
+        return _loads(text)
+    except json.JSONDecodeError:
+        return _loads(extract_json(text))
+
+
+def parse_error_response(content: Any) -> PotentialErrorQueryResponse:
+    """
+    Validate an improves/error reply straight from its JSON text, without an
+    intermediate dict. Raises ValueError (pydantic's ValidationError) when the
+    reply is not valid JSON or does not match the model.
+    """
+    text = strip_code_fences(content)
+    try:
+        return PotentialErrorQueryResponse.model_validate_json(text)
+    except ValidationError as e:
+        if not any(error['type'] == 'json_invalid' for error in e.errors()):
+            raise
+        return PotentialErrorQueryResponse.model_validate_json(extract_json(text))
+
+
+class _RawCell(TypedDict):
+    name: str
+    value: str
+
+
+class _RawImproves(TypedDict):
+    row: int
+    attr: List[_RawCell]
+
+
+class _RawError(TypedDict):
+    row: int
+    attr: List[str]
+
+
+class _RawResponse(TypedDict):
+    improves: Optional[List[_RawImproves]]
+    error: Optional[List[_RawError]]
+
+
+# Same validation as PotentialErrorQueryResponse, but builds plain dicts and lists instead of model objects.
+_RAW_RESPONSE = TypeAdapter(_RawResponse)
+
+
+class ImprovementStore:
+    """
+    Compact, columnar store of cell fixes: parallel lists of rows, (interned)
+    column names and values instead of one ImprovesItem/CellInfo object per
+    cell. Error cells from the same replies are kept alongside.
+    """
+
+    __slots__ = ('rows', 'columns', 'values', 'error_rows', 'error_columns')
+
+    def __init__(self):
+        self.rows: List[int] = []
+        self.columns: List[str] = []
+        self.values: List[str] = []
+        self.error_rows: List[int] = []
+        self.error_columns: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Tuple[int, str, str]]:
+        return zip(self.rows, self.columns, self.values)
+
+    def add(self, row: int, column: str, value: str) -> None:
+        self.rows.append(row)
+        self.columns.append(sys.intern(column))
+        self.values.append(value)
+
+    def add_error(self, row: int, column: str) -> None:
+        self.error_rows.append(row)
+        self.error_columns.append(sys.intern(column))
+
+    def extend(self, other: 'ImprovementStore') -> 'ImprovementStore':
+        self.rows.extend(other.rows)
+        self.columns.extend(other.columns)
+        self.values.extend(other.values)
+        self.error_rows.extend(other.error_rows)
+        self.error_columns.extend(other.error_columns)
+        return self
+
+    def add_json(self, content: Any) -> 'ImprovementStore':
+        """Validate an improves/error reply from its JSON text and append its cells."""
+        text = strip_code_fences(content)
+        try:
+            data = _RAW_RESPONSE.validate_json(text)
+        except ValidationError as e:
+            if not any(error['type'] == 'json_invalid' for error in e.errors()):
+                raise
+            data = _RAW_RESPONSE.validate_json(extract_json(text))
+
+        for item in data['improves'] or ():
+            row = item['row']
+            for cell in item['attr']:
+                self.add(row, cell['name'], cell['value'])
+        for item in data['error'] or ():
+            row = item['row']
+            for column in item['attr']:
+                self.add_error(row, column)
+        return self
+
+    @classmethod
+    def from_json(cls, content: Any) -> 'ImprovementStore':
+        return cls().add_json(content)
+
+    @classmethod
+    def from_items(cls, improvements: Iterable[ImprovesItem], errors: Iterable[NotImprovesItem] = ()) -> 'ImprovementStore':
+        store = cls()
+        for item in improvements:
+            for cell in item.attr:
+                store.add(item.row, cell.name, cell.value)
+        for item in errors:
+            for column in item.attr:
+                store.add_error(item.row, column)
+        return store
+
+    def to_items(self) -> List[ImprovesItem]:
+        """ImprovesItem objects, one per row, in first-seen row order."""
+        by_row: Dict[int, List[CellInfo]] = {}
+        for row, column, value in self:
+            by_row.setdefault(row, []).append(CellInfo(name=column, value=value))
+        return [ImprovesItem(row=row, attr=attr) for row, attr in by_row.items()]
+
+    def to_errors(self) -> List[NotImprovesItem]:
+        by_row: Dict[int, List[str]] = {}
+        for row, column in zip(self.error_rows, self.error_columns):
+            by_row.setdefault(row, []).append(column)
+        return [NotImprovesItem(row=row, attr=attr) for row, attr in by_row.items()]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({'row': self.rows, 'column': self.columns, 'value': self.values})
+
+
+def _scan_items(content: str) -> List[Dict[str, Any]]:
+    """Decode every complete `{"row": ..., "attr": [...]}` object found in a (possibly truncated) JSON text."""
+    items = []
+    pos = content.find('{', 1)
+    while pos != -1:
+        try:
+            obj, end = _decoder.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            pos = content.find('{', pos + 1)
+            continue
+        if isinstance(obj, dict) and 'row' in obj and 'attr' in obj:
+            items.append(obj)
+            pos = content.find('{', end)
+        else:
+            pos = content.find('{', pos + 1)
+    return items
+
+
+def _row_of(item: Any) -> Optional[int]:
+    try:
+        return int(item.get('row'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def salvage_error_response(
+        content: str,
+        batch_rows: Sequence[int],
+) -> Tuple[PotentialErrorQueryResponse, List[int]]:
+    """
+    Parse an improves/error response, keeping every valid entry even when the
+    JSON is truncated or some entries fail validation.
+
+    Returns the response made of the valid entries and the rows of `batch_rows`
+    that should be re-requested: rows of invalid entries and, for truncated
+    output (text that is not valid JSON), the rows after the last complete
+    entry. A valid top-level list of entries is complete. Raises ValueError
+    when nothing can be recovered.
+    """
+    try:
+        return parse_error_response(content), []
+    except ValidationError:
+        pass
+
+    truncated = False
+    try:
+        data = loads(content)
+    except (json.JSONDecodeError, TypeError):
+        data = None
+
+    if isinstance(data, dict):
+        raw_items = list(data.get('improves') or []) + list(data.get('error') or [])
+    elif isinstance(data, list):
+        # A complete top-level list of entries instead of {"improves": [...], "error": [...]}.
+        raw_items = [item for item in data if isinstance(item, dict)]
+    else:
+        raw_items = _scan_items(strip_code_fences(content))
+        # Only text that is not valid JSON can have been cut off.
+        truncated = data is None
+        if not raw_items:
+            raise ValueError(f"LLM response is not valid JSON and no entries could be salvaged: {content!r:.200}")
+
+    improves: List[ImprovesItem] = []
+    errors: List[NotImprovesItem] = []
+    retry_rows: set[int] = set()
+    for item in raw_items:
+        attr = item.get('attr') if isinstance(item, dict) else None
+        model = NotImprovesItem if isinstance(attr, list) and attr and all(isinstance(a, str) for a in attr) else ImprovesItem
+        try:
+            (errors if model is NotImprovesItem else improves).append(model(**item))
+        except (ValidationError, TypeError):
+            row = _row_of(item)
+            if row is not None:
+                retry_rows.add(row)
+
+    if truncated:
+        seen = [item.row for item in improves] + [item.row for item in errors]
+        last = max(seen, default=None)
+        retry_rows.update(row for row in batch_rows if last is None or row > last)
+
+    batch = set(batch_rows)
+    return PotentialErrorQueryResponse(improves=improves, error=errors), sorted(retry_rows & batch)
+
+
+def remap_rows(
+        response: PotentialErrorQueryResponse,
+        retry_rows: Sequence[int],
+        row_ids: Sequence[int],
+) -> Tuple[PotentialErrorQueryResponse, List[int]]:
+    """
+    Translate batch-local row ids (0..n-1, sent instead of the DataFrame index
+    to keep prompts short) back to `row_ids`. Entries with an id outside the
+    batch are dropped.
+    """
+    def _in_batch(item) -> bool:
+        return 0 <= item.row < len(row_ids)
+
+    improves = [
+        ImprovesItem(row=int(row_ids[item.row]), attr=item.attr)
+        for item in response.improves or [] if _in_batch(item)
+    ]
+    errors = [
+        NotImprovesItem(row=int(row_ids[item.row]), attr=item.attr)
+        for item in response.error or [] if _in_batch(item)
+    ]
+    retry = [int(row_ids[row]) for row in retry_rows if 0 <= row < len(row_ids)]
+    return PotentialErrorQueryResponse(improves=improves, error=errors), retry
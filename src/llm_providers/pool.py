@@ -0,0 +1,219 @@
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from typing import Optional, List, Dict, Any
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+from pydantic import PrivateAttr
+
+from src.llm_providers.metrics import extract_model_name
+from src.utils.tracing import percentile
+
+
+class EndpointHealth:
+    """Sliding window of the latencies and outcomes of one endpoint, plus its ejection state."""
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.in_flight = 0
+        self.ejected_until = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        return percentile(sorted(self.latencies), q) if self.latencies else None
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        p50, p95 = self.latency_percentile(50), self.latency_percentile(95)
+        return {
+            'endpoint': self.name,
+            'calls': self.calls,
+            'errors': self.errors,
+            'hedges': self.hedges,
+            'in_flight': self.in_flight,
+            'error_rate': round(self.error_rate, 4),
+            'latency_p50_s': round(p50, 4) if p50 is not None else None,
+            'latency_p95_s': round(p95, 4) if p95 is not None else None,
+            'ejected': self.ejected_until > now,
+        }
+
+
+class ModelPool(BaseChatModel):
+    """
+    Chat model spreading calls over several endpoints (API keys, deployments,
+    providers). Each call goes to the healthy endpoint with the lowest
+    expected wait, its median latency times its in-flight calls. An endpoint
+    whose error rate over the last `window` calls reaches `error_threshold`
+    is ejected for `cooldown` seconds. A failed call fails over to the next
+    endpoint.
+
+    With `hedge`, a call still running after `hedge_after` seconds (default:
+    the p95 latency of the pool) is duplicated on another endpoint and the
+    first answer wins. The slower call is not cancelled.
+    """
+    models: List[BaseChatModel]
+    model_name: str = "model-pool"
+    window: int = 50
+    min_samples: int = 10
+    error_threshold: float = 0.5
+    cooldown: float = 30.0
+    failover: bool = True
+    hedge: bool = False
+    hedge_after: Optional[float] = None
+    max_workers: int = 32
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _health: List[EndpointHealth] = PrivateAttr(default_factory=list)
+    _counter: Any = PrivateAttr(default_factory=itertools.count)
+    _executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        if not self.models:
+            raise ValueError("A model pool needs at least one model.")
+        self._health = [
+            EndpointHealth(f"{index}:{extract_model_name(None, model)}", self.window)
+            for index, model in enumerate(self.models)
+        ]
+
+    @property
+    def _llm_type(self) -> str:
+        return "model-pool"
+
+    @property
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [health.to_dict(now) for health in self._health]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="model-pool")
+            return self._executor
+
+    def _ranked(self, exclude: tuple = ()) -> List[int]:
+        """Endpoint indexes, best first: healthy ones by expected wait, then ejected ones by end of ejection."""
+        now = time.monotonic()
+        tie_break = next(self._counter)
+        with self._lock:
+            def _score(index: int):
+                health = self._health[index]
+                p50 = health.latency_percentile(50) or 0.0
+                return p50 * (health.in_flight + 1), health.in_flight, (index - tie_break) % len(self._health)
+
+            candidates = [index for index in range(len(self.models)) if index not in exclude]
+            healthy = sorted((i for i in candidates if self._health[i].ejected_until <= now), key=_score)
+            ejected = sorted((i for i in candidates if self._health[i].ejected_until > now),
+                             key=lambda i: self._health[i].ejected_until)
+        return healthy + ejected
+
+    def _call(self, index: int, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> BaseMessage:
+        with self._lock:
+            self._health[index].in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = self.models[index].invoke(messages, stop=stop, **kwargs)
+        except Exception:
+            self._record(index, time.perf_counter() - start, ok=False)
+            raise
+        self._record(index, time.perf_counter() - start, ok=True)
+        return response
+
+    def _record(self, index: int, latency: float, ok: bool) -> None:
+        with self._lock:
+            health = self._health[index]
+            health.in_flight -= 1
+            health.calls += 1
+            health.outcomes.append(0 if ok else 1)
+            if ok:
+                health.latencies.append(latency)
+            else:
+                health.errors += 1
+                if len(health.outcomes) >= self.min_samples and health.error_rate >= self.error_threshold:
+                    print(f"Warning: Ejecting endpoint {health.name} for {self.cooldown:.0f}s "
+                          f"(error rate {health.error_rate:.0%}).")
+                    health.ejected_until = time.monotonic() + self.cooldown
+                    health.outcomes.clear()
+
+    def _hedge_delay(self) -> Optional[float]:
+        """`hedge_after`, or the p95 latency over the recent calls of all endpoints once there are enough."""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        with self._lock:
+            latencies = sorted(latency for health in self._health for latency in health.latencies)
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, 95)
+
+    def _call_hedged(
+            self,
+            order: List[int],
+            tried: set,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]],
+            **kwargs: Any,
+    ) -> BaseMessage:
+        executor = self._get_executor()
+        primary = order[0]
+        tried.add(primary)
+        futures: Dict[Future, int] = {executor.submit(self._call, primary, messages, stop, **kwargs): primary}
+        delay = self._hedge_delay()
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                with self._lock:
+                    self._health[order[1]].hedges += 1
+                tried.add(order[1])
+                futures[executor.submit(self._call, order[1], messages, stop, **kwargs)] = order[1]
+
+        error: Optional[BaseException] = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        order = self._ranked()
+        attempts = order if self.failover else order[:1]
+        tried: set = set()
+        error: Optional[BaseException] = None
+
+        while True:
+            remaining = [index for index in attempts if index not in tried]
+            if not remaining:
+                raise error
+            try:
+                if self.hedge and len(remaining) > 1:
+                    response = self._call_hedged(remaining, tried, messages, stop, **kwargs)
+                else:
+                    tried.add(remaining[0])
+                    response = self._call(remaining[0], messages, stop, **kwargs)
+                return ChatResult(generations=[ChatGeneration(message=response)])
+            except Exception as e:
+                error = e
+                left = [index for index in attempts if index not in tried]
+                if left:
+                    print(f"Warning: Model call on the pool failed ({type(e).__name__}), "
+                          f"failing over to {self._health[left[0]].name}.")
@@ -223,4 +223,108 @@ Modify *only* the values within the specified columns according to the standardi
 ```list
 {context}
 ```
-"""
\ No newline at end of file
+"""
+
+# Prefix-cache friendly variants: everything that is the same for every batch of a run (rules, output format,
+# schema, format list, examples) comes first and the batch data last, so consecutive calls share a long prompt
+# prefix that providers can serve from their prompt cache.
+_OUTPUT_FORMAT = PROMPT_FIX_NUMBER_FORMATION[PROMPT_FIX_NUMBER_FORMATION.index("**Output:**"):].strip()
+
+_DATA_INPUT = """- Dataset: # the batch to fix, as csv. The first, unnamed column is the row id to use as "row".
+```csv
+{data}
+```
+"""
+
+_FORMATION_INPUTS = """**Input:**
+- Schema: # the minified json schema of the target columns.
+```json
+{schema}
+```
+
+- Format list: # provided as pairs of column and format that I want to apply for that column.
+```list
+{format_list}
+```
+
+- Example: # provided as list of pairing as original data and changed data.
+```list
+{context}
+```
+
+""" + _DATA_INPUT
+
+_GRAMMAR_INPUTS = """**Input:**
+- Example: # provided as list of pairing as original data and changed data.
+```list
+{context}
+```
+
+""" + _DATA_INPUT
+
+
+def _cache_friendly(rules: str, inputs: str) -> str:
+    return "\n" + rules.strip() + "\n\n" + _OUTPUT_FORMAT + "\n\n" + inputs
+
+
+PROMPT_FIX_NUMBER_FORMATION_CACHE_FRIENDLY = _cache_friendly(
+    PROMPT_FIX_NUMBER_FORMATION[:PROMPT_FIX_NUMBER_FORMATION.index("**Input:**")], _FORMATION_INPUTS
+)
+
+PROMPT_FIX_DATETIME_FORMATION_CACHE_FRIENDLY = _cache_friendly(
+    PROMPT_FIX_DATETIME_FORMATION[:PROMPT_FIX_DATETIME_FORMATION.index("**Input:**")], _FORMATION_INPUTS
+)
+
+FIX_GRAMMAR_PROMPTS_CACHE_FRIENDLY = _cache_friendly(
+    FIX_GRAMMAR_PROMPTS[:FIX_GRAMMAR_PROMPTS.index("**Output:**")], _GRAMMAR_INPUTS
+)
+
+CACHE_FRIENDLY_PROMPTS = {
+    PROMPT_FIX_NUMBER_FORMATION: PROMPT_FIX_NUMBER_FORMATION_CACHE_FRIENDLY,
+    PROMPT_FIX_DATETIME_FORMATION: PROMPT_FIX_DATETIME_FORMATION_CACHE_FRIENDLY,
+    FIX_GRAMMAR_PROMPTS: FIX_GRAMMAR_PROMPTS_CACHE_FRIENDLY,
+}
+
+
+# Per-task rules of the fused multi-task prompt; only the tasks present in a run are sent.
+MULTI_TASK_RULES = {
+    "number": """**Task "number"**
+- Convert every value to a plain number: "." as decimal separator, no thousands separators (1.234.567 → 1234567, 123,45 → 123.45).
+- Remove currency symbols, percent signs and other decorations ($1,234.56 → 1234.56, 95% → 0.95 or 95.00 following the column format).
+- Resolve verbal numbers ("two hundred" → 200, "hai trăm mười năm" → 215).
+- Apply the column's format when one is given, otherwise the schema type.
+- Phone numbers are not numbers: leave them unchanged.""",
+    "datetime": """**Task "datetime"**
+- Parse any reasonable date/time representation: numeric formats (DD/MM/YYYY, MM-DD-YYYY, YYYY.MM.DD), 12/24-hour clocks with or without seconds or AM/PM, natural-language phrases ("ngày 3 tháng 12 năm 2020", "8 PM").
+- Re-format every parsed value to the column's format.""",
+    "typography": """**Task "typography"**
+- Correct misspellings, typos and misplaced, extra or missing characters in English and Vietnamese text (hte → the, Sepetember → September, nghành → ngành).
+- Do not correct grammar, rephrase, change the meaning, standardize dates or numbers, or change valid regional spellings.""",
+}
+
+PROMPT_FIX_MULTI_TASK = """
+I give you a batch of a CSV dataset and a task for each of its columns. Fix every column with the rules of its own task only.
+If you cannot fix a value with high confidence, do not change it and list the cell in "error".
+Only report cells whose value changes.
+
+{rules}
+
+""" + _OUTPUT_FORMAT + """
+
+**Input:**
+- Tasks: # minified json mapping each column to its task and target format.
+```json
+{tasks}
+```
+
+- Schema: # the minified json schema of the columns.
+```json
+{schema}
+```
+
+- Example: # per task, pairs of original and fixed values.
+```json
+{context}
+```
+
+""" + _DATA_INPUT
@@ -0,0 +1,237 @@
+import random
+import re
+import threading
+import time
+from typing import Optional, Callable, Any, Tuple, TypeVar
+
+from src.llm_providers.metrics import extract_usage
+from src.utils.tracing import tracer
+
+T = TypeVar('T')
+
+_RETRY_IN_RE = re.compile(r"try again in ([\d.]+)\s*(ms|s)\b", re.IGNORECASE)
+_RETRYABLE_NAMES = ('RateLimit', 'Timeout', 'APIConnection', 'ServiceUnavailable', 'InternalServer')
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`, holding at most `capacity` tokens."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """Block until `amount` tokens are available and take them. Returns the time waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, amount: float) -> None:
+        """Take (positive) or give back (negative) tokens after the fact, e.g. real vs estimated usage."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class AIMDController:
+    """
+    Concurrency limit driven by additive-increase / multiplicative-decrease:
+    each success grows the limit by `increase / limit` (about +1 per round of
+    calls), each throttled call or call slower than `latency_target` scales it
+    by `decrease`, at most once per `cooldown` seconds.
+
+    The limit starts at `initial` = 32, the most workers a fixer runs
+    (`min(32, len(batches))`), so calls are not held back until the endpoint
+    pushes back; a lower `initial` probes up from there instead.
+    """
+
+    def __init__(
+            self,
+            initial: int = 32,
+            minimum: int = 1,
+            maximum: int = 32,
+            increase: float = 1.0,
+            decrease: float = 0.5,
+            latency_target: Optional[float] = None,
+            cooldown: float = 1.0,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(self.minimum, int(self._limit))
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if self.latency_target is not None and latency > self.latency_target:
+            self.on_congestion()
+            return
+        with self._condition:
+            self._limit = min(self.maximum, self._limit + self.increase / max(self._limit, 1.0))
+            self._condition.notify_all()
+
+    def on_congestion(self) -> None:
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._limit = max(self.minimum, self._limit * self.decrease)
+                self._last_decrease = now
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return any(name in type(exc).__name__ for name in _RETRYABLE_NAMES)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds to wait suggested by the provider (Retry-After headers or 'try again in ...' messages)."""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    for header, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        value = headers.get(header)
+        if value is not None:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    match = _RETRY_IN_RE.search(str(exc))
+    if match:
+        return float(match.group(1)) * (0.001 if match.group(2).lower() == 'ms' else 1.0)
+    return None
+
+
+class RateLimiter:
+    """
+    Process-wide limiter for model calls: request and token buckets (per
+    minute, unlimited when None), an AIMD concurrency limit (by default
+    starting at the fixers' 32 workers and lowered only on throttling), and
+    retries with jittered exponential backoff that honour retry-after hints.
+    """
+
+    def __init__(
+            self,
+            requests_per_minute: Optional[float] = None,
+            tokens_per_minute: Optional[float] = None,
+            max_retries: int = 5,
+            base_delay: float = 1.0,
+            max_delay: float = 60.0,
+            concurrency: Optional[AIMDController] = None,
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.concurrency = concurrency or AIMDController()
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = retry_after(exc)
+        if hinted is not None:
+            return hinted + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn: Callable[[], T], estimated_tokens: int = 0) -> Tuple[T, int]:
+        """
+        Run `fn` under the limits and retry it on throttling or transient errors.
+        Returns the result and the number of retries. The exception of the last
+        attempt is re-raised with an `llm_retries` attribute.
+        """
+        attempt = 0
+        while True:
+            with tracer.span('rate_limit_wait'):
+                if self.requests:
+                    self.requests.acquire(1)
+                if self.tokens and estimated_tokens:
+                    self.tokens.acquire(estimated_tokens)
+                self.concurrency.acquire()
+
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as exc:
+                self.concurrency.release()
+                retryable = is_retryable(exc)
+                if retryable:
+                    self.concurrency.on_congestion()
+                if attempt >= self.max_retries or not retryable:
+                    exc.llm_retries = attempt
+                    raise
+                delay = self.backoff(attempt, exc)
+                print(f"Warning: model call failed ({type(exc).__name__}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries}).")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.concurrency.release()
+            self.concurrency.on_success(time.perf_counter() - start)
+            return result, attempt
+
+
+_rate_limiter = RateLimiter()
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _rate_limiter
+
+
+def configure_rate_limiter(**kwargs: Any) -> RateLimiter:
+    """Replace the process-wide limiter, e.g. configure_rate_limiter(requests_per_minute=500, tokens_per_minute=200_000)."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = RateLimiter(**kwargs)
+    return _rate_limiter
+
+
+def estimate_tokens(*texts: Any) -> int:
+    """Rough token estimate (4 characters per token) used to pre-charge the token bucket."""
+    return sum(len(str(text)) for text in texts) // 4
+
+
+def invoke_with_limits(fn: Callable[[], T], estimated_tokens: int = 0) -> Tuple[T, int]:
+    """Call `fn` through the process-wide limiter and settle the token bucket with the real usage."""
+    limiter = get_rate_limiter()
+    response, retries = limiter.call(fn, estimated_tokens)
+    if limiter.tokens:
+        usage = extract_usage(response)
+        actual = usage['prompt_tokens'] + usage['completion_tokens']
+        if actual:
+            limiter.tokens.adjust(actual - min(estimated_tokens, limiter.tokens.capacity))
+    return response, retries
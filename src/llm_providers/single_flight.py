@@ -0,0 +1,84 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+def call_key(model: Any, *parts: Any) -> str:
+    """
+    Hash identifying a model call: the model instance plus the prompt parts
+    (system prompt, template, inputs). Two calls with the same key send the
+    same request to the same endpoint.
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{id(model)}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    In-process coalescing of identical concurrent calls: the first caller of
+    a key runs the call, callers arriving while it is in flight wait and get
+    the same result (or exception). Nothing is kept once the call returns, so
+    later calls always run again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"calls": 0, "shared": 0}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """`calls` run, and `shared` calls served by the result of another caller."""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {"calls": 0, "shared": 0}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats["calls"] += 1
+            else:
+                self._stats["shared"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+
+single_flight = SingleFlight()
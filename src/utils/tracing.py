@@ -0,0 +1,197 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional
+
+# Upper bounds (ms) of the latency histogram buckets, the last bucket is open-ended.
+HISTOGRAM_BUCKETS_MS: List[float] = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class _StageStats:
+    """
+    Latencies of one span name in bounded memory: exact count, total, min, max
+    and histogram, and a uniform sample of at most `size` durations
+    (algorithm R) for the percentiles.
+    """
+    __slots__ = ("size", "rng", "count", "total", "min", "max", "histogram", "sample")
+
+    def __init__(self, size: int, rng: random.Random):
+        self.size = size
+        self.rng = rng
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.sample: List[float] = []
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+        self.histogram[bisect_left(HISTOGRAM_BUCKETS_MS, duration * 1000)] += 1
+        if len(self.sample) < self.size:
+            self.sample.append(duration)
+        else:
+            slot = self.rng.randrange(self.count)
+            if slot < self.size:
+                self.sample[slot] = duration
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer: 'Tracer', name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, end - self.start, self.attrs)
+        return False
+
+
+class Tracer:
+    """
+    Collect timed spans of pipeline stages (read_csv, sampling, prompt
+    serialization, model call, parsing, applying fixes, ...).
+
+    When disabled, `span` returns a shared no-op context manager, so the
+    instrumentation costs one attribute check per stage.
+    """
+
+    def __init__(self, enabled: bool = False, max_events: int = 100_000, reservoir_size: int = 10_000):
+        self.enabled = enabled
+        self.max_events = max_events
+        self.reservoir_size = reservoir_size
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+        self._origin = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._stages: Dict[str, _StageStats] = {}
+
+    def span(self, name: str, **attrs: Any):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, attrs)
+
+    def record(self, name: str, start: float, duration: float, attrs: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = _StageStats(self.reservoir_size, self._rng)
+            stage.add(duration)
+            if len(self._events) < self.max_events:
+                self._events.append({
+                    "name": name,
+                    "start": start - self._origin,
+                    "duration": duration,
+                    "thread": threading.get_ident(),
+                    "attrs": attrs or {},
+                })
+
+    def reset(self) -> None:
+        with self._lock:
+            self._origin = time.perf_counter()
+            self._events = []
+            self._stages = {}
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per stage: count, total/mean/min/max/p50/p95/p99 latency in ms and a
+        latency histogram. Percentiles come from a sample of at most
+        `reservoir_size` spans per stage, the other figures are exact.
+        """
+        with self._lock:
+            stages = {
+                name: (stage.count, stage.total, stage.min, stage.max, list(stage.histogram), sorted(stage.sample))
+                for name, stage in self._stages.items()
+            }
+
+        labels = [f"<={b}" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}"]
+        result = {}
+        for name, (count, total, minimum, maximum, histogram, sample) in stages.items():
+            sample_ms = [v * 1000 for v in sample]
+            result[name] = {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total * 1000 / count, 3),
+                "min_ms": round(minimum * 1000, 3),
+                "max_ms": round(maximum * 1000, 3),
+                "p50_ms": round(percentile(sample_ms, 50), 3),
+                "p95_ms": round(percentile(sample_ms, 95), 3),
+                "p99_ms": round(percentile(sample_ms, 99), 3),
+                "histogram_ms": {label: n for label, n in zip(labels, histogram) if n},
+            }
+        return result
+
+    def export_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"stages": self.summary()}, f, indent=2)
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Write the recorded spans in Chrome trace event format (chrome://tracing, Perfetto)."""
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        trace_events = [
+            {
+                "name": event["name"],
+                "cat": "pipeline",
+                "ph": "X",
+                "ts": round(event["start"] * 1e6, 3),
+                "dur": round(event["duration"] * 1e6, 3),
+                "pid": pid,
+                "tid": event["thread"],
+                "args": {key: str(value) for key, value in event["attrs"].items()},
+            }
+            for event in events
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+tracer = Tracer()
+
+
+def enable_tracing() -> Tracer:
+    tracer.enabled = True
+    return tracer
+
+
+def disable_tracing() -> None:
+    tracer.enabled = False
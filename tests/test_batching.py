@@ -0,0 +1,53 @@
+import pandas as pd
+
+from src.file_processing.batching import BatchParseError, FailurePolicy, run_with_bisection
+from src.file_processing.csv import CSVLoader
+from src.llm_providers.fake import FakeChatModel
+
+
+def _write_csv(tmp_path, rows: int) -> str:
+    path = tmp_path / 'prices.csv'
+    pd.DataFrame({'price': [f" {i}.00 " for i in range(rows)]}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_failing_model_is_called_once_per_batch(tmp_path):
+    model = FakeChatModel(error_rate=1.0)
+    loader = CSVLoader(_write_csv(tmp_path, 500), model=model, coalesce_requests=False)
+
+    improvements, cant_improvements = loader.fix_number_error(['price'], batch_size=50)
+
+    assert model.stats['calls'] + model.stats['failures'] == 10
+    assert improvements == []
+    assert len(cant_improvements) == 10
+    assert sorted(len(item['rows']) for item in cant_improvements) == [50] * 10
+
+
+def test_unparsable_batch_is_bisected():
+    batch = pd.DataFrame({'value': range(4)})
+    calls = []
+
+    def process(batch_df):
+        calls.append(len(batch_df))
+        if len(batch_df) > 1:
+            raise BatchParseError("truncated reply")
+        return [], [], []
+
+    improvements, cant_improvements = run_with_bisection(batch, process, FailurePolicy(), batch_index=0)
+
+    assert calls == [4, 2, 1, 1, 2, 1, 1]
+    assert improvements == [] and cant_improvements == []
+
+
+def test_other_errors_fail_the_batch_once():
+    batch = pd.DataFrame({'value': range(4)})
+    calls = []
+
+    def process(batch_df):
+        calls.append(len(batch_df))
+        raise RuntimeError("503 Service Unavailable")
+
+    _, cant_improvements = run_with_bisection(batch, process, FailurePolicy(), batch_index=3)
+
+    assert calls == [4]
+    assert cant_improvements == [{"batch_index": 3, "rows": [0, 1, 2, 3], "error": "503 Service Unavailable"}]
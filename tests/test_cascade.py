@@ -0,0 +1,60 @@
+import pandas as pd
+
+from src.file_processing.batching import BatchParseError, FailurePolicy, run_with_bisection
+from src.file_processing.cascade import ModelCascade
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+from src.llm_providers.fake import FakeChatModel
+
+CHEAP = FakeChatModel(model_name='cheap')
+STRONG = FakeChatModel(model_name='strong')
+
+
+def _batch() -> pd.DataFrame:
+    return pd.DataFrame({'a': ['1', '2', '3', '4'], 'b': ['x', 'y', 'z', 'w']})
+
+
+def _cheap_tier(batch_df):
+    """Fixes every cell of `a`, gives up on `b` in rows 0 and 1."""
+    improves = [ImprovesItem(row=row, attr=[{'name': 'a', 'value': f"{value}0"}]) for row, value in batch_df['a'].items()]
+    errors = [NotImprovesItem(row=row, attr=['b']) for row in batch_df.index if row < 2]
+    return improves, errors, []
+
+
+def _run(strong_tier):
+    calls = []
+
+    def process(batch_df, model):
+        calls.append((model.model_name, batch_df.index.tolist(), batch_df.columns.tolist()))
+        return _cheap_tier(batch_df) if model is CHEAP else strong_tier(batch_df)
+
+    cascade = ModelCascade([CHEAP, STRONG])
+    processor = cascade.processor(process, lambda batch_df, improvements: set())
+    improvements, cant_improvements = run_with_bisection(_batch(), processor, FailurePolicy(), batch_index=0)
+    return calls, improvements, cant_improvements
+
+
+def test_failing_last_tier_keeps_the_accepted_fixes():
+    def strong_tier(batch_df):
+        raise RuntimeError("503 Service Unavailable")
+
+    calls, improvements, cant_improvements = _run(strong_tier)
+
+    assert calls == [('cheap', [0, 1, 2, 3], ['a', 'b']), ('strong', [0, 1], ['b'])]
+    assert [(item.row, item.attr[0].value) for item in improvements] == [(0, '10'), (1, '20'), (2, '30'), (3, '40')]
+    errors = [item for item in cant_improvements if isinstance(item, NotImprovesItem)]
+    assert [(item.row, item.attr) for item in errors] == [(0, ['b']), (1, ['b'])]
+    assert [item['rows'] for item in cant_improvements if isinstance(item, dict)] == [[0, 1]]
+
+
+def test_unparsable_last_tier_reply_is_retried_on_the_escalated_cells_only():
+    def strong_tier(batch_df):
+        if len(batch_df) > 1:
+            raise BatchParseError("truncated reply")
+        return [ImprovesItem(row=batch_df.index[0], attr=[{'name': 'b', 'value': 'fixed'}])], [], []
+
+    calls, improvements, cant_improvements = _run(strong_tier)
+
+    assert [call[0] for call in calls].count('cheap') == 1
+    assert calls[1:] == [('strong', [0, 1], ['b']), ('strong', [0], ['b']), ('strong', [1], ['b'])]
+    assert sorted((item.row, item.attr[0].name) for item in improvements if item.attr[0].name == 'b') == [(0, 'b'), (1, 'b')]
+    assert cant_improvements == []
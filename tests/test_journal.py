@@ -0,0 +1,63 @@
+import pandas as pd
+
+from src.file_processing.csv import CSVLoader
+from src.file_processing.journal import ImprovementJournal, same_cell_value
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+from src.llm_providers.fake import FakeChatModel
+
+
+def _fix(row, column, value):
+    return ImprovesItem(row=row, attr=[{'name': column, 'value': value}])
+
+
+def test_record_history_and_latest_fix_wins(tmp_path):
+    journal = ImprovementJournal(str(tmp_path / 'journal.db'))
+    first = journal.record(
+        [_fix(0, 'city', 'Paris'), _fix(1, 'city', 'Lyon')],
+        [NotImprovesItem(row=2, attr=['city']), {"batch_index": 1, "rows": [3, 4], "error": "timeout"}],
+        file_hash='v1', fixer='fix_typography_data', model='fake',
+        old_values={(0, 'city'): 'Pariss', (1, 'city'): float('nan')},
+    )
+    second = journal.record([_fix(0, 'city', 'PARIS')], file_hash='v1', fixer='fix_typography_data',
+                            old_values={(0, 'city'): 'Paris'})
+
+    history = journal.history(run_id=first)
+    assert history['status'].tolist() == ['fix', 'fix', 'error', 'failed', 'failed']
+    assert history['old_value'].tolist()[:2] == ['Pariss', None]
+    assert journal.runs()[['run_id', 'fixes', 'errors', 'failed']].values.tolist() == [[first, 2, 1, 2], [second, 1, 0, 0]]
+    assert sorted(journal.fixes(file_hash='v1')) == [(0, 'city', 'Paris', 'PARIS'), (1, 'city', None, 'Lyon')]
+    assert journal.fixes(run_id=first, fixer='other') == []
+
+    changelog = journal.changelog(file_hash='v1')
+    assert changelog.columns.tolist()[:4] == ['row', 'column', 'original_value', 'modified_value']
+    assert changelog[['row', 'original_value', 'modified_value']].values.tolist() == [
+        [0, 'Pariss', 'Paris'], [1, None, 'Lyon'], [0, 'Paris', 'PARIS'],
+    ]
+
+
+def test_reapply_checks_old_values_across_an_int_to_float_change(tmp_path):
+    journal = ImprovementJournal(str(tmp_path / 'journal.db'))
+    v1 = tmp_path / 'v1.csv'
+    pd.DataFrame({'qty': [12, 5, 7]}).to_csv(v1, index=False)
+    loader = CSVLoader(str(v1), model=FakeChatModel(), coalesce_requests=False, journal=journal)
+    improvements, _ = loader.fix_number_error(['qty'])
+    assert len(improvements) == 3
+    journal.manager.execute("UPDATE improvements SET new_value = new_value || '0' WHERE status = 'fix'")
+
+    v2 = tmp_path / 'v2.csv'
+    pd.DataFrame({'qty': [12, 6, 7, None]}).to_csv(v2, index=False)
+    updated = CSVLoader(str(v2), journal=journal)
+    assert updated.data['qty'].dtype == 'float64'
+
+    applied = updated.reapply_improvements(file_hash=loader.file_hash)
+
+    assert applied == 2
+    assert updated.data['qty'].tolist()[:3] == [120.0, 6.0, 70.0]
+    assert updated.reapply_improvements(file_hash=loader.file_hash, check_old_values=False) == 3
+
+
+def test_same_cell_value():
+    assert same_cell_value(12.0, '12') and same_cell_value(12, '12.0')
+    assert same_cell_value(float('nan'), None)
+    assert not same_cell_value('007', '7')
+    assert not same_cell_value(13.0, '12')
@@ -0,0 +1,22 @@
+import re
+
+from src.llm_providers.metrics import LLMCallRecord, LLMMetrics, escape_label_value
+
+# A sample line of the Prometheus text format: name{label="value",...} number, values escaped.
+_SAMPLE_RE = re.compile(r'^[a-zA-Z_:][\w:]*\{(?:\w+="(?:[^"\\\n]|\\[\\"n])*",?)*\} \S+$')
+
+
+def test_label_values_are_escaped():
+    assert escape_label_value('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+
+
+def test_exposition_stays_valid_with_special_model_names():
+    metrics = LLMMetrics()
+    metrics.record(LLMCallRecord(fixer='fix "number"', column='price', batch=0,
+                                 model='C:\\models\\local\nv2', latency=0.5))
+
+    samples = [line for line in metrics.to_prometheus().splitlines() if line and not line.startswith('#')]
+
+    assert samples
+    assert all(_SAMPLE_RE.match(line) for line in samples)
+    assert 'model="C:\\\\models\\\\local\\nv2"' in samples[0]
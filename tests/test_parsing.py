@@ -0,0 +1,25 @@
+import json
+
+from src.llm_providers.parsing import salvage_error_response
+
+ENTRIES = [
+    {"row": 0, "attr": [{"name": "price", "value": "10"}]},
+    {"row": 1, "attr": ["price"]},
+]
+
+
+def test_complete_top_level_list_requests_no_retry():
+    response, retry_rows = salvage_error_response(json.dumps(ENTRIES), [0, 1, 2, 3])
+
+    assert [item.row for item in response.improves] == [0]
+    assert [item.row for item in response.error] == [1]
+    assert retry_rows == []
+
+
+def test_truncated_reply_retries_the_rows_after_the_last_entry():
+    content = json.dumps({"improves": ENTRIES})[:-20]
+
+    response, retry_rows = salvage_error_response(content, [0, 1, 2, 3])
+
+    assert [item.row for item in response.improves] == [0]
+    assert retry_rows == [1, 2, 3]
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from src.file_processing.profiling import profile_chunks, profile_csv
+
+
+def test_column_turning_to_text_in_a_later_chunk(tmp_path):
+    path = tmp_path / 'mixed.csv'
+    pd.DataFrame({'a': ['1', '2', '3', 'foo'], 'b': [1.5, 2.5, None, 4.0]}).to_csv(path, index=False)
+
+    profile = {summary['column_name']: summary for summary in profile_csv(str(path), chunksize=2, sketch=True)}
+
+    assert profile['a']['type_category'] == 'string/object'
+    assert 'min' not in profile['a'] and 'quantiles' not in profile['a']
+    assert profile['b']['min'] == 1.5 and profile['b']['max'] == 4.0
+
+
+def test_integer_and_float_chunks_keep_numeric_statistics():
+    chunks = [pd.DataFrame({'x': [1, 2]}), pd.DataFrame({'x': [3.5, 4.5]})]
+
+    summary = profile_chunks(chunks)[0]
+
+    assert summary['dtype'] == 'float64'
+    assert summary['min'] == 1 and summary['max'] == 4.5 and summary['mean'] == 2.75
@@ -0,0 +1,22 @@
+import threading
+
+from src.llm_providers.rate_limit import AIMDController, RateLimiter
+
+
+def test_default_limit_matches_the_fixer_workers():
+    limiter = RateLimiter()
+    assert limiter.concurrency.limit == 32
+
+    entered = threading.Barrier(32, timeout=5)
+    threads = [threading.Thread(target=limiter.call, args=(entered.wait,)) for _ in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not entered.broken
+
+
+def test_congestion_halves_the_limit():
+    controller = AIMDController(cooldown=0.0)
+    controller.on_congestion()
+    assert controller.limit == 16
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from src.file_processing.reference import CompositeReferenceMatcher
+
+
+def test_whole_floats_match_integer_reference_values():
+    reference = pd.DataFrame({'code': [84, 33, 49], 'country': ['Vietnam', 'France', 'Germany']})
+    data = pd.DataFrame({'code': [84.0, np.nan, 49.0], 'country': ['Vietnam', 'France', 'Germany']})
+
+    improvements = CompositeReferenceMatcher(reference, ['code', 'country']).find_improvements(data, threshold=50)
+
+    assert [(item.row, [(cell.name, cell.value) for cell in item.attr]) for item in improvements] == [
+        (1, [('code', '33')]),
+    ]
+
+
+def test_low_cardinality_column_does_not_widen_candidates():
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    cities = [f"{first}{second}ville" for first in letters for second in letters]
+    reference = pd.DataFrame({'city': cities, 'country': ['France'] * len(cities)})
+    matcher = CompositeReferenceMatcher(reference, ['city', 'country'], max_candidates=20)
+
+    candidates = matcher._candidates(('QRVILE', 'FRANCE'))
+
+    assert len(candidates) <= 20
+    rec_idx, score = matcher.match(['qrvile', 'France'])
+    assert matcher.records[rec_idx] == ('qrville', 'France') and score > 90
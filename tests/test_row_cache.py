@@ -0,0 +1,98 @@
+import pandas as pd
+
+from src.file_processing.csv import CSVLoader
+from src.file_processing.row_cache import RowResultCache, context_key, row_keys
+from src.file_processing.schema import ImprovesItem, NotImprovesItem
+from src.llm_providers.fake import FakeChatModel
+
+
+def _frame(start: int, stop: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'item': [f" item {i} " for i in range(start, stop)],
+        'category': [f" cat {i % 7} " for i in range(start, stop)],
+    })
+
+
+def _loader(tmp_path, name, df, cache, model=None):
+    path = tmp_path / f"{name}.csv"
+    df.to_csv(path, index=False)
+    return CSVLoader(str(path), model=model or FakeChatModel(), coalesce_requests=False, row_cache=cache)
+
+
+def _fixes(improvements):
+    return {(item.row, cell.name): cell.value for item in improvements for cell in item.attr}
+
+
+def _fix_all(loader):
+    improvements, cant_improvements = loader.fix_typography_data(batch_size=50)
+    assert not cant_improvements
+    return _fixes(improvements)
+
+
+def test_shuffled_and_appended_rows_reuse_the_first_run(tmp_path):
+    cache = RowResultCache()
+    first = _fix_all(_loader(tmp_path, 'day1', _frame(0, 100), cache))
+
+    shuffled = pd.concat([_frame(0, 100).sample(frac=1, random_state=3), _frame(100, 120)], ignore_index=True)
+    model = FakeChatModel()
+    cache.reset_stats()
+    second = _fix_all(_loader(tmp_path, 'day2', shuffled, cache, model))
+
+    assert cache.stats['hits'] == 100 and cache.stats['misses'] == 20
+    assert model.stats['calls'] == 1
+    by_content = {tuple(row): row_index for row_index, row in enumerate(_frame(0, 100).itertuples(index=False))}
+    for row_index, row in enumerate(shuffled.itertuples(index=False)):
+        for column, value in zip(shuffled.columns, row):
+            assert second[(row_index, column)] == value.strip()
+            if tuple(row) in by_content:
+                assert second[(row_index, column)] == first[(by_content[tuple(row)], column)]
+
+
+def test_rows_of_failed_batches_are_not_cached():
+    cache = RowResultCache()
+    batches = [_frame(0, 4), _frame(4, 8), _frame(8, 12)]
+    data = pd.concat(batches)
+    data.index = range(12)
+    batches = [data.iloc[0:4], data.iloc[4:8], data.iloc[8:12]]
+    keys = dict(zip(data.index.tolist(), row_keys(data, 'ctx')))
+    improvements = [ImprovesItem(row=0, attr=[{'name': 'item', 'value': 'item 0'}])]
+    cant_improvements = [
+        NotImprovesItem(row=1, attr=['category']),
+        {"batch_index": 6, "error": "timeout"},
+        {"batch_index": 5, "rows": [9, 10], "error": "unparsable"},
+    ]
+
+    stored = cache.record(batches, keys, improvements, cant_improvements, first_index=5)
+
+    cached = cache.lookup(keys.values())
+    assert stored == 6
+    assert {row for row, key in keys.items() if key in cached} == {0, 1, 2, 3, 8, 11}
+    assert cached[keys[0]] == ([['item', 'item 0']], [])
+    assert cached[keys[1]] == ([], ['category'])
+
+
+def test_failed_run_leaves_nothing_to_reuse(tmp_path):
+    cache = RowResultCache()
+    _loader(tmp_path, 'down', _frame(0, 20), cache, FakeChatModel(error_rate=1.0)).fix_typography_data(batch_size=10)
+
+    model = FakeChatModel()
+    cache.reset_stats()
+    fixes = _fix_all(_loader(tmp_path, 'up', _frame(0, 20), cache, model))
+
+    assert cache.stats['hits'] == 0 and model.stats['calls'] == 1
+    assert len(fixes) == 40
+
+
+def test_other_formation_or_prompt_is_not_reused(tmp_path):
+    cache = RowResultCache()
+    df = pd.DataFrame({'price': [f" {i}.00 " for i in range(30)]})
+    loader = _loader(tmp_path, 'prices', df, cache)
+
+    loader.fix_number_error(['price'], formation=[('price', '123456')])
+    loader.fix_number_error(['price'], formation=[('price', '123456.00')])
+    loader.fix_datetime_error(['price'], formation=[('price', '123456')])
+    assert cache.stats['hits'] == 0
+
+    loader.fix_number_error(['price'], formation=[('price', '123456')])
+    assert cache.stats['hits'] == 30
+    assert context_key(fixer='a', formation=[1]) != context_key(fixer='a', formation=[2])
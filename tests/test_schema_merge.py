@@ -0,0 +1,32 @@
+import os
+
+import pandas as pd
+
+from src.file_processing.schema_merge import merge_patterns, merge_schemas
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSY_PATTERN_CSV = os.path.join(
+    ROOT_DIR, 'examples', 'public', 'company-purchasing-dataset', 'messy_pattern_spend_analysis_dataset.csv',
+)
+
+
+def _schema(pattern):
+    return {"type": "object", "properties": {"TransactionID": {"type": "string", "pattern": pattern}}}
+
+
+def test_pattern_proposed_by_every_sample_survives_a_messy_column():
+    data = pd.read_csv(MESSY_PATTERN_CSV)
+    assert not data['TransactionID'].str.contains(r'^TXN\d{3}$').all()
+
+    merged = merge_schemas([_schema(r'^TXN\d{3}$')] * 3, data[['TransactionID']])
+
+    assert merged['properties']['TransactionID']['pattern'] == r'^TXN\d{3}$'
+
+
+def test_minority_patterns_need_to_match_most_values():
+    values = pd.Series(['TXN001', 'TXN002', 'TXN003', 'TXN004', 'txn-5'])
+    patterns = [r'^TXN\d{3}$', r'^TXN\d{3}$', r'^[A-Z]+\d+$', r'^\d+$', None]
+
+    assert merge_patterns(patterns, values) == [r'^TXN\d{3}$', r'^[A-Z]+\d+$']
+    assert merge_patterns(patterns, values, min_match=1.0) == []
+    assert merge_patterns([r'^\d+$', '(', '('], values) == []
@@ -0,0 +1,20 @@
+import pandas as pd
+
+from src.file_processing.storage import SQLiteStorage
+
+
+def test_read_back_like_read_csv(tmp_path):
+    path = tmp_path / 'books.csv'
+    pd.DataFrame({
+        'title': ['Dune', 'Emma', 'Ulysses'],
+        'manufacturer': ['Ace', None, 'Penguin'],
+        'pages': [412, None, 730],
+    }).to_csv(path, index=False)
+    storage = SQLiteStorage(str(tmp_path / 'books.db'))
+    storage.load_csv(str(path))
+
+    expected = pd.read_csv(path)
+    data = storage.read_all()
+
+    pd.testing.assert_frame_equal(data, expected)
+    assert data['manufacturer'].map(type).tolist() == expected['manufacturer'].map(type).tolist()
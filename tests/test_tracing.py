@@ -0,0 +1,29 @@
+from src.utils.tracing import Tracer
+
+
+def test_durations_kept_in_bounded_memory():
+    tracer = Tracer(enabled=True, max_events=10, reservoir_size=100)
+    for i in range(1, 10_001):
+        tracer.record('call', 0.0, i / 1000)
+
+    stage = tracer._stages['call']
+    summary = tracer.summary()['call']
+
+    assert len(stage.sample) == 100
+    assert summary['count'] == 10_000
+    assert summary['min_ms'] == 1 and summary['max_ms'] == 10_000
+    assert summary['mean_ms'] == 5000.5
+    assert sum(summary['histogram_ms'].values()) == 10_000
+    assert 3000 < summary['p50_ms'] < 7000
+    assert summary['p99_ms'] >= summary['p95_ms'] >= summary['p50_ms']
+
+
+def test_small_stage_percentiles_are_exact():
+    tracer = Tracer(enabled=True)
+    for ms in (5, 1, 3, 2, 4):
+        tracer.record('parse', 0.0, ms / 1000)
+
+    summary = tracer.summary()['parse']
+
+    assert summary['count'] == 5 and summary['p50_ms'] == 3 and summary['p99_ms'] == 5
+    assert summary['histogram_ms'] == {'<=1': 1, '<=2': 1, '<=5': 3}